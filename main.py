@@ -1,8 +1,10 @@
 # main.py
-import argparse
+import argparse, json
 from pathlib import Path
 import sigilum.phases  # registra fases
 from sigilum.engine.trial_runner import run_sigilum
+from sigilum.io.saver import ARTIFACT_LEVELS
+from sigilum.io.cache import configure_cache, DEFAULT_MEM_BUDGET_MB, DEFAULT_DISK_BUDGET_GB
 from sigilum.utils.logger import setup_console_logging, get_logger
 
 def main():
@@ -14,12 +16,24 @@ def main():
     parser.add_argument("--search_cfg", default="configs/search_spaces.yaml")
     parser.add_argument("--metrics_cfg", default="configs/metrics_profile.yaml")
     parser.add_argument("--mode", choices=["absolute", "early", "both"], default="both")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos para repartir los trials (1 = secuencial)")
+    parser.add_argument("--cache-mem-mb", type=float, default=DEFAULT_MEM_BUDGET_MB,
+                        help="Presupuesto del cache en memoria (MB, 0 = solo disco)")
+    parser.add_argument("--cache-disk-gb", type=float, default=DEFAULT_DISK_BUDGET_GB,
+                        help="Cap del cache en disco (GB); al superarlo se evictan entradas LRU")
+    parser.add_argument("--artifacts", choices=ARTIFACT_LEVELS, default="topk",
+                        help="Artefactos por trial: none|summary|topk|full (imágenes solo en topk/full)")
+    parser.add_argument("--topk", type=int, default=5, help="Trials con imágenes cuando --artifacts topk")
+    parser.add_argument("--profile", action="store_true",
+                        help="Perfilar fases/métricas/IO: aggregate/profile.json y aggregate/trace.json")
     parser.add_argument("--log-level", default="INFO", help="DEBUG|INFO|WARNING|ERROR")
     args = parser.parse_args()
 
     # consola
     setup_console_logging(args.log_level)
     log = get_logger()
+    configure_cache(mem_budget_mb=args.cache_mem_mb, disk_budget_gb=args.cache_disk_gb)
 
     # validaciones mínimas
     for p in [args.cheque, args.firmas_dir, args.pipeline_cfg, args.search_cfg, args.metrics_cfg]:
@@ -31,15 +45,20 @@ def main():
     log.info(f"Configs → pipeline={args.pipeline_cfg} search={args.search_cfg} metrics={args.metrics_cfg}")
     log.info(f"Mode: {args.mode} | Log level: {args.log_level}")
 
-    run_sigilum(
+    result = run_sigilum(
         cheque_path=args.cheque,
         cuenta_id=args.cuenta,
         firmas_dir=args.firmas_dir,
         pipeline_cfg=args.pipeline_cfg,
         search_cfg=args.search_cfg,
         metrics_cfg=args.metrics_cfg,
-        mode=args.mode
+        mode=args.mode,
+        workers=args.workers,
+        artifacts=args.artifacts,
+        topk=args.topk,
+        profile=args.profile
     )
+    print(json.dumps(result, ensure_ascii=False, indent=2))
 
 if __name__ == "__main__":
     main()
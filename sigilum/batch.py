@@ -0,0 +1,184 @@
+# sigilum/batch.py
+"""
+Batch: muchos cheques desde un manifest (CSV o JSONL con cheque_path, cuenta_id, firmas_dir).
+
+  python -m sigilum.batch --manifest cheques.csv --out batches/2024_06 --workers 4
+
+Los configs se cargan una vez por proceso y los features de firmas se reusan entre cheques
+de la misma cuenta. Cada item terminado se anota en <out>/batch_state.jsonl; relanzar con el
+mismo --out retoma donde quedó (los items con error se reintentan).
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List
+import argparse, csv, json, logging, os, time
+import multiprocessing as mp
+
+import sigilum.phases  # registra fases
+from sigilum.engine.trial_runner import run_sigilum
+from sigilum.io.cache import cache_config, close_cache_on_worker_exit, configure_cache, flush_cache, DEFAULT_MEM_BUDGET_MB, DEFAULT_DISK_BUDGET_GB
+from sigilum.io.saver import ARTIFACT_LEVELS, save_json
+from sigilum.utils.config import load_run_configs
+from sigilum.utils.hashing import fingerprint
+from sigilum.utils.logger import get_logger, setup_console_logging
+
+MANIFEST_FIELDS = ("cheque_path", "cuenta_id", "firmas_dir")
+STATE_FILE = "batch_state.jsonl"
+
+# estado por proceso worker (lo arma _init_worker)
+_B: Dict[str, Any] = {}
+
+def read_manifest(path: str | Path) -> List[Dict[str, str]]:
+    """
+    Items del manifest (.csv con header o .jsonl), cada uno con su `item_id` estable: el
+    fingerprint del item, así agregar/quitar/reordenar filas no cambia el id de las demás.
+    Filas repetidas (mismo cheque, cuenta y firmas) son items distintos: la k-ésima
+    repetición lleva sufijo `_k` (k ≥ 2), en orden del manifest.
+    """
+    path = Path(path)
+    with path.open(encoding="utf-8") as f:
+        if path.suffix.lower() in (".jsonl", ".ndjson"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    items, seen = [], {}
+    for i, row in enumerate(rows, start=1):
+        missing = [k for k in MANIFEST_FIELDS if not str(row.get(k) or "").strip()]
+        if missing:
+            raise ValueError(f"Manifest {path} fila {i}: faltan {missing}")
+        item = {k: str(row[k]).strip() for k in MANIFEST_FIELDS}
+        fp = fingerprint(item)
+        seen[fp] = seen.get(fp, 0) + 1
+        item["item_id"] = fp if seen[fp] == 1 else f"{fp}_{seen[fp]}"
+        items.append(item)
+    return items
+
+def load_state(out_dir: Path) -> Dict[str, dict]:
+    """Último registro por item_id de batch_state.jsonl (tolera una última línea cortada)."""
+    state: Dict[str, dict] = {}
+    p = out_dir / STATE_FILE
+    if not p.exists():
+        return state
+    for line in p.read_text(encoding="utf-8").splitlines():
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        state[rec["item_id"]] = rec
+    return state
+
+def _append_state(f, rec: dict):
+    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+def _init_worker(cfg_paths: dict, log_level: str, cache_cfg: dict):
+    setup_console_logging(log_level)
+    configure_cache(**cache_cfg)
+    close_cache_on_worker_exit()
+    _B.update({"cfg_paths": cfg_paths, "configs": load_run_configs(**cfg_paths)})
+
+def _run_item(item: dict, runs_root: str, mode: str, artifacts: str = "topk", topk: int = 5) -> dict:
+    """Corre un item del manifest; los errores vuelven como registro, no como excepción."""
+    t0 = time.perf_counter()
+    rec = {"item_id": item["item_id"], **{k: item[k] for k in MANIFEST_FIELDS}}
+    try:
+        for p in (item["cheque_path"], item["firmas_dir"]):
+            if not Path(p).exists():
+                raise FileNotFoundError(f"No existe: {p}")
+        res = run_sigilum(item["cheque_path"], item["cuenta_id"], item["firmas_dir"], mode=mode,
+                          configs=_B["configs"], runs_root=runs_root, artifacts=artifacts, topk=topk,
+                          run_id=f"{item['item_id']}__{Path(item['cheque_path']).stem}", **_B["cfg_paths"])
+        best = res["best_trial"] or {}
+        rec.update({"status": "done", "result": res["status"], "run_dir": res["run_dir"],
+                    "best_score": best.get("best_score"), "best_firma": best.get("best_firma")})
+    except Exception as e:
+        get_logger().exception(f"Batch item {item['item_id']} failed")
+        rec.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    rec["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return rec
+
+def run_batch(manifest: str | Path, out_dir: str | Path, pipeline_cfg: str, search_cfg: str, metrics_cfg: str,
+              mode: str = "both", workers: int = 1, artifacts: str = "topk", topk: int = 5) -> Dict[str, Any]:
+    log = get_logger()
+    t0 = time.perf_counter()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    items = read_manifest(manifest)
+    state = load_state(out_dir)
+    todo = [it for it in items if state.get(it["item_id"], {}).get("status") != "done"]
+    log.info(f"Batch {manifest}: {len(items)} item(s), {len(items) - len(todo)} ya hechos, {len(todo)} pendientes")
+
+    cfg_paths = {"pipeline_cfg": pipeline_cfg, "search_cfg": search_cfg, "metrics_cfg": metrics_cfg}
+    runs_root = str(out_dir / "runs")
+    workers = max(1, min(int(workers or 1), len(todo) or 1))
+    with (out_dir / STATE_FILE).open("a", encoding="utf-8") as sf:
+        def record(rec: dict):
+            state[rec["item_id"]] = rec
+            _append_state(sf, rec)
+            log.info(f"Batch item {rec['item_id']} {rec['status']} "
+                     f"({rec.get('result', rec.get('error'))}) | {len(state)}/{len(items)}")
+
+        if workers == 1 or not todo:
+            _B.update({"cfg_paths": cfg_paths, "configs": load_run_configs(**cfg_paths)})
+            for it in todo:
+                record(_run_item(it, runs_root, mode, artifacts, topk))
+        else:
+            # cada worker corre cheques enteros (trials secuenciales dentro del cheque)
+            level = logging.getLevelName(log.level) if log.level else "INFO"
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(cfg_paths, level, cache_config())) as ex:
+                futures = [ex.submit(_run_item, it, runs_root, mode, artifacts, topk) for it in todo]
+                for f in as_completed(futures):
+                    record(f.result())
+    flush_cache()
+
+    summary = write_summary(out_dir, items, state, manifest)
+    summary["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return summary
+
+def write_summary(out_dir: Path, items: List[dict], state: Dict[str, dict], manifest) -> Dict[str, Any]:
+    """batch_summary.json / .csv en el orden del manifest."""
+    rows = [state.get(it["item_id"], {**it, "status": "pending"}) for it in items]
+    counts: Dict[str, int] = {}
+    for r in rows:
+        key = r.get("result") if r["status"] == "done" else r["status"]
+        counts[key] = counts.get(key, 0) + 1
+    summary = {"manifest": str(manifest), "n_items": len(items), "counts": counts, "items": rows}
+    save_json(out_dir / "batch_summary.json", summary)
+    cols = ["item_id", *MANIFEST_FIELDS, "status", "result", "best_score", "best_firma", "run_dir", "ms", "error"]
+    with (out_dir / "batch_summary.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=cols, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(rows)
+    return {k: v for k, v in summary.items() if k != "items"}
+
+def main():
+    ap = argparse.ArgumentParser(description="Sigilum - batch de cheques desde un manifest")
+    ap.add_argument("--manifest", required=True, help="CSV/JSONL con cheque_path, cuenta_id, firmas_dir")
+    ap.add_argument("--out", default=None, help="Carpeta del batch (default: batches/<manifest>)")
+    ap.add_argument("--pipeline_cfg", default="configs/pipeline_default.yaml")
+    ap.add_argument("--search_cfg", default="configs/search_spaces.yaml")
+    ap.add_argument("--metrics_cfg", default="configs/metrics_profile.yaml")
+    ap.add_argument("--mode", choices=["absolute", "early", "both"], default="both")
+    ap.add_argument("--workers", type=int, default=1, help="Cheques en paralelo (procesos)")
+    ap.add_argument("--artifacts", choices=ARTIFACT_LEVELS, default="topk")
+    ap.add_argument("--topk", type=int, default=5)
+    ap.add_argument("--cache-mem-mb", type=float, default=DEFAULT_MEM_BUDGET_MB)
+    ap.add_argument("--cache-disk-gb", type=float, default=DEFAULT_DISK_BUDGET_GB)
+    ap.add_argument("--log-level", default="INFO")
+    args = ap.parse_args()
+
+    setup_console_logging(args.log_level)
+    configure_cache(mem_budget_mb=args.cache_mem_mb, disk_budget_gb=args.cache_disk_gb)
+    for p in [args.manifest, args.pipeline_cfg, args.search_cfg, args.metrics_cfg]:
+        if not Path(p).exists():
+            raise FileNotFoundError(f"No existe: {p}")
+    out = args.out or str(Path("batches") / Path(args.manifest).stem)
+    summary = run_batch(args.manifest, out, args.pipeline_cfg, args.search_cfg, args.metrics_cfg,
+                        mode=args.mode, workers=args.workers, artifacts=args.artifacts, topk=args.topk)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+# sigilum/bench/suite.py
+"""
+Benchmark de rendimiento: fases, métricas y run_sigilum de punta a punta sobre cheques sintéticos.
+
+  python -m sigilum.bench.suite run --out bench_baseline.json                  # línea base
+  python -m sigilum.bench.suite run --out new.json --compare bench_baseline.json
+  python -m sigilum.bench.suite compare bench_baseline.json new.json --tolerance 0.25
+
+Los datos salen de sigilum.bench.synthetic (misma semilla → mismos cheques y firmas). Cada fase
+registrada se mide sobre la salida real de las fases anteriores del pipeline de bench, cada métrica
+registrada contra las firmas de referencia, y cada espacio de E2E_SPACES corre en un proceso hijo
+con cache vacío (cold) y otra vez en el mismo proceso (warm, cache en memoria). Los tiempos solo
+son comparables entre resultados de la misma máquina (ver `meta`).
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import argparse, json, os, platform, statistics, subprocess, sys, tempfile, time
+from datetime import datetime
+import cv2, numpy as np, yaml
+
+import sigilum.phases  # registra fases
+from sigilum.phases.base import _PHASE_REGISTRY, get_phase_cls
+from sigilum.phases.ocr import ocr_backend
+from sigilum.engine.metrics import _METRICS, score_batch
+from sigilum.bench.synthetic import reference_signatures, write_case
+from sigilum.utils.logger import get_logger, setup_console_logging
+
+DEFAULT_WIDTHS = (800, 1600, 2400)
+ASPECT = 7 / 16  # alto / ancho de un cheque
+METRIC_SIZES = (128, 256)
+
+# pipeline de bench: el de pipeline_from_legacy.yaml con Illumination activa (el papel sintético
+# tiene gradiente); AutoResize.max_side se fija al tamaño del cheque para que cada tamaño llegue
+# entero a las fases de abajo
+BENCH_PIPELINE: List[Dict[str, Any]] = [
+    {"phase": "AutoResize", "params": {"max_side": 1600}},
+    {"phase": "DeskewBorder", "params": {"canny_low": 50, "canny_high": 150, "hough_thresh": 120,
+                                         "min_apply_angle": 0.7, "max_angle_deg": 5}},
+    {"phase": "SignatureROI", "params": {"enabled": False}},
+    {"phase": "BorderBlur", "params": {"gauss_sigma": 3.0}},
+    {"phase": "Illumination", "params": {"mode": "bg_subtract", "bg_kernel": 8.0}},
+    {"phase": "ColorSelect", "params": {"enabled": False}},
+    {"phase": "Denoise", "params": {"mode": "bilateral", "bil_d": 2, "bil_sigma": 21}},
+    {"phase": "Binarization", "params": {"mode": "otsu", "invert": True}},
+    {"phase": "Morphology", "params": {"open_sz": 1, "close_sz": 3, "min_area": 118}},
+    {"phase": "OCRMask", "params": {"enabled": True, "lang": "eng", "min_conf": 0, "pad": 10}},
+    {"phase": "RemoveLinesBoxes", "params": {"morph_h_len": 256, "morph_v_len": 160, "remove_rectangles": True,
+                                             "hollow_min_wh_sum": 180}},
+    {"phase": "Candidate", "params": {"canny_low": 32, "canny_high": 40, "close_sz": 3, "min_area": 2300, "pad": 8}},
+    {"phase": "AutoCrop", "params": {"enabled": True, "padding": 10, "size": [256, 256]}},
+    {"phase": "Skeletonization", "params": {"enabled": True, "method": "lut", "resize_before": False}},
+]
+
+BENCH_METRICS = {
+    "target_size": [256, 256],
+    "metrics": [{"name": "ssim", "weight": 0.5, "params": {"win_size": 7}},
+                {"name": "ncc", "weight": 0.3, "params": {}},
+                {"name": "mse", "weight": 0.2, "params": {}},
+                {"name": "chamfer", "weight": 0.2, "params": {}}],
+    "combiner": "weighted_sum",
+    "thresholds": {"accept": 0.8, "early_stop": 0.88, "min_margin": 0.05},
+}
+
+# espacios de búsqueda representativos: el mismo espacio con cada estrategia (y uno tpe)
+_SPACE = {"Binarization": {"mode": ["otsu", "sauvola"], "sauvola_window": [31, 41]},
+          "Morphology": {"close_sz": [3, 5], "min_area": [60, 118]}}
+E2E_SPACES: Dict[str, Dict[str, Any]] = {
+    "grid": {"max_combinations": 24, **_SPACE},
+    "successive_halving": {"max_combinations": 24, **_SPACE,
+                           "strategy": {"name": "successive_halving", "eta": 3, "min_survivors": 2,
+                                        "rounds": [{"metrics": ["ncc", "mse"], "target_size": [64, 64]}]}},
+    "coarse_to_fine": {"max_combinations": 24, **_SPACE,
+                       "strategy": {"name": "coarse_to_fine", "scale": 0.5, "topk": 3}},
+    "tpe": {**_SPACE, "Denoise": {"bil_sigma": [11, 21, 31]},
+            "strategy": {"name": "tpe", "budget": 16, "n_startup": 6, "batch": 4, "patience": 16, "seed": 0}},
+}
+
+def cheque_size(width: int) -> Tuple[int, int]:
+    return int(width), int(round(width * ASPECT))
+
+def bench_pipeline(size: Tuple[int, int], ocr: bool | None = None) -> List[Dict[str, Any]]:
+    """BENCH_PIPELINE para un cheque de `size`; ocr=None → OCRMask solo si hay backend de Tesseract."""
+    ocr = _has_ocr() if ocr is None else ocr
+    steps = []
+    for st in BENCH_PIPELINE:
+        p = dict(st["params"])
+        if st["phase"] == "AutoResize":
+            p["max_side"] = max(size)
+        if st["phase"] == "OCRMask":
+            p["enabled"] = bool(ocr)
+        steps.append({"phase": st["phase"], "params": p})
+    return steps
+
+def _has_ocr() -> bool:
+    try:
+        if ocr_backend() == "pytesseract":
+            import pytesseract
+            pytesseract.get_tesseract_version()  # el paquete puede estar sin el binario
+        return True
+    except Exception:
+        return False
+
+def _stats(ms: List[float]) -> Dict[str, float]:
+    return {"median_ms": round(statistics.median(ms), 3), "min_ms": round(min(ms), 3),
+            "max_ms": round(max(ms), 3), "n": len(ms)}
+
+def _time(fn, repeat: int, warmup: int = 1) -> Tuple[List[float], Any]:
+    out = None
+    for _ in range(warmup):
+        out = fn()
+    ms = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        ms.append((time.perf_counter() - t0) * 1000)
+    return ms, out
+
+def bench_phases(cheque: np.ndarray, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    """
+    Una entrada por fase registrada. Las del pipeline de bench se miden sobre la salida de las
+    anteriores (y con enabled=True, aunque el pipeline las tenga apagadas); el resto, sobre el cheque.
+    """
+    size = (cheque.shape[1], cheque.shape[0])
+    tag = f"{size[0]}x{size[1]}"
+    has_ocr = _has_ocr()
+    results, img = {}, cheque
+    steps = bench_pipeline(size, has_ocr)
+    chain = {st["phase"] for st in steps}
+    rest = [{"phase": n, "params": {}} for n in sorted(_PHASE_REGISTRY) if n not in chain]
+    for st in steps + rest:
+        phase = get_phase_cls(st["phase"])()
+        inp = img if st["phase"] in chain else cheque
+        params = dict(st["params"])
+        if "enabled" in phase.defaults:
+            params["enabled"] = True
+        key = f"phase/{phase.name}@{tag}"
+        if phase.name == "OCRMask" and not has_ocr:
+            results[key] = {"skipped": "sin backend de OCR (tesserocr/pytesseract)"}
+        else:
+            ms, out = _time(lambda: phase.apply(inp, **params), repeat)
+            results[key] = {**_stats(ms), "in_shape": list(inp.shape), "out_shape": list(np.shape(out)),
+                            "mpx_per_s": round(inp.shape[0] * inp.shape[1] / (statistics.median(ms) / 1000) / 1e6, 3)}
+        if st["phase"] in chain:  # la cadena sigue con los params del pipeline (no con enabled forzado)
+            img = phase.apply(img, **st["params"])
+    return results
+
+def bench_metrics(seed: int = 0, n_refs: int = 3, sizes=METRIC_SIZES, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    """
+    Cada métrica registrada: score_batch del candidato contra n_refs firmas, con features en frío
+    (arrays nuevos en cada llamada, como el primer trial de un run).
+    """
+    refs = reference_signatures(seed, n_refs)
+    cand = reference_signatures(seed, n_refs + 1)[-1]  # otra muestra del mismo firmante
+    results = {}
+    for s in sizes:
+        for name in sorted(_METRICS):
+            ms, vals = _time(lambda: score_batch(name, cand.copy(), [r.copy() for r in refs], size=(s, s)), repeat)
+            results[f"metric/{name}@{s}x{s}"] = {**_stats(ms), "pairs": n_refs,
+                                                "ms_per_pair": round(statistics.median(ms) / n_refs, 3),
+                                                "score": round(float(np.max(vals)), 6)}
+    return results
+
+def _e2e_child(case_dir: str, space: str, workers: int) -> Dict[str, Any]:
+    """Dentro del proceso hijo (cwd vacío = cache vacío): un run cold y uno warm del mismo espacio."""
+    from sigilum.engine.trial_runner import run_sigilum
+    setup_console_logging("WARNING")
+    case = json.loads((Path(case_dir) / "case.json").read_text(encoding="utf-8"))
+    cfg = {"pipeline.yaml": {"pipeline": bench_pipeline(tuple(case["size"]))},
+           "search.yaml": E2E_SPACES[space], "metrics.yaml": BENCH_METRICS}
+    for name, doc in cfg.items():
+        Path(name).write_text(yaml.safe_dump(doc, sort_keys=False), encoding="utf-8")
+    out = {}
+    for phase in ("cold", "warm"):
+        t0 = time.perf_counter()
+        res = run_sigilum(case["cheque"], "bench", case["firmas_dir"], "pipeline.yaml", "search.yaml", "metrics.yaml",
+                          workers=workers, artifacts="summary", run_id=f"{space}_{phase}")
+        out[f"{phase}_ms"] = (time.perf_counter() - t0) * 1000
+    meta = json.loads((Path(res["run_dir"]) / "run.json").read_text(encoding="utf-8"))
+    out.update({"n_trials": meta["n_trials"], "status": res["status"],
+                "best_score": round(float(res["best_trial"]["best_score"]), 6)})
+    return out
+
+def bench_e2e(case_dir: str | Path, size: Tuple[int, int], spaces=tuple(E2E_SPACES), repeat: int = 3,
+              workers: int = 1) -> Dict[str, Dict[str, Any]]:
+    """Cada espacio en `repeat` procesos hijos (cache vacío cada vez): median_ms es el run cold."""
+    log = get_logger()
+    root = str(Path(sigilum.__file__).resolve().parents[1])
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+    results = {}
+    for space in spaces:
+        runs = []
+        for _ in range(max(1, repeat)):
+            with tempfile.TemporaryDirectory(prefix="sigilum_bench_") as cwd:
+                p = subprocess.run([sys.executable, "-m", "sigilum.bench.suite", "_e2e", "--case", str(case_dir),
+                                    "--space", space, "--workers", str(workers)],
+                                   cwd=cwd, env=env, capture_output=True, text=True)
+            if p.returncode != 0:
+                raise RuntimeError(f"E2E {space} falló:\n{p.stderr[-2000:]}")
+            runs.append(json.loads(p.stdout.strip().splitlines()[-1]))
+        key = f"e2e/{space}@{size[0]}x{size[1]}"
+        results[key] = {**_stats([r["cold_ms"] for r in runs]),
+                        "warm_ms": round(statistics.median(r["warm_ms"] for r in runs), 3),
+                        **{k: runs[-1][k] for k in ("n_trials", "status", "best_score")}}
+        log.info(f"{key}: cold {results[key]['median_ms']:.0f} ms, warm {results[key]['warm_ms']:.0f} ms "
+                 f"({results[key]['n_trials']} trials)")
+    return results
+
+def run_suite(widths=DEFAULT_WIDTHS, seed: int = 0, repeat: int = 5, e2e_repeat: int = 3, n_refs: int = 3,
+              only=("phase", "metric", "e2e"), spaces=tuple(E2E_SPACES), workers: int = 1) -> Dict[str, Any]:
+    """Suite completa; todo corre en un directorio temporal (los caches .cache/ quedan ahí)."""
+    log = get_logger()
+    results: Dict[str, Dict[str, Any]] = {}
+    prev = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="sigilum_bench_") as tmp:
+        os.chdir(tmp)
+        try:
+            for w in widths:
+                size = cheque_size(w)
+                case = Path(tmp) / f"case_{seed:04d}_{w}"
+                write_case(case, seed, size, n_refs)
+                if "phase" in only:
+                    cheque = cv2.imread(str(case / "cheque.png"), cv2.IMREAD_GRAYSCALE)
+                    results.update(bench_phases(cheque, repeat))
+                    log.info(f"Phases @ {size[0]}x{size[1]} done")
+                if "e2e" in only:
+                    results.update(bench_e2e(case, size, spaces, e2e_repeat, workers))
+            if "metric" in only:
+                results.update(bench_metrics(seed, n_refs, repeat=repeat))
+                log.info("Metrics done")
+        finally:
+            os.chdir(prev)
+    return {"meta": _meta(seed=seed, widths=list(widths), repeat=repeat, e2e_repeat=e2e_repeat, n_refs=n_refs,
+                          workers=workers, ocr=_has_ocr()), "results": results}
+
+def _meta(**extra) -> Dict[str, Any]:
+    return {"created_at": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "numpy": np.__version__, "opencv": cv2.__version__, "platform": platform.platform(),
+            "machine": platform.machine(), "cpu_count": os.cpu_count(), **extra}
+
+# --- comparación contra una línea base
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], tolerance: float = 0.25, min_ms: float = 1.0,
+            stat: str = "median_ms") -> Dict[str, Any]:
+    """
+    Por clave común: ratio new/base de `stat`. Regresión si supera 1 + tolerance y además empeora
+    al menos min_ms (los tiempos muy chicos son ruido); mejora en el caso simétrico. Un cambio
+    de score / status en las claves que lo tienen también se marca (los datos son determinísticos).
+    """
+    b, n = base.get("results", {}), new.get("results", {})
+    rows = []
+    for key in sorted(set(b) | set(n)):
+        if key not in n:
+            rows.append({"key": key, "status": "missing"})
+            continue
+        if key not in b:
+            rows.append({"key": key, "status": "new", "new": n[key].get(stat)})
+            continue
+        vb, vn = b[key].get(stat), n[key].get(stat)
+        if vb is None or vn is None:
+            rows.append({"key": key, "status": "skipped"})
+            continue
+        ratio = vn / vb if vb > 0 else float("inf")
+        status = "ok"
+        if ratio > 1 + tolerance and vn - vb >= min_ms:
+            status = "regression"
+        elif ratio < 1 - tolerance and vb - vn >= min_ms:
+            status = "improved"
+        row = {"key": key, "status": status, "base": vb, "new": vn, "ratio": round(ratio, 3)}
+        changed = [k for k in ("score", "best_score", "status", "n_trials")
+                   if k in b[key] and k in n[key] and b[key][k] != n[key][k]
+                   and not (isinstance(b[key][k], float) and abs(b[key][k] - n[key][k]) <= 1e-6)]
+        if changed:
+            row["changed"] = {k: [b[key][k], n[key][k]] for k in changed}
+        rows.append(row)
+    env_diff = {k: [base.get("meta", {}).get(k), new.get("meta", {}).get(k)]
+                for k in ("platform", "machine", "cpu_count", "python", "numpy", "opencv", "workers", "ocr")
+                if base.get("meta", {}).get(k) != new.get("meta", {}).get(k)}
+    count = lambda s: sum(r["status"] == s for r in rows)
+    return {"tolerance": tolerance, "min_ms": min_ms, "stat": stat, "env_diff": env_diff,
+            "regressions": count("regression"), "improved": count("improved"),
+            "changed": sum("changed" in r for r in rows), "rows": rows}
+
+def format_comparison(cmp: Dict[str, Any]) -> str:
+    lines = []
+    if cmp["env_diff"]:
+        lines.append(f"WARNING: different environment, timings may not be comparable: {cmp['env_diff']}")
+    order = {"regression": 0, "improved": 1, "ok": 2}
+    for r in sorted(cmp["rows"], key=lambda r: (order.get(r["status"], 3), -r.get("ratio", 0))):
+        if "ratio" in r:
+            line = f"{r['status']:<10} {r['key']:<48} {r['base']:>10.1f} → {r['new']:>10.1f} ms  x{r['ratio']:.2f}"
+        else:
+            line = f"{r['status']:<10} {r['key']}"
+        if "changed" in r:
+            line += f"  CHANGED {r['changed']}"
+        lines.append(line)
+    lines.append(f"{cmp['regressions']} regression(s), {cmp['improved']} improvement(s), {cmp['changed']} output change(s) "
+                 f"(tolerance {cmp['tolerance']:.0%}, min {cmp['min_ms']} ms, stat {cmp['stat']})")
+    return "\n".join(lines)
+
+def _load(path: str) -> Dict[str, Any]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+def _report(cmp: Dict[str, Any], out: str | None) -> int:
+    print(format_comparison(cmp))
+    if out:
+        Path(out).write_text(json.dumps(cmp, indent=2), encoding="utf-8")
+    return 1 if cmp["regressions"] or cmp["changed"] else 0
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de fases, métricas y runs sobre cheques sintéticos")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="Corre la suite y guarda el resultado (línea base)")
+    r.add_argument("--out", required=True, help="JSON de resultados")
+    r.add_argument("--widths", type=int, nargs="+", default=list(DEFAULT_WIDTHS), help="Anchos del cheque (alto = 7/16)")
+    r.add_argument("--seed", type=int, default=0)
+    r.add_argument("--repeat", type=int, default=5, help="Repeticiones por fase/métrica (más 1 de calentamiento)")
+    r.add_argument("--e2e-repeat", type=int, default=3, help="Procesos (runs cold) por espacio de búsqueda")
+    r.add_argument("--refs", type=int, default=3, help="Firmas de referencia")
+    r.add_argument("--only", nargs="+", choices=("phase", "metric", "e2e"), default=["phase", "metric", "e2e"])
+    r.add_argument("--spaces", nargs="+", choices=tuple(E2E_SPACES), default=list(E2E_SPACES))
+    r.add_argument("--workers", type=int, default=1, help="--workers de los runs E2E")
+    r.add_argument("--compare", default=None, help="Línea base contra la que comparar al terminar")
+    r.add_argument("--tolerance", type=float, default=0.25)
+    r.add_argument("--min-ms", type=float, default=1.0)
+    r.add_argument("--log-level", default="INFO")
+    c = sub.add_parser("compare", help="Compara dos resultados; exit 1 si hay regresiones")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--tolerance", type=float, default=0.25, help="Regresión: new > base * (1 + tolerance)")
+    c.add_argument("--min-ms", type=float, default=1.0, help="Ignorar diferencias menores (ms)")
+    c.add_argument("--stat", choices=("median_ms", "min_ms"), default="median_ms")
+    c.add_argument("--out", default=None, help="Guardar la comparación en JSON")
+    e = sub.add_parser("_e2e")  # interno: un espacio en un proceso con cache vacío
+    e.add_argument("--case", required=True)
+    e.add_argument("--space", required=True)
+    e.add_argument("--workers", type=int, default=1)
+    args = ap.parse_args()
+
+    if args.cmd == "_e2e":
+        print(json.dumps(_e2e_child(args.case, args.space, args.workers)))
+        return
+    if args.cmd == "compare":
+        sys.exit(_report(compare(_load(args.base), _load(args.new), args.tolerance, args.min_ms, args.stat), args.out))
+    setup_console_logging(args.log_level)
+    res = run_suite(args.widths, args.seed, args.repeat, args.e2e_repeat, args.refs, args.only, args.spaces, args.workers)
+    Path(args.out).write_text(json.dumps(res, indent=2), encoding="utf-8")
+    get_logger().info(f"Results: {args.out} ({len(res['results'])} entries)")
+    if args.compare:
+        sys.exit(_report(compare(_load(args.compare), res, args.tolerance, args.min_ms), None))
+
+if __name__ == "__main__":
+    main()
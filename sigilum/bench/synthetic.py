@@ -0,0 +1,189 @@
+# sigilum/bench/synthetic.py
+"""
+Cheques y firmas sintéticos, reproducibles desde una semilla (benchmarks; no son datos de entrenamiento).
+
+  python -m sigilum.bench.synthetic --out data/synthetic --seed 0 --size 1600 700 --refs 3
+
+Cada caso es `cheque.png` (papel con gradiente, marco, líneas de llenado, recuadro del importe,
+texto impreso, línea MICR, firma sobre la línea de firma, inclinación y ruido) + `firmas/*.png`
+(la misma firma con otro temblor de mano: escala, rotación, grosor y puntos de control).
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, List, Tuple
+import argparse, json
+import cv2, numpy as np
+
+_WORDS = ("BANCO", "NACIONAL", "PAGUESE", "A", "LA", "ORDEN", "DE", "LA", "SUMA", "PESOS", "CUENTA",
+          "CORRIENTE", "SUCURSAL", "CENTRO", "FECHA", "NO", "ENDOSABLE", "SERIE", "CHEQUE", "MONTO")
+
+def signature_strokes(seed: int, n_strokes: int | None = None) -> List[np.ndarray]:
+    """
+    Trazos de una firma en coords normalizadas [0,1]²: polilíneas suaves (Catmull-Rom sobre puntos
+    de control que avanzan a la derecha y oscilan en y) con algún lazo. Misma semilla → misma firma.
+    """
+    rng = np.random.default_rng(seed)
+    strokes = []
+    n = int(n_strokes or rng.integers(1, 4))
+    x0 = 0.0
+    for s in range(n):
+        k = int(rng.integers(6, 12))
+        xs = x0 + np.cumsum(rng.uniform(0.03, 0.12, k))
+        ys = 0.5 + 0.35 * np.sin(np.linspace(0, rng.uniform(2, 5) * np.pi, k) + rng.uniform(0, np.pi)) \
+            + rng.normal(0, 0.06, k)
+        pts = np.stack([xs, ys], axis=1)
+        # un lazo: se intercala un círculo chico alrededor de un punto de control
+        if rng.random() < 0.7:
+            i = int(rng.integers(1, k - 1))
+            r = rng.uniform(0.04, 0.1)
+            t = np.linspace(0, 2 * np.pi, 6, endpoint=False)
+            loop = pts[i] + np.stack([r * np.sin(t), -r * (1 - np.cos(t))], axis=1)
+            pts = np.concatenate([pts[:i + 1], loop, pts[i + 1:]])
+        strokes.append(_catmull_rom(pts, 12))
+        x0 = float(xs[-1]) + rng.uniform(0.02, 0.08)
+    # normalizar al cuadro unitario con margen
+    allp = np.concatenate(strokes)
+    lo, hi = allp.min(0), allp.max(0)
+    return [0.05 + 0.9 * (p - lo) / np.maximum(hi - lo, 1e-6) for p in strokes]
+
+def _catmull_rom(pts: np.ndarray, per_seg: int) -> np.ndarray:
+    p = np.concatenate([pts[:1], pts, pts[-1:]])
+    t = np.linspace(0, 1, per_seg, endpoint=False)[:, None]
+    segs = []
+    for i in range(1, len(p) - 2):
+        p0, p1, p2, p3 = p[i - 1], p[i], p[i + 1], p[i + 2]
+        segs.append(0.5 * (2 * p1 + (-p0 + p2) * t + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t ** 2
+                           + (-p0 + 3 * p1 - 3 * p2 + p3) * t ** 3))
+    segs.append(pts[-1:])
+    return np.concatenate(segs)
+
+def _jitter(strokes: List[np.ndarray], rng: np.random.Generator, amount: float) -> List[np.ndarray]:
+    """Variación de mano: rotación, escala anisótropa, corrimiento y ruido suave por punto."""
+    if amount <= 0:
+        return strokes
+    a = np.deg2rad(rng.normal(0, 3 * amount))
+    sx, sy = rng.normal(1, 0.05 * amount, 2)
+    R = np.array([[np.cos(a) * sx, -np.sin(a) * sy], [np.sin(a) * sx, np.cos(a) * sy]])
+    out = []
+    for p in strokes:
+        q = (p - 0.5) @ R.T + 0.5 + rng.normal(0, 0.01 * amount, 2)
+        noise = rng.normal(0, 0.006 * amount, p.shape)
+        out.append(q + cv2.GaussianBlur(noise.reshape(-1, 1, 2), (1, 9), 0).reshape(p.shape))
+    return out
+
+def render_signature(strokes: List[np.ndarray], size: Tuple[int, int], thickness: int = 3,
+                     ink: int = 30, paper: int = 255) -> np.ndarray:
+    """Firma en escala de grises (W, H): tinta oscura sobre papel, antialiasing."""
+    w, h = size
+    img = np.full((h, w), paper, np.uint8)
+    draw_strokes(img, strokes, (0, 0, w, h), thickness, ink)
+    return img
+
+def draw_strokes(img: np.ndarray, strokes: List[np.ndarray], box: Tuple[int, int, int, int], thickness: int, ink: int):
+    """Dibuja los trazos normalizados dentro de box = (x, y, w, h) de img (in place)."""
+    x, y, w, h = box
+    for p in strokes:
+        pts = np.round((p * [w, h] + [x, y]) * 16).astype(np.int32)  # 4 bits de subpixel
+        cv2.polylines(img, [pts], False, int(ink), max(1, int(thickness)), lineType=cv2.LINE_AA, shift=4)
+
+def reference_signatures(seed: int, n: int = 3, size: Tuple[int, int] = (480, 200), jitter: float = 1.0) -> List[np.ndarray]:
+    """n muestras de la firma `seed` (cada una con su propio temblor), como las de firmas_dir."""
+    base = signature_strokes(seed)
+    out = []
+    for i in range(n):
+        rng = np.random.default_rng([seed, 1, i])
+        out.append(render_signature(_jitter(base, rng, jitter), size, thickness=int(rng.integers(2, 5))))
+    return out
+
+def synthetic_cheque(seed: int = 0, size: Tuple[int, int] = (1600, 700), signer: int | None = None,
+                     skew_deg: float | None = None, noise: float = 6.0) -> Tuple[np.ndarray, Dict[str, object]]:
+    """
+    Cheque en escala de grises (W, H) y su descripción (caja de la firma, inclinación, firmante).
+    signer: semilla de la firma (default = seed); skew_deg: None → aleatoria en ±3°.
+    Todo escala con el ancho (referencia 1600 px), así los tamaños chicos y grandes son el mismo cheque.
+    """
+    rng = np.random.default_rng([seed, 0])
+    w, h = size
+    u = w / 1600.0  # unidad: px del cheque de referencia
+    px = lambda v: max(1, int(round(v * u)))
+    # papel: gradiente de iluminación + fondo de seguridad tenue
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    g0, gx, gy = rng.uniform(228, 245), rng.uniform(-12, 12), rng.uniform(-8, 8)
+    paper = g0 + gx * (xx / w - 0.5) + gy * (yy / h - 0.5) + 4 * np.sin(xx / px(9) + yy / px(23))
+    img = np.clip(paper, 0, 255).astype(np.uint8)
+    dark = lambda: int(rng.integers(20, 70))
+    font = cv2.FONT_HERSHEY_SIMPLEX
+
+    def text(s: str, x: float, y: float, scale: float, th: int = 2):
+        cv2.putText(img, s, (px(x), px(y)), font, scale * u, dark(), px(th), cv2.LINE_AA)
+
+    def words(k: int) -> str:
+        return " ".join(rng.choice(_WORDS, k))
+
+    cv2.rectangle(img, (px(20), px(20)), (w - px(20), h - px(20)), dark(), px(3))  # marco
+    text(words(2), 60, 90, 1.4, 3)                                                   # banco
+    text(words(3), 60, 130, 0.7)
+    # importe: recuadro arriba a la derecha con dígitos
+    bx0, by0 = px(1180), px(60)
+    cv2.rectangle(img, (bx0, by0), (w - px(60), by0 + px(70)), dark(), px(3))
+    text(f"$ {int(rng.integers(1000, 999999)):,}".replace(",", "."), 1200, 110, 1.2)
+    # líneas de llenado (páguese a / la suma de / fecha) con texto encima
+    for i, ly in enumerate((240, 320, 400)):
+        cv2.line(img, (px(260), px(ly)), (w - px(80), px(ly)), dark(), px(2))
+        text(words(1), 60, ly - 5, 0.8)
+        text(words(int(rng.integers(2, 5))).lower(), 300, ly - 12, 1.0)
+    # línea de firma abajo a la derecha: la firma la cruza
+    sx0, sx1, sy = px(980), w - px(120), px(600)
+    cv2.line(img, (sx0, sy), (sx1, sy), dark(), px(2))
+    text("FIRMA", 1240, 635, 0.6)
+    signer = seed if signer is None else signer
+    base = signature_strokes(signer)
+    sig_box = (sx0 + px(20), sy - px(150), sx1 - sx0 - px(40), px(170))
+    draw_strokes(img, _jitter(base, np.random.default_rng([signer, 2, seed]), 1.0), sig_box, px(3.5), int(rng.integers(10, 50)))
+    # línea MICR
+    micr = "".join(str(d) for d in rng.integers(0, 10, 24))
+    text(f"|:{micr[:8]}|: {micr[8:18]}: {micr[18:]}", 60, 670, 0.9, 2)
+    # inclinación de escaneo, desenfoque y ruido de sensor
+    skew = float(rng.uniform(-3, 3)) if skew_deg is None else float(skew_deg)
+    if skew:
+        M = cv2.getRotationMatrix2D((w / 2, h / 2), skew, 1.0)
+        img = cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    img = cv2.GaussianBlur(img, (3, 3), 0.6)
+    if noise > 0:
+        img = np.clip(img.astype(np.float32) + rng.normal(0, noise, img.shape), 0, 255).astype(np.uint8)
+    return img, {"seed": seed, "signer": signer, "size": [w, h], "skew_deg": round(skew, 3),
+                 "signature_box": [int(v) for v in sig_box]}
+
+def write_case(out_dir: str | Path, seed: int = 0, size: Tuple[int, int] = (1600, 700), n_refs: int = 3,
+               impostor: bool = False) -> Dict[str, object]:
+    """
+    Escribe out_dir/cheque.png, out_dir/firmas/firma_XX.png y out_dir/case.json.
+    impostor: las referencias son de otro firmante (caso que debería terminar en REVIEW).
+    """
+    out = Path(out_dir)
+    (out / "firmas").mkdir(parents=True, exist_ok=True)
+    cheque, desc = synthetic_cheque(seed, size)
+    cv2.imwrite(str(out / "cheque.png"), cheque)
+    signer = seed + 1000 if impostor else seed
+    for i, ref in enumerate(reference_signatures(signer, n_refs)):
+        cv2.imwrite(str(out / "firmas" / f"firma_{i + 1:02d}.png"), ref)
+    desc.update({"refs_signer": signer, "n_refs": n_refs, "cheque": str(out / "cheque.png"),
+                 "firmas_dir": str(out / "firmas")})
+    (out / "case.json").write_text(json.dumps(desc, indent=2), encoding="utf-8")
+    return desc
+
+def main():
+    ap = argparse.ArgumentParser(description="Genera cheques y firmas sintéticos reproducibles")
+    ap.add_argument("--out", required=True, help="Directorio de salida (un subdirectorio por caso)")
+    ap.add_argument("--seed", type=int, default=0, help="Semilla del primer caso")
+    ap.add_argument("--n", type=int, default=1, help="Casos (semillas seed..seed+n-1)")
+    ap.add_argument("--size", type=int, nargs=2, default=(1600, 700), metavar=("W", "H"))
+    ap.add_argument("--refs", type=int, default=3, help="Firmas de referencia por caso")
+    ap.add_argument("--impostor", action="store_true", help="Referencias de otro firmante")
+    args = ap.parse_args()
+    for s in range(args.seed, args.seed + args.n):
+        desc = write_case(Path(args.out) / f"case_{s:04d}", s, tuple(args.size), args.refs, args.impostor)
+        print(json.dumps(desc))
+
+if __name__ == "__main__":
+    main()
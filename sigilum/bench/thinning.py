@@ -0,0 +1,130 @@
+# sigilum/bench/thinning.py
+"""
+Benchmark de backends de esqueletización: tiempo por imagen y concordancia de salidas.
+
+  python -m sigilum.bench.thinning                                   # trazos sintéticos
+  python -m sigilum.bench.thinning --images "runs/<run>/trials/*/stages/final.png" --out thinning.json
+
+Compara lut (Zhang-Suen / Guo-Hall) contra ximgproc (debe ser idéntico pixel a pixel) y
+contra skimage / morph (otro algoritmo: se reporta la concordancia, no igualdad).
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, Dict, List
+import argparse, glob, json, statistics, time
+import cv2, numpy as np
+
+import sigilum.phases  # registra fases
+from sigilum.phases.skeletonize import SkeletonizationPhase, _to_binary
+from sigilum.utils.thinning import thin
+
+# (a, b): ¿se espera salida idéntica?
+PAIRS = [
+    ("lut_zhang_suen", "ximgproc_zhang_suen", True),
+    ("lut_guo_hall", "ximgproc_guo_hall", True),
+    ("lut_zhang_suen", "skimage", False),
+    ("morph", "skimage", False),
+]
+
+def backends() -> Dict[str, Callable[[np.ndarray], np.ndarray]]:
+    """Backends disponibles en este entorno: nombre → f(binaria 0/255) → esqueleto 0/255."""
+    out: Dict[str, Callable] = {
+        "lut_zhang_suen": lambda bw: thin(bw, "zhang_suen"),
+        "lut_guo_hall": lambda bw: thin(bw, "guo_hall"),
+        "morph": lambda bw: SkeletonizationPhase().apply(bw, method="morph", resize_before=False, max_ms=0, max_iter=0),
+    }
+    try:
+        from skimage.morphology import skeletonize
+        out["skimage"] = lambda bw: skeletonize(bw > 0).astype("uint8") * 255
+    except ImportError:
+        pass
+    if hasattr(cv2, "ximgproc"):
+        out["ximgproc_zhang_suen"] = lambda bw: cv2.ximgproc.thinning(bw, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN)
+        out["ximgproc_guo_hall"] = lambda bw: cv2.ximgproc.thinning(bw, thinningType=cv2.ximgproc.THINNING_GUOHALL)
+    return out
+
+def synthetic_strokes(n: int = 8, size=(256, 256), seed: int = 0) -> List[np.ndarray]:
+    """Trazos tipo firma (polilíneas y arcos de grosor 2–8 px), blancos sobre negro, reproducibles."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    imgs = []
+    for _ in range(n):
+        img = np.zeros((h, w), np.uint8)
+        for _ in range(int(rng.integers(2, 6))):
+            pts = np.stack([rng.integers(0, w, 5), rng.integers(0, h, 5)], axis=1).astype(np.int32)
+            cv2.polylines(img, [pts], False, 255, int(rng.integers(2, 9)), lineType=cv2.LINE_8)
+        for _ in range(int(rng.integers(0, 3))):
+            c = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+            axes = (int(rng.integers(8, w // 3)), int(rng.integers(8, h // 3)))
+            cv2.ellipse(img, c, axes, float(rng.uniform(0, 180)), 0, float(rng.uniform(90, 360)), 255, int(rng.integers(2, 7)))
+        imgs.append(img)
+    return imgs
+
+def load_images(pattern: str, size=None) -> List[np.ndarray]:
+    """Imágenes del glob como binaria 0/255 con el trazo en blanco (minoría)."""
+    imgs = []
+    for p in sorted(glob.glob(pattern)):
+        img = cv2.imread(p, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            continue
+        if size:
+            img = cv2.resize(img, tuple(size), interpolation=cv2.INTER_AREA)
+        bw = _to_binary(img)
+        imgs.append(255 - bw if bw.mean() > 127 else bw)
+    return imgs
+
+def _agreement(a: np.ndarray, b: np.ndarray) -> Dict[str, float]:
+    a, b = a > 0, b > 0
+    union = int((a | b).sum())
+    return {"identical": bool(np.array_equal(a, b)), "iou": round(float((a & b).sum()) / union, 4) if union else 1.0,
+            "diff_px": int((a ^ b).sum())}
+
+def run_benchmark(imgs: List[np.ndarray], repeat: int = 5) -> Dict[str, object]:
+    fns = backends()
+    times: Dict[str, List[float]] = {m: [] for m in fns}
+    outs: Dict[str, List[np.ndarray]] = {m: [] for m in fns}
+    for img in imgs:
+        for m, f in fns.items():
+            ts = []
+            for _ in range(max(1, repeat)):
+                t0 = time.perf_counter()
+                out = f(img)
+                ts.append((time.perf_counter() - t0) * 1000)
+            times[m].append(statistics.median(ts))
+            outs[m].append(out)
+    methods = {m: {"median_ms": round(statistics.median(ts), 3), "total_ms": round(sum(ts), 2)} for m, ts in times.items()}
+    pairs = []
+    for a, b, expect in PAIRS:
+        if a not in outs or b not in outs:
+            continue
+        per = [_agreement(x, y) for x, y in zip(outs[a], outs[b])]
+        pairs.append({"a": a, "b": b, "expect_identical": expect,
+                      "identical": sum(p["identical"] for p in per), "n": len(per),
+                      "mean_iou": round(statistics.mean(p["iou"] for p in per), 4) if per else None,
+                      "max_diff_px": max((p["diff_px"] for p in per), default=0)})
+    shapes = sorted({f"{i.shape[1]}x{i.shape[0]}" for i in imgs})
+    return {"n_images": len(imgs), "shapes": shapes, "repeat": repeat, "methods": methods, "pairs": pairs,
+            "missing": [m for m in ("skimage", "ximgproc_zhang_suen") if m not in fns]}
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de backends de esqueletización")
+    ap.add_argument("--images", default=None, help="Glob de imágenes (default: trazos sintéticos)")
+    ap.add_argument("--n", type=int, default=8, help="Imágenes sintéticas")
+    ap.add_argument("--size", type=int, nargs=2, default=None, metavar=("W", "H"),
+                    help="Redimensionar a W H (sintéticas: default 256 256)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="Guardar el resultado en JSON")
+    args = ap.parse_args()
+
+    imgs = load_images(args.images, args.size) if args.images else \
+        synthetic_strokes(args.n, tuple(args.size or (256, 256)), args.seed)
+    if not imgs:
+        raise SystemExit(f"Sin imágenes para {args.images}")
+    res = run_benchmark(imgs, args.repeat)
+    if args.out:
+        Path(args.out).write_text(json.dumps(res, indent=2), encoding="utf-8")
+    print(json.dumps(res, indent=2))
+
+if __name__ == "__main__":
+    main()
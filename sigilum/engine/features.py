@@ -0,0 +1,78 @@
+# sigilum/engine/features.py
+from __future__ import annotations
+from typing import Callable, Dict, Any, Tuple
+import cv2
+import numpy as np
+
+class FeatureSet:
+    """
+    Imágenes derivadas de una imagen a target_size (gris, float32, bordes, distance
+    transform, keypoints…), calculadas perezosamente y a lo sumo una vez.
+    Subclases definen de dónde sale `gray` (ver ImageFeatures / RefSignature).
+    """
+    size: Tuple[int, int]
+    _features: Dict[str, Any]
+
+    @property
+    def gray(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def feature(self, name: str, compute: Callable[[np.ndarray], Any]):
+        """Devuelve el feature `name`; si no existe lo calcula con compute(gray)."""
+        if name not in self._features:
+            self._features[name] = compute(self.gray)
+        return self._features[name]
+
+    def f32(self) -> np.ndarray:
+        return self.feature("f32", lambda g: g.astype("float32"))
+
+    def ncc_norm(self) -> np.ndarray:
+        def compute(g):
+            g = g.astype("float32")
+            return (g - g.mean()) / (g.std() + 1e-6)
+        return self.feature("ncc_norm", compute)
+
+    def edges(self, edge_thresh: int = 80) -> np.ndarray:
+        t = int(edge_thresh)
+        return self.feature(f"edges_{t}", lambda g: cv2.Canny(g, t, t * 2))
+
+    def dist(self, edge_thresh: int = 80) -> np.ndarray:
+        """Distance transform al borde más cercano (para chamfer)."""
+        e = self.edges(edge_thresh)
+        return self.feature(f"dist_{int(edge_thresh)}", lambda _: cv2.distanceTransform(255 - e, cv2.DIST_L2, 3))
+
+    def orb(self, n_features: int = 1000) -> Tuple[np.ndarray, np.ndarray]:
+        """Keypoints ORB como (pts float32 (K,2), descriptores uint8 (K,32))."""
+        def compute(g):
+            orb = cv2.ORB_create(nfeatures=int(n_features))
+            kps, desc = orb.detectAndCompute(g, None)
+            if desc is None or not kps:
+                return np.zeros((0, 2), np.float32), np.zeros((0, 32), np.uint8)
+            return np.float32([k.pt for k in kps]), desc
+        return self.feature(f"orb_{int(n_features)}", compute)
+
+    def bgr(self) -> np.ndarray:
+        return self.feature("bgr", lambda g: cv2.cvtColor(g, cv2.COLOR_GRAY2BGR))
+
+class ImageFeatures(FeatureSet):
+    """FeatureSet en memoria de un array (p.ej. la salida final de un trial)."""
+    def __init__(self, img: np.ndarray, size: Tuple[int, int], interpolation: int = cv2.INTER_LINEAR):
+        self.size = tuple(size)
+        self._src = img
+        self._interp = interpolation
+        self._features = {}
+
+    @property
+    def gray(self) -> np.ndarray:
+        if "gray" not in self._features:
+            img = self._src
+            if img.shape[:2] != (self.size[1], self.size[0]):
+                img = cv2.resize(img, self.size, interpolation=self._interp)
+            self._features["gray"] = img
+        return self._features["gray"]
+
+def as_features(x, size: Tuple[int, int]) -> FeatureSet:
+    """Envuelve un array suelto (compatibilidad con métricas llamadas par a par con arrays)."""
+    if isinstance(x, FeatureSet):
+        return x
+    return ImageFeatures(x, size, interpolation=cv2.INTER_AREA)
@@ -3,12 +3,33 @@ from typing import Callable, Dict, Any
 import numpy as np
 from skimage.metrics import structural_similarity as ssim
 import cv2
+from sigilum.engine.features import FeatureSet, as_features
+from sigilum.engine.references import ReferenceStore
 
 _METRICS: Dict[str, Callable[..., float]] = {}
+_BATCH_METRICS: Dict[str, Callable[..., np.ndarray]] = {}
+_COSTS: Dict[str, float] = {}
 
-def register_metric(name: str):
+def register_metric(name: str, cost: float = 1.0):
+    """
+    fn(a, b, size=..., **params) -> float en [0,1].
+    a/b son FeatureSet (candidato / RefSignature) o arrays sueltos.
+    cost: costo relativo por par (ncc = 1); el scorer evalúa las métricas de la más barata a la más cara.
+    """
     def deco(fn: Callable[..., float]):
         _METRICS[name] = fn
+        _COSTS[name] = float(cost)
+        return fn
+    return deco
+
+def register_batch_metric(name: str):
+    """
+    Versión one-vs-many de una métrica ya registrada:
+    fn_batch(candidate, refs, size=..., **params) -> np.ndarray (N,) con scores en [0,1].
+    `refs` es un stack (N, H, W) o un ReferenceStore.
+    """
+    def deco(fn: Callable[..., np.ndarray]):
+        _BATCH_METRICS[name] = fn
         return fn
     return deco
 
@@ -17,67 +38,116 @@ def get_metric(name: str) -> Callable[..., float]:
         raise KeyError(f"Métrica '{name}' no registrada. {list(_METRICS)}")
     return _METRICS[name]
 
-@register_metric("ssim")
-def metric_ssim(a: np.ndarray, b: np.ndarray, win_size: int = 7, **_):
-    a, b = _resize_match(a, b)
-    score, _ = ssim(a, b, full=True, win_size=win_size)
+def get_batch_metric(name: str) -> Callable[..., np.ndarray]:
+    """Batch nativo si existe; si no, loop sobre la métrica par a par."""
+    if name in _BATCH_METRICS:
+        return _BATCH_METRICS[name]
+    fn = get_metric(name)
+    def loop(a, refs, size=(256, 256), **params):
+        a = as_features(a, size)  # features del candidato: una vez para todas las firmas
+        return np.array([float(fn(a, r, size=size, **params)) for r in refs], dtype="float64")
+    return loop
+
+def metric_cost(m: dict) -> float:
+    """Costo de una entrada del perfil: `cost` del YAML si está, si no el registrado."""
+    return float(m.get("cost", _COSTS.get(m["name"], 1.0)))
+
+def score_batch(name: str, a, refs, **params) -> np.ndarray:
+    return get_batch_metric(name)(a, refs, **params)
+
+def _refs_stack(refs, name: str, get: Callable[[FeatureSet], Any], size=(256, 256)) -> np.ndarray:
+    """Lado referencia batched: ReferenceStore (stack memoizado) o array (N, H, W)."""
+    if isinstance(refs, ReferenceStore):
+        return refs.stack(name, get)
+    return np.stack([get(as_features(r, size)) for r in refs])
+
+def _box_valid(x: np.ndarray, w: int) -> np.ndarray:
+    """Media móvil w×w en modo 'valid' sobre las 2 últimas dims (imágenes integrales, batched)."""
+    I = np.zeros(x.shape[:-2] + (x.shape[-2] + 1, x.shape[-1] + 1), dtype="float64")
+    I[..., 1:, 1:] = x.cumsum(-2).cumsum(-1)
+    s = I[..., w:, w:] - I[..., :-w, w:] - I[..., w:, :-w] + I[..., :-w, :-w]
+    return s / float(w * w)
+
+def _ssim_stats(f: FeatureSet, win_size: int):
+    # medias locales (ventanas completas, como crop(S, pad) de skimage)
+    def compute(g):
+        g = g.astype("float64")
+        return _box_valid(g, win_size), _box_valid(g * g, win_size)
+    return f.feature(f"ssim_{win_size}", compute)
+
+@register_metric("ssim", cost=25)
+def metric_ssim(a, b, win_size: int = 7, size=(256, 256), **_):
+    a, b = as_features(a, size), as_features(b, size)
+    score, _ = ssim(a.gray, b.gray, full=True, win_size=win_size)
     return float(max(0.0, min(1.0, score)))
 
-@register_metric("chamfer")
-def metric_chamfer(a: np.ndarray, b: np.ndarray, edge_thresh: int = 80, **_):
-    a, b = _resize_match(a, b)
-    ea = cv2.Canny(a, edge_thresh, edge_thresh * 2)
-    eb = cv2.Canny(b, edge_thresh, edge_thresh * 2)
-    da = cv2.distanceTransform(255 - ea, cv2.DIST_L2, 3)
-    db = cv2.distanceTransform(255 - eb, cv2.DIST_L2, 3)
+@register_batch_metric("ssim")
+def batch_ssim(a, refs, win_size: int = 7, size=(256, 256), **_):
+    """
+    SSIM one-vs-many con box filters (equivale a skimage: uniform filter, sample covariance,
+    data_range=255, media sobre la región sin bordes).
+    """
+    a = as_features(a, size)
+    st = _refs_stack(refs, f"ssim_{win_size}", lambda r: _ssim_stats(r, win_size), size)
+    uy, uyy = st[:, 0], st[:, 1]
+    y = _refs_stack(refs, "gray", lambda r: r.gray, size).astype("float64")
+    ux, uxx = _ssim_stats(a, win_size)
+    uxy = _box_valid(y * a.gray.astype("float64"), win_size)
+    NP = win_size ** 2
+    cov_norm = NP / (NP - 1.0)
+    vx, vy, vxy = cov_norm * (uxx - ux * ux), cov_norm * (uyy - uy * uy), cov_norm * (uxy - ux * uy)
+    C1, C2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    S = ((2 * ux * uy + C1) * (2 * vxy + C2)) / ((ux ** 2 + uy ** 2 + C1) * (vx + vy + C2))
+    return np.clip(S.mean(axis=(-2, -1)), 0.0, 1.0)
+
+@register_metric("chamfer", cost=2)
+def metric_chamfer(a, b, edge_thresh: int = 80, size=(256, 256), **_):
+    a, b = as_features(a, size), as_features(b, size)
+    ea, da = a.edges(edge_thresh), a.dist(edge_thresh)
+    eb, db = b.edges(edge_thresh), b.dist(edge_thresh)
     # distancia simétrica normalizada (menor mejor) -> score (mayor mejor)
     d = (da[eb > 0].mean() + db[ea > 0].mean()) / 2.0 if (eb > 0).any() and (ea > 0).any() else 1e6
     return float(1.0 / (1.0 + d))
 
-def _resize_match(a, b, size=(256, 256)):
-    if a.shape != size:
-        a = cv2.resize(a, size, interpolation=cv2.INTER_AREA)
-    if b.shape != size:
-        b = cv2.resize(b, size, interpolation=cv2.INTER_AREA)
-    return a, b
-
 @register_metric("ncc")
-def metric_ncc(a, b, **kwargs):
-    a, b = _resize_match(a, b, kwargs.get("size", (256,256)))
-    a = a.astype("float32"); b = b.astype("float32")
-    a = (a - a.mean()) / (a.std() + 1e-6)
-    b = (b - b.mean()) / (b.std() + 1e-6)
-    return float(np.clip((a*b).mean(), -1.0, 1.0) * 0.5 + 0.5)  # map [-1,1]->[0,1]
+def metric_ncc(a, b, size=(256, 256), **_):
+    a, b = as_features(a, size), as_features(b, size)
+    return float(np.clip((a.ncc_norm()*b.ncc_norm()).mean(), -1.0, 1.0) * 0.5 + 0.5)  # map [-1,1]->[0,1]
+
+@register_batch_metric("ncc")
+def batch_ncc(a, refs, size=(256, 256), **_):
+    a = as_features(a, size).ncc_norm()
+    b = _refs_stack(refs, "ncc_norm", lambda r: r.ncc_norm(), size)
+    return np.clip((b * a).mean(axis=(-2, -1)), -1.0, 1.0).astype("float64") * 0.5 + 0.5
 
 @register_metric("mse")
-def metric_mse(a, b, **kwargs):
-    a, b = _resize_match(a, b, kwargs.get("size", (256,256)))
-    mse = np.mean((a.astype("float32") - b.astype("float32"))**2)
+def metric_mse(a, b, size=(256, 256), **_):
+    a, b = as_features(a, size), as_features(b, size)
+    mse = np.mean((a.f32() - b.f32())**2)
     return float(1.0 / (1.0 + mse))  # menor error -> mayor score
 
-@register_metric("orb_inliers")
-def metric_orb_inliers(a, b, n_features: int = 1000, ransacReprojThreshold: float = 5.0, **kwargs):
-    a, b = _resize_match(a, b, kwargs.get("size", (256,256)))
-    orb = cv2.ORB_create(nfeatures=int(n_features))
-    ka, da = orb.detectAndCompute(a, None)
-    kb, db = orb.detectAndCompute(b, None)
-    if da is None or db is None or len(ka) < 4 or len(kb) < 4:
+@register_batch_metric("mse")
+def batch_mse(a, refs, size=(256, 256), **_):
+    a = as_features(a, size).f32()
+    b = _refs_stack(refs, "f32", lambda r: r.f32(), size)
+    mse = ((b - a) ** 2).mean(axis=(-2, -1)).astype("float64")
+    return 1.0 / (1.0 + mse)
+
+@register_metric("orb_inliers", cost=60)
+def metric_orb_inliers(a, b, n_features: int = 1000, ransacReprojThreshold: float = 5.0, size=(256, 256), **_):
+    a, b = as_features(a, size), as_features(b, size)
+    pa, da = a.orb(n_features)
+    pb, db = b.orb(n_features)
+    if len(pa) < 4 or len(pb) < 4:
         return 0.0
     bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
     ms = bf.match(da, db)
     if len(ms) < 8:
         return 0.0
-    ptsA = np.float32([ka[m.queryIdx].pt for m in ms]).reshape(-1,1,2)
-    ptsB = np.float32([kb[m.trainIdx].pt for m in ms]).reshape(-1,1,2)
+    ptsA = np.float32([pa[m.queryIdx] for m in ms]).reshape(-1,1,2)
+    ptsB = np.float32([pb[m.trainIdx] for m in ms]).reshape(-1,1,2)
     H, mask = cv2.findHomography(ptsA, ptsB, cv2.RANSAC, ransacReprojThreshold)
     if mask is None:
         return 0.0
     inlier_ratio = float(mask.sum() / (len(mask) + 1e-6))
-    return np.clip(inlier_ratio, 0.0, 1.0)
-
-def _resize_match(a, b, size=(256,256)):
-    if a.shape != size:
-        a = cv2.resize(a, size, interpolation=cv2.INTER_AREA)
-    if b.shape != size:
-        b = cv2.resize(b, size, interpolation=cv2.INTER_AREA)
-    return a, b
+    return float(np.clip(inlier_ratio, 0.0, 1.0))
@@ -0,0 +1,118 @@
+# sigilum/engine/parallel.py
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List
+import logging, os
+import multiprocessing as mp
+import cv2
+import numpy as np
+from sigilum.engine.trial_tree import build_trial_tree, TrialNode
+from sigilum.io.cache import cache_config, close_cache_on_worker_exit, configure_cache
+from sigilum.utils.logger import get_logger, setup_console_logging, add_file_logging
+
+CHUNKS_PER_WORKER = 4  # más chunks que workers → balanceo sin romper demasiado los prefijos compartidos
+
+# estado por proceso worker (lo arma _init_worker)
+_W: Dict[str, Any] = {}
+
+def dfs_trial_order(pipelines: List[List[dict]]) -> List[int]:
+    """trial_idx en orden DFS del trie: trials contiguos comparten prefijos."""
+    order: List[int] = []
+    def visit(node: TrialNode):
+        order.extend(node.trials)
+        for c in node.children.values():
+            visit(c)
+    visit(build_trial_tree(pipelines))
+    return order
+
+def split_chunks(order: List[int], workers: int) -> List[List[int]]:
+    n = max(1, min(len(order), workers * CHUNKS_PER_WORKER))
+    size = -(-len(order) // n)
+    return [order[i:i + size] for i in range(0, len(order), size)]
+
+def opencv_threads_per_worker(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def _init_worker(cv_threads: int, log_level: str, logfile: str | None, cache_cfg: dict):
+    cv2.setNumThreads(cv_threads)
+    setup_console_logging(log_level)
+    if logfile:
+        add_file_logging(logfile)
+    configure_cache(**cache_cfg)
+    close_cache_on_worker_exit()
+    _W.update({"shms": {}, "call": None})
+
+def _attach(shm_name: str, shape, dtype: str) -> np.ndarray:
+    """Imagen publicada por el padre (una vez por imagen, no por chunk), read-only."""
+    if shm_name not in _W["shms"]:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        img = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        img.flags.writeable = False  # compartida read-only entre workers
+        _W["shms"][shm_name] = (shm, img)
+    return _W["shms"][shm_name][1]
+
+def _run_chunk(worker_fn: Callable, chunk: List[int], call_id: int, image: tuple, payload: dict):
+    # el payload se deserializa por chunk; dentro de una misma llamada se reusa el primero, así
+    # lo que worker_fn le cuelga (refs cargadas) sirve para los demás chunks de ese worker
+    if _W["call"] is None or _W["call"][0] != call_id:
+        _W["call"] = (call_id, payload)
+    return worker_fn(_attach(*image), chunk, _W["call"][1])
+
+class WorkerPool:
+    """
+    Pool de procesos (spawn) que vive todo el run: las rondas de halving, la ronda gruesa y cada
+    batch de tpe le mandan chunks sin volver a levantar procesos (ni reimportar cv2/numpy).
+    Cada imagen distinta se publica una vez en shared memory y se libera al cerrar el pool.
+    """
+    def __init__(self, workers: int, logfile: str | None = None):
+        log = get_logger()
+        self.workers = max(1, int(workers))
+        cv_threads = opencv_threads_per_worker(self.workers)
+        level = logging.getLevelName(log.level) if log.level else "INFO"
+        self._ex = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"),
+                                       initializer=_init_worker,
+                                       initargs=(cv_threads, level, logfile, cache_config()))
+        self._published: Dict[int, tuple] = {}  # id(img) → (img, shm); img retenida: el id no se recicla
+        self._calls = 0
+        log.info(f"Process pool: {self.workers} worker(s), cv2 threads/worker={cv_threads}")
+
+    def _publish(self, img: np.ndarray) -> tuple:
+        if id(img) not in self._published:
+            arr = np.ascontiguousarray(img)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            self._published[id(img)] = (img, shm, (shm.name, arr.shape, arr.dtype.str))
+        return self._published[id(img)][2]
+
+    def map(self, img: np.ndarray, chunks: List[List[int]], worker_fn: Callable, payload: dict) -> List[Any]:
+        """worker_fn(img, chunk, payload) por chunk; resultados en el orden de `chunks`."""
+        image = self._publish(img)
+        self._calls += 1
+        get_logger().debug(f"Process pool call {self._calls}: {len(chunks)} chunk(s)")
+        futures = [self._ex.submit(_run_chunk, worker_fn, c, self._calls, image, payload) for c in chunks]
+        return [f.result() for f in futures]
+
+    def close(self):
+        self._ex.shutdown(wait=True)
+        for _, shm, _ in self._published.values():
+            shm.close()
+            shm.unlink()
+        self._published.clear()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def run_chunks_parallel(img: np.ndarray, chunks: List[List[int]], worker_fn: Callable,
+                        payload: dict, workers: int, logfile: str | None = None) -> List[Any]:
+    """
+    Corre worker_fn(img, chunk, payload) para cada chunk en un pool de procesos (spawn) de un
+    solo uso; para varias llamadas en el mismo run, WorkerPool. worker_fn debe ser una función
+    de módulo (picklable).
+    """
+    with WorkerPool(workers, logfile) as pool:
+        return pool.map(img, chunks, worker_fn, payload)
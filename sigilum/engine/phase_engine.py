@@ -1,40 +1,139 @@
 # sigilum/engine/phase_engine.py
 from __future__ import annotations
 from typing import List, Dict, Any
-import time
+import json, time
+import numpy as np
 from sigilum.phases.base import get_phase_cls
-from sigilum.io.cache import cache_key, load_from_cache, save_to_cache
+from sigilum.io.cache import cache_key, root_key as image_root_key, has_cached, load_from_cache, save_to_cache
 from sigilum.utils.logger import get_logger
+from sigilum.utils.profiler import span
 
-def run_pipeline(img, steps: List[Dict[str, Any]], use_cache: bool = True):
+def _snapshot(idx: int, phase_name: str, params: dict, key: str, ms: float, cache: str) -> dict:
+    # cache: "hit" (cargada), "miss" (ejecutada) o "skip" (ni cargada ni ejecutada)
+    return {"idx": idx, "phase": phase_name, "params": params, "cache_key": key, "ms": round(ms, 1), "cache": cache}
+
+def _meta_key(key: str) -> str:
+    return f"Meta_{key}"
+
+def save_meta(key: str, meta: dict | None):
+    if meta is not None:
+        save_to_cache(_meta_key(key), np.frombuffer(json.dumps(meta, sort_keys=True).encode("utf-8"), dtype=np.uint8))
+
+def load_meta(key: str) -> dict | None:
+    """Metadatos (PhaseBase.describe) guardados con la salida del step `key`, si hay."""
+    raw = load_from_cache(_meta_key(key))
+    return json.loads(np.asarray(raw).tobytes().decode("utf-8")) if raw is not None else None
+
+def _with_meta(snap: dict, meta: dict | None) -> dict:
+    if meta is not None:
+        snap["meta"] = meta
+    return snap
+
+def step_key(step: Dict[str, Any], parent_key: str) -> str:
+    # solo params efectivos: variar un param que el modo ignora no cambia la key
+    phase = get_phase_cls(step["phase"])()
+    return cache_key(phase.name, phase.effective_params(step.get("params", {})), parent_key)
+
+def chain_keys(steps: List[Dict[str, Any]], parent_key: str) -> List[str]:
+    keys = []
+    for step in steps:
+        parent_key = step_key(step, parent_key)
+        keys.append(parent_key)
+    return keys
+
+def load_step(step: Dict[str, Any], idx: int, key: str):
+    """
+    Carga desde cache la salida de un step.
+    Devuelve: (imagen, snapshot) o (None, None) si no está.
+    """
+    log = get_logger()
+    phase_name = get_phase_cls(step["phase"])().name
+    t0 = time.perf_counter()
+    with span(phase_name) as prof:
+        out = load_from_cache(key)
+        # la búsqueda fallida no cuenta como miss: ese lo registra compute_step
+        prof["cache"] = "hit" if out is not None else "lookup"
+        if out is not None:
+            prof["out_shape"] = list(out.shape)
+    if out is None:
+        return None, None
+    dt = (time.perf_counter() - t0) * 1000
+    log.debug(f"[{idx:02d}] {phase_name} (cache hit) {dt:.1f} ms")
+    meta = load_meta(key) if get_phase_cls(step["phase"]).has_meta() else None
+    return out, _with_meta(_snapshot(idx, phase_name, step.get("params", {}), key, dt, "hit"), meta)
+
+def compute_step(img, step: Dict[str, Any], idx: int, key: str, use_cache: bool = True):
+    """
+    Ejecuta un step sobre img y guarda el resultado en cache.
+    Devuelve: (imagen_resultado, snapshot[dict])
+    """
+    log = get_logger()
+    params = step.get("params", {})
+    phase = get_phase_cls(step["phase"])()
+    t0 = time.perf_counter()
+    log.debug(f"[{idx:02d}] {phase.name} start …")
+    with span(phase.name, img=img, cache="miss") as prof:
+        out = phase.apply(img, **params)
+        prof["out_shape"] = list(np.shape(out))
+    meta = phase.describe(img, out, **params)
+    if use_cache:
+        save_to_cache(key, out)
+        save_meta(key, meta)
+    dt = (time.perf_counter() - t0) * 1000
+    log.debug(f"[{idx:02d}] {phase.name} done in {dt:.1f} ms (cache miss)")
+    return out, _with_meta(_snapshot(idx, phase.name, params, key, dt, "miss"), meta)
+
+def compute_steps(img, steps: List[Dict[str, Any]], idxs: List[int], keys: List[str], use_cache: bool = True):
+    """
+    Como compute_step para varios steps de la MISMA fase sobre la misma entrada (hermanos del
+    trie), en una llamada a apply_many: lo compartible entre valores se calcula una vez.
+    El tiempo total se reparte entre los steps. Devuelve: [(imagen, snapshot), ...]
+    """
+    log = get_logger()
+    phase = get_phase_cls(steps[0]["phase"])()
+    t0 = time.perf_counter()
+    with span(phase.name, img=img, cache="miss", batch=len(steps)) as prof:
+        outs = phase.apply_many(img, [st.get("params", {}) for st in steps])
+        prof["out_shape"] = list(np.shape(outs[0])) if outs else None
+    metas = [phase.describe(img, out, **st.get("params", {})) for out, st in zip(outs, steps)]
+    if use_cache:
+        for key, out, meta in zip(keys, outs, metas):
+            save_to_cache(key, out)
+            save_meta(key, meta)
+    dt = (time.perf_counter() - t0) * 1000
+    log.debug(f"[{idxs[0]:02d}] {phase.name} ×{len(steps)} done in {dt:.1f} ms (apply_many)")
+    return [(out, _with_meta({**_snapshot(idx, phase.name, st.get("params", {}), key, dt / len(steps), "miss"),
+                              "batch": len(steps)}, meta))
+            for out, st, idx, key, meta in zip(outs, steps, idxs, keys, metas)]
+
+def run_pipeline(img, steps: List[Dict[str, Any]], use_cache: bool = True, root_key: str | None = None):
     """
     steps: [{"phase": "DeskewBorder", "params": {...}}, ...]
+    Busca primero el step más profundo en cache, carga solo esa imagen y ejecuta el resto.
     Devuelve: (imagen_resultado, snapshots[list[dict]])
     """
     log = get_logger()
+    keys = chain_keys(steps, root_key or image_root_key(img))
     out = img
     snapshots = []
+    start = 0
     log.debug(f"Pipeline start | {len(steps)} fases")
-    for i, step in enumerate(steps, start=1):
-        phase_name = step["phase"]
-        params = step.get("params", {})
-        cls = get_phase_cls(phase_name)
-        phase = cls()
-
-        t0 = time.perf_counter()
-        key = cache_key(phase.name, params, out)
-        cached = load_from_cache(key) if use_cache else None
-        if cached is not None:
-            out = cached
-            dt = (time.perf_counter() - t0) * 1000
-            log.debug(f"[{i:02d}] {phase.name} (cache hit) {dt:.1f} ms")
-        else:
-            log.debug(f"[{i:02d}] {phase.name} start …")
-            out = phase.apply(out, **params)
-            save_to_cache(key, out)
-            dt = (time.perf_counter() - t0) * 1000
-            log.debug(f"[{i:02d}] {phase.name} done in {dt:.1f} ms (cache miss)")
-
-        snapshots.append({"idx": i, "phase": phase.name, "params": params, "cache_key": key, "ms": round(dt,1)})
+    if use_cache:
+        for j in range(len(steps) - 1, -1, -1):
+            if not has_cached(keys[j]):
+                continue
+            cached, snap = load_step(steps[j], j + 1, keys[j])
+            if cached is None:
+                continue
+            for i in range(j):
+                cls = get_phase_cls(steps[i]["phase"])
+                snapshots.append(_with_meta(_snapshot(i + 1, cls().name, steps[i].get("params", {}), keys[i], 0.0, "skip"),
+                                            load_meta(keys[i]) if cls.has_meta() else None))
+            snapshots.append(snap)
+            out, start = cached, j + 1
+            break
+    for i in range(start, len(steps)):
+        out, snap = compute_step(out, steps[i], i + 1, keys[i], use_cache=use_cache)
+        snapshots.append(snap)
     log.debug("Pipeline end")
     return out, snapshots
@@ -0,0 +1,135 @@
+# sigilum/engine/references.py
+from __future__ import annotations
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, Any
+import os
+import cv2
+import numpy as np
+from sigilum.engine.features import FeatureSet
+from sigilum.io.loader import load_image_gray
+from sigilum.utils.hashing import sha1_file
+from sigilum.utils.logger import get_logger
+
+REFS_ROOT = Path(".cache") / "refs"
+WARM_MAX_REFS = 64  # features de firmas retenidos en memoria entre runs del mismo proceso (batch/serve)
+
+# (sha1, size, root) -> dict de features compartido por las RefSignature de esa firma
+_WARM: "OrderedDict[Tuple[str, Tuple[int, int], str], Dict[str, Any]]" = OrderedDict()
+
+class RefSignature(FeatureSet):
+    """
+    Firma de referencia con sus features (lado referencia de las métricas) memoizados.
+    Se persisten en `<root>/<sha1_file>_<W>x<H>.npz`, así el trabajo sobre la firma
+    se hace una vez por firma y no una vez por trial.
+    """
+    _TRANSIENT = {"bgr"}  # baratos de recalcular: no se persisten
+
+    def __init__(self, path: str | Path, size: Tuple[int, int], root: Path = REFS_ROOT):
+        self.path = Path(path)
+        self.name = self.path.name
+        self.size = tuple(size)
+        self.sha1 = sha1_file(self.path)
+        self.npz_path = Path(root) / f"{self.sha1}_{self.size[0]}x{self.size[1]}.npz"
+        self._dirty = False
+        warm_key = (self.sha1, self.size, str(root))
+        if warm_key in _WARM:  # misma firma ya vista por este proceso (otro cheque de la cuenta)
+            _WARM.move_to_end(warm_key)
+            self._features = _WARM[warm_key]
+            return
+        self._features: Dict[str, Any] = {}
+        if self.npz_path.exists():
+            self._load()
+        _WARM[warm_key] = self._features
+        while len(_WARM) > WARM_MAX_REFS:
+            _WARM.popitem(last=False)
+
+    def _load(self):
+        try:
+            with np.load(self.npz_path, allow_pickle=False) as z:
+                flat = {k: z[k] for k in z.files}
+        except Exception as e:
+            get_logger().warning(f"Ref features ilegibles ({self.npz_path}): {e}; se recalculan")
+            return
+        groups: Dict[str, Dict[int, np.ndarray]] = {}
+        for k, v in flat.items():
+            if "#" in k:
+                name, i = k.rsplit("#", 1)
+                groups.setdefault(name, {})[int(i)] = v
+            else:
+                self._features[k] = v
+        for name, parts in groups.items():
+            self._features[name] = tuple(parts[i] for i in sorted(parts))
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Firma en gris redimensionada a target_size (misma interpolación que el candidato)."""
+        if "gray" not in self._features:
+            self._features["gray"] = cv2.resize(load_image_gray(self.path), self.size)
+            self._dirty = True
+        return self._features["gray"]
+
+    def feature(self, name: str, compute: Callable[[np.ndarray], Any]):
+        """Como FeatureSet.feature, pero marca los features nuevos para persistir."""
+        if name not in self._features:
+            self._dirty = True
+        return super().feature(name, compute)
+
+    def save(self):
+        if not self._dirty:
+            return
+        flat: Dict[str, np.ndarray] = {}
+        for k, v in self._features.items():
+            if k in self._TRANSIENT:
+                continue
+            if isinstance(v, tuple):
+                flat.update({f"{k}#{i}": np.asarray(x) for i, x in enumerate(v)})
+            else:
+                flat[k] = np.asarray(v)
+        self.npz_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.npz_path.with_name(f"{self.npz_path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, **flat)
+        os.replace(tmp, self.npz_path)  # atómico: otros procesos ven el npz viejo o el nuevo
+        self._dirty = False
+
+class ReferenceStore:
+    """Firmas de referencia de una cuenta (cuenta_id), en el orden de `firmas_paths`."""
+    def __init__(self, cuenta_id: str, firmas_paths: List[str | Path], size: Tuple[int, int], root: Path = REFS_ROOT):
+        self.cuenta_id = cuenta_id
+        self.size = tuple(size)
+        self.refs = [RefSignature(p, self.size, root=root) for p in firmas_paths]
+        self._stacks: Dict[str, np.ndarray] = {}
+        cached = sum(1 for r in self.refs if r.npz_path.exists())
+        get_logger().info(f"Reference store cuenta={cuenta_id}: {len(self.refs)} firma(s), {cached} con features en disco")
+
+    def __iter__(self):
+        return iter(self.refs)
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __getitem__(self, i: int) -> RefSignature:
+        return self.refs[i]
+
+    def stack(self, name: str, get: Callable[[FeatureSet], np.ndarray]) -> np.ndarray:
+        """Feature `name` de todas las firmas (get(ref)) apilado en un array (N, ...), memoizado."""
+        if name not in self._stacks:
+            self._stacks[name] = np.stack([get(r) for r in self.refs])
+        return self._stacks[name]
+
+    def subset(self, idxs) -> "ReferenceStore":
+        """Vista sobre las firmas `idxs` (mismo orden); sus stacks son cortes de los de este store."""
+        return _ReferenceSubset(self, idxs)
+
+    def save(self):
+        for r in self.refs:
+            r.save()
+
+class _ReferenceSubset(ReferenceStore):
+    def __init__(self, parent: ReferenceStore, idxs):
+        self.cuenta_id, self.size, self._parent = parent.cuenta_id, parent.size, parent
+        self._idxs = np.asarray(idxs, dtype=np.intp)
+        self.refs = [parent.refs[i] for i in self._idxs]
+
+    def stack(self, name: str, get: Callable[[FeatureSet], np.ndarray]) -> np.ndarray:
+        return self._parent.stack(name, get)[self._idxs]
@@ -0,0 +1,204 @@
+# sigilum/engine/search.py
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+import math, random
+from sigilum.engine.trial_generator import TrialSpace, sample_indices
+
+# claves de search_spaces.yaml que no son fases
+SEARCH_KEYS = {"max_combinations", "trials", "strategy", "sampling"}
+
+DEFAULT_HALVING = {
+    "eta": 3,             # cada ronda se queda con ~1/eta de los candidatos
+    "min_survivors": 2,   # nunca menos (el status compara contra el 2do del leaderboard)
+    "rounds": [{"metrics": ["ncc", "mse"], "target_size": [64, 64]}],
+}
+
+DEFAULT_TPE = {
+    "budget": 50,         # pipelines a ejecutar como máximo
+    "n_startup": 10,      # primeros trials por Halton antes de usar el modelo
+    "batch": 4,           # propuestas por iteración (se evalúan juntas, en el trie / pool)
+    "gamma": 0.25,        # fracción de trials "buenos" que modela l(x)
+    "n_candidates": 64,   # muestras de l(x) entre las que se elige el mejor l/g
+    "patience": 20,       # cortar si en tantos trials el mejor score no mejora…
+    "min_delta": 1e-4,    # …en al menos esto
+    "seed": 0,
+}
+
+DEFAULT_COARSE = {
+    "scale": 0.5,         # todos los trials sobre el cheque escalado (0.5 = 1/2, 0.25 = 1/4)
+    "topk": 5,            # mejores K de la ronda gruesa que se confirman a resolución completa
+    "metrics": None,      # métricas de la ronda gruesa (default: todo el perfil)
+    "audit": False,       # confirmar TODOS a resolución completa (calibra la concordancia)
+}
+
+def search_strategy(search: dict) -> Dict[str, Any]:
+    """
+    Estrategia de search_spaces.yaml (`strategy:`), con defaults completos:
+      grid               → todos los pipelines con el perfil completo de métricas (default)
+      successive_halving → rondas baratas (`rounds`: métricas + target_size) que filtran
+                           candidatos; los sobrevivientes se evalúan con el perfil completo
+      tpe                → búsqueda adaptativa: propone los próximos params a partir de los
+                           scores ya vistos, con presupuesto de trials y corte por meseta
+      coarse_to_fine     → todos los trials sobre el cheque a `scale` (params de tamaño escalados
+                           por las scale_rules de cada fase); los mejores `topk` se confirman a
+                           resolución completa y se reporta la concordancia de rankings
+    """
+    s = search.get("strategy") or {"name": "grid"}
+    if isinstance(s, str):
+        s = {"name": s}
+    name = s.get("name", "grid")
+    if name == "grid":
+        return {"name": "grid"}
+    if name == "successive_halving":
+        out = {**DEFAULT_HALVING, **s}
+        if float(out["eta"]) <= 1:
+            raise ValueError("successive_halving: eta debe ser > 1")
+        if int(out["min_survivors"]) < 1:
+            raise ValueError("successive_halving: min_survivors debe ser ≥ 1")
+        if not isinstance(out["rounds"], list) or not all(isinstance(r, dict) and r.get("metrics") for r in out["rounds"]):
+            raise ValueError("successive_halving: rounds debe ser una lista de {metrics: [...], target_size: [W, H]}")
+        return out
+    if name == "tpe":
+        out = {**DEFAULT_TPE, **s}
+        if not 0 < float(out["gamma"]) < 1:
+            raise ValueError("tpe: gamma debe estar en (0, 1)")
+        for k in ("budget", "batch", "n_candidates"):
+            if int(out[k]) < 1:
+                raise ValueError(f"tpe: {k} debe ser ≥ 1")
+        return out
+    if name == "coarse_to_fine":
+        out = {**DEFAULT_COARSE, **s}
+        if not 0 < float(out["scale"]) < 1:
+            raise ValueError("coarse_to_fine: scale debe estar en (0, 1)")
+        if int(out["topk"]) < 1:
+            raise ValueError("coarse_to_fine: topk debe ser ≥ 1")
+        return out
+    raise ValueError(f"Strategy desconocida: {name} (grid|successive_halving|tpe|coarse_to_fine)")
+
+def select_survivors(scores: Dict[int, float], eta: float, min_survivors: int) -> List[int]:
+    """Mejores ceil(n/eta) trials (al menos min_survivors); empates por trial_idx. Devuelve ids ordenados."""
+    ranked = sorted(scores, key=lambda t: (-scores[t], t))
+    keep = max(int(min_survivors), math.ceil(len(ranked) / float(eta)))
+    return sorted(ranked[:keep])
+
+def _ranks(vals: List[float]) -> List[float]:
+    """Rangos 1..n (empates: rango promedio)."""
+    order = sorted(range(len(vals)), key=vals.__getitem__)
+    ranks = [0.0] * len(vals)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and vals[order[j + 1]] == vals[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2.0 + 1
+        i = j + 1
+    return ranks
+
+def rank_agreement(coarse: Dict[int, float], fine: Dict[int, float], topk: int | None = None) -> Dict[str, Any]:
+    """
+    Concordancia entre los rankings de dos niveles sobre los trials evaluados en ambos:
+    Spearman, Kendall tau-b, si coincide el mejor y (con topk) qué fracción del top-K fino
+    ya estaba en el top-K grueso. None donde no hay pares suficientes para calcularlo.
+    """
+    ids = sorted(set(coarse) & set(fine))
+    n = len(ids)
+    out: Dict[str, Any] = {"n": n, "spearman": None, "kendall": None,
+                           "top1_agrees": (max(ids, key=lambda t: (coarse[t], -t)) == max(ids, key=lambda t: (fine[t], -t)))
+                           if n else None}
+    if n >= 2:
+        a, b = [coarse[t] for t in ids], [fine[t] for t in ids]
+        ra, rb = _ranks(a), _ranks(b)
+        ma, mb = sum(ra) / n, sum(rb) / n
+        cov = sum((x - ma) * (y - mb) for x, y in zip(ra, rb))
+        va, vb = sum((x - ma) ** 2 for x in ra), sum((y - mb) ** 2 for y in rb)
+        out["spearman"] = round(cov / math.sqrt(va * vb), 4) if va and vb else None
+        conc = disc = ta = tb = 0
+        for i in range(n):
+            for j in range(i + 1, n):
+                da, db = a[i] - a[j], b[i] - b[j]
+                if da == 0 and db == 0:
+                    continue
+                if da == 0:
+                    ta += 1
+                elif db == 0:
+                    tb += 1
+                elif (da > 0) == (db > 0):
+                    conc += 1
+                else:
+                    disc += 1
+        den = math.sqrt((conc + disc + ta) * (conc + disc + tb))
+        out["kendall"] = round((conc - disc) / den, 4) if den else None
+    if topk:
+        k = min(int(topk), n)
+        top_c = set(sorted(ids, key=lambda t: (-coarse[t], t))[:k])
+        top_f = set(sorted(ids, key=lambda t: (-fine[t], t))[:k])
+        out[f"recall_at_{k}"] = round(len(top_c & top_f) / k, 4) if k else None
+    return out
+
+class TPEProposer:
+    """
+    Tree-structured Parzen Estimator sobre los ejes categóricos de un TrialSpace.
+    Los trials observados se parten en buenos (top gamma) y malos; por eje se estiman
+    l(v) y g(v) (frecuencias con prior uniforme) y se propone, entre n_candidates muestras
+    de l, la combinación no evaluada con mayor Σ log l/g.
+    """
+    def __init__(self, space: TrialSpace, cfg: Dict[str, Any]):
+        self.space, self.cfg = space, cfg
+        self.rng = random.Random(cfg["seed"])
+        self.observed: Dict[int, float] = {}
+        self.proposed: set = set()
+        self._startup = sample_indices(space, None, "halton", cfg["seed"])
+
+    def observe(self, index: int, score: float):
+        self.observed[index] = float(score)
+
+    def _densities(self) -> Tuple[List[List[float]], List[List[float]]]:
+        ranked = sorted(self.observed, key=lambda i: -self.observed[i])
+        n_good = max(1, math.ceil(self.cfg["gamma"] * len(ranked)))
+        good = [self.space.digits(i) for i in ranked[:n_good]]
+        bad = [self.space.digits(i) for i in ranked[n_good:]]
+        def dens(rows, a, r):
+            counts = [1.0] * r  # prior uniforme
+            for d in rows:
+                counts[d[a]] += 1.0
+            tot = sum(counts)
+            return [c / tot for c in counts]
+        radices = self.space.radices
+        return ([dens(good, a, r) for a, r in enumerate(radices)],
+                [dens(bad, a, r) for a, r in enumerate(radices)])
+
+    def propose(self, n: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """Hasta n índices nuevos con su info (source, score l/g) para phases_chain.json."""
+        out: List[Tuple[int, Dict[str, Any]]] = []
+        total = len(self.space)
+        while len(out) < n and len(self.proposed) < total:
+            if len(self.observed) < self.cfg["n_startup"] or not self.space.radices:
+                i = next(self._startup, None)
+                if i is None:
+                    break
+                if i in self.proposed:
+                    continue
+                info = {"source": "startup"}
+            else:
+                l, g = self._densities()
+                best, best_ratio = None, -math.inf
+                for _ in range(int(self.cfg["n_candidates"])):
+                    d = [self.rng.choices(range(len(la)), weights=la)[0] for la in l]
+                    i = self.space.index(d)
+                    if i in self.proposed:
+                        continue
+                    ratio = sum(math.log(l[a][v] / g[a][v]) for a, v in enumerate(d))
+                    if ratio > best_ratio:
+                        best, best_ratio = i, ratio
+                if best is None:  # el modelo ya no encuentra combinaciones nuevas: explorar
+                    best = self.rng.randrange(total)
+                    while best in self.proposed:
+                        best = self.rng.randrange(total)
+                    info = {"source": "random"}
+                else:
+                    info = {"source": "model", "log_l_over_g": round(best_ratio, 4)}
+                i = best
+            self.proposed.add(i)
+            out.append((i, {**info, "n_observed": len(self.observed)}))
+        return out
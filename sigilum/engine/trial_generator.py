@@ -1,36 +1,176 @@
 from __future__ import annotations
-from typing import Dict, Any, List
-import itertools
+from typing import Dict, Any, Iterator, List, Tuple
+import math, random
+from sigilum.phases.base import get_phase_cls, canonical_steps
+from sigilum.utils.hashing import fingerprint
+from sigilum.utils.logger import get_logger
 
-def _product_space(space: Dict[str, Any]) -> List[Dict[str, Any]]:
-    # space: {"block_size":[21,29], "C":[3,5]} -> [{"block_size":21,"C":3},...]
-    keys = list(space.keys())
-    vals = [space[k] if isinstance(space[k], list) else [space[k]] for k in keys]
-    return [dict(zip(keys, combo)) for combo in itertools.product(*vals)]
+SAMPLING_MODES = ("sequential", "random", "halton", "sobol")
+
+def _can_matter(step: dict, param: str, step_axes: List[Tuple[int, str, list]]) -> bool:
+    """¿Algún valor posible de los params que condicionan `param` (relevant_when) lo activa?"""
+    cls = get_phase_cls(step["phase"])
+    fixed = {**cls().defaults, **step.get("params", {})}
+    axis_vals = {k: vals for _, k, vals in step_axes}
+    return all(any(v in allowed for v in axis_vals.get(c, [fixed.get(c)]))
+               for c, allowed in cls.relevant_when.get(param, {}).items())
+
+class TrialSpace:
+    """
+    Producto cartesiano de los search_spaces sobre el pipeline, sin materializarlo.
+    Cada parámetro con lista es un eje; el trial i sale de escribir i en base mixta
+    (el último eje varía más rápido: mismo orden que el cartesiano de expand_trials).
+    Los ejes que el modo configurado nunca usa (nl_h con mode fijo en bilateral) se descartan
+    (quedan en `pruned`) y los pipelines salen con params efectivos (canonical_steps).
+    """
+    def __init__(self, pipeline_cfg: dict, search_spaces: dict):
+        self.steps = pipeline_cfg["pipeline"]
+        # ejes: (idx del step, param, valores)
+        self.axes: List[Tuple[int, str, list]] = []
+        self.pruned: List[Tuple[int, str, list]] = []
+        for si, step in enumerate(self.steps):
+            space = search_spaces.get(step["phase"]) if isinstance(search_spaces.get(step["phase"]), dict) else None
+            step_axes = [(si, k, v if isinstance(v, list) else [v]) for k, v in (space or {}).items()]
+            for ax in step_axes:
+                (self.axes if _can_matter(step, ax[1], step_axes) else self.pruned).append(ax)
+        self.radices = [len(vals) for _, _, vals in self.axes]
+
+    def __len__(self) -> int:
+        return math.prod(self.radices)
+
+    def digits(self, i: int) -> List[int]:
+        if not 0 <= i < len(self):
+            raise IndexError(f"trial {i} fuera del espacio (n={len(self)})")
+        out = []
+        for r in reversed(self.radices):
+            i, d = divmod(i, r)
+            out.append(d)
+        return out[::-1]
+
+    def index(self, digits: List[int]) -> int:
+        i = 0
+        for d, r in zip(digits, self.radices):
+            i = i * r + d
+        return i
+
+    def pipeline(self, digits: List[int]) -> List[dict]:
+        params = [dict(s.get("params", {})) for s in self.steps]
+        for (si, k, vals), d in zip(self.axes, digits):
+            params[si][k] = vals[d]
+        return canonical_steps([{"phase": s["phase"], "params": p} for s, p in zip(self.steps, params)])
+
+    def __getitem__(self, i: int) -> List[dict]:
+        return self.pipeline(self.digits(i))
+
+def _radical_inverse(i: int, base: int) -> float:
+    f, r = 1.0, 0.0
+    while i:
+        f /= base
+        i, d = divmod(i, base)
+        r += f * d
+    return r
+
+def _primes(n: int) -> List[int]:
+    out, c = [], 2
+    while len(out) < n:
+        if all(c % p for p in out):
+            out.append(c)
+        c += 1
+    return out
+
+def _halton_points(dim: int, seed: int) -> Iterator[List[float]]:
+    bases = _primes(dim)
+    i = 1 + seed  # el punto 0 es el origen (todos los ejes en su primer valor)
+    while True:
+        yield [_radical_inverse(i, b) for b in bases]
+        i += 1
+
+def _sobol_points(dim: int, seed: int) -> Iterator[List[float]]:
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        get_logger().warning("scipy no disponible: sampling sobol → halton")
+        yield from _halton_points(dim, seed)
+        return
+    eng = qmc.Sobol(d=dim, scramble=True, seed=seed)
+    while True:
+        # bloques de 64: el total generado sigue siendo múltiplo de 2^6 (random_base2 exige que
+        # el acumulado sea potencia de 2 y falla en el tercer bloque)
+        for p in eng.random(64):
+            yield list(p)
+
+def sample_indices(space: TrialSpace, budget: int | None, mode: str = "sequential", seed: int = 0) -> Iterator[int]:
+    """
+    Índices del espacio según `mode`, sin repetir, en memoria O(budget):
+      sequential → 0, 1, 2, …      random → uniforme sin reemplazo
+      halton / sobol → baja discrepancia (un eje por parámetro)
+    """
+    n = len(space)
+    k = n if budget is None else min(int(budget), n)
+    if mode == "sequential":
+        yield from range(k)
+        return
+    if mode == "random":
+        # Fisher-Yates perezoso: permutación de range(n) con solo los swaps en memoria
+        rng, swapped = random.Random(seed), {}
+        for j in range(k):
+            r = rng.randrange(j, n)
+            yield swapped.get(r, r)
+            swapped[r] = swapped.get(j, j)
+        return
+    if mode not in ("halton", "sobol"):
+        raise ValueError(f"Sampling desconocido: {mode} ({'|'.join(SAMPLING_MODES)})")
+    if not space.radices:
+        yield from range(k)
+        return
+    points = (_halton_points if mode == "halton" else _sobol_points)(len(space.radices), seed)
+    seen = set()
+    misses = 0
+    rng = random.Random(seed)
+    while len(seen) < k:
+        if misses <= 4 * k:
+            u = next(points)
+            i = space.index([min(int(x * r), r - 1) for x, r in zip(u, space.radices)])
+        else:  # budget ≈ n: la secuencia ya casi no cae en celdas nuevas; completar al azar
+            i = rng.randrange(n)
+        if i in seen:
+            misses += 1
+            continue
+        seen.add(i)
+        yield i
+
+def sampling_config(search_spaces: dict) -> Dict[str, Any]:
+    s = search_spaces.get("sampling") or "sequential"
+    if isinstance(s, str):
+        s = {"mode": s}
+    cfg = {"mode": s.get("mode", "sequential"), "seed": int(s.get("seed", 0))}
+    if cfg["mode"] not in SAMPLING_MODES:
+        raise ValueError(f"Sampling desconocido: {cfg['mode']} ({'|'.join(SAMPLING_MODES)})")
+    return cfg
+
+def iter_trials(pipeline_cfg: dict, search_spaces: dict, max_trials: int | None = None) -> Iterator[List[dict]]:
+    """
+    Pipelines concretos generados perezosamente según `sampling` de search_spaces
+    (default sequential), sin repetir signature: las combinaciones que solo difieren en
+    params que su modo ignora dan el mismo pipeline efectivo y no cuentan para max_trials.
+    """
+    space = TrialSpace(pipeline_cfg, search_spaces)
+    cfg = sampling_config(search_spaces)
+    sigs = set()
+    for i in sample_indices(space, None, cfg["mode"], cfg["seed"]):
+        if max_trials is not None and len(sigs) >= int(max_trials):
+            return
+        steps = space[i]
+        sig = fingerprint(steps)
+        if sig in sigs:  # valores repetidos en el yaml o params inactivos → mismo pipeline
+            continue
+        sigs.add(sig)
+        yield steps
 
 def expand_trials(pipeline_cfg: dict, search_spaces: dict, max_trials: int | None = None) -> List[List[dict]]:
     """
     Devuelve una lista de pipelines concretos (cada uno: lista de steps con params fijos).
-    Aplica búsqueda cartesiana SOLO en las fases listadas en search_spaces.
-    """
-    steps = pipeline_cfg["pipeline"]
-    # para cada step, generar lista de variantes de ese step
-    step_variants: List[List[dict]] = []
-    for step in steps:
-        phase = step["phase"]
-        base_params = step.get("params", {})
-        if phase in search_spaces:
-            combos = _product_space(search_spaces[phase])
-            variants = [{"phase": phase, "params": {**base_params, **c}} for c in combos]
-        else:
-            variants = [{"phase": phase, "params": dict(base_params)}]
-        step_variants.append(variants)
-
-    # cartesiano sobre los steps (cada elemento es un pipeline completo)
-    all_pipelines: List[List[dict]] = []
-    for combo in itertools.product(*step_variants):
-        all_pipelines.append([dict(s) for s in combo])
-
-    if max_trials is not None:
-        all_pipelines = all_pipelines[:max_trials]
-    return all_pipelines
+    Aplica búsqueda cartesiana SOLO en las fases listadas en search_spaces; con max_trials
+    se toman max_trials combinaciones según `sampling` (sin construir el producto entero).
+    """
+    return list(iter_trials(pipeline_cfg, search_spaces, max_trials))
@@ -1,18 +1,29 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Dict, Any, List
-import json, glob, time
+from typing import Dict, Any, List, Tuple
+import json, glob, os, time
 import cv2
+import numpy as np
 
 from sigilum.io.loader import load_image_gray
-from sigilum.engine.phase_engine import run_pipeline
-from sigilum.engine.metrics import get_metric
-from sigilum.engine.trial_generator import expand_trials
-from sigilum.utils.config import load_yaml, validate_pipeline_cfg, validate_metrics_cfg
-from sigilum.io.saver import create_run_dir, copy_firmas_into_run, save_snapshot, save_json
-from sigilum.utils.viz import overlay_edges, side_by_side
-from sigilum.utils.logger import get_logger, add_file_logging
-from sigilum.utils.hashing import fingerprint  # NEW
+from sigilum.engine.trial_tree import run_trial_tree
+from sigilum.engine.metrics import score_batch, metric_cost
+from sigilum.engine.features import ImageFeatures
+from sigilum.engine.references import ReferenceStore
+from sigilum.engine.trial_generator import TrialSpace, expand_trials, sampling_config
+from sigilum.engine.search import SEARCH_KEYS, TPEProposer, search_strategy, select_survivors, rank_agreement
+from sigilum.utils.config import load_run_configs
+from sigilum.engine.parallel import WorkerPool, dfs_trial_order, split_chunks
+from sigilum.io.cache import CACHE_GAUGES, cache_stats, cache_stats_since, flush_cache, root_key
+from sigilum.io.saver import (ARTIFACT_LEVELS, create_run_dir, copy_firmas_into_run, save_snapshot, save_json,
+                              flush_artifacts)
+from sigilum.utils.viz import pair_visuals
+from sigilum.reporting.review import render_review
+from sigilum.utils.logger import get_logger, add_file_logging, remove_file_logging
+from sigilum.utils.hashing import fingerprint, content_digest  # NEW
+from sigilum.utils import profiler
+from sigilum.utils.profiler import span, write_profile
+from sigilum.phases.base import canonical_steps, scale_steps
 
 def _combine_scores(scores: Dict[str, float], metrics_cfg: dict) -> float:
     comb = metrics_cfg.get("combiner", "weighted_sum")
@@ -23,6 +34,46 @@ def _combine_scores(scores: Dict[str, float], metrics_cfg: dict) -> float:
         return float(num / den) if den else 0.0
     raise ValueError(f"Combiner desconocido: {comb}")
 
+def _score_refs(cand, refs, metrics_cfg: dict, size, accept: float | None = None, cap: float | None = None):
+    """
+    Scores del candidato contra cada firma, evaluando las métricas de la más barata a la más cara
+    (una pasada batched por métrica sobre las firmas que siguen en juego).
+    Con `accept` (solo weighted_sum, métricas en [0,1]) después de cada métrica se descarta la firma
+    cuya cota superior (lo que falta vale 1) queda por debajo de min(mejor cota inferior entre
+    firmas, accept, tope `cap`): ya no puede ganarle al mejor par del trial ni llegar a accept.
+    El par de la mejor cota inferior nunca se descarta, así que el mejor par del trial es exacto.
+    Devuelve [(score, per_metric, upper_bound)] en el orden de refs: un par descartado tiene
+    score None, sus métricas faltantes en None y su cota en upper_bound (None si es exacto).
+    """
+    ms = metrics_cfg["metrics"]
+    weights = {m["name"]: m.get("weight", 1.0) for m in ms}
+    total = sum(weights.values())
+    prune = accept is not None and metrics_cfg.get("combiner", "weighted_sum") == "weighted_sum" and total > 0
+    n = len(refs)
+    per = [dict.fromkeys(weights) for _ in range(n)]
+    known, left = np.zeros(n), np.full(n, float(total))
+    alive = np.arange(n)
+    for m in sorted(ms, key=metric_cost):
+        if not alive.size:
+            break
+        sub = refs if alive.size == n else refs.subset(alive)
+        with span(m["name"], cat="metric", pairs=int(alive.size)):
+            vals = score_batch(m["name"], cand, sub, size=size, **m.get("params", {}))
+        for i, v in zip(alive, vals):
+            per[i][m["name"]] = float(v)
+        known[alive] += weights[m["name"]] * np.asarray(vals, dtype="float64")
+        left[alive] -= weights[m["name"]]
+        if prune:
+            bar = min(known[alive].max() / total, accept, 1.0 if cap is None else cap)
+            alive = alive[(known[alive] + left[alive]) / total >= bar]
+    out = []
+    for i in range(n):
+        if any(v is None for v in per[i].values()):
+            out.append((None, per[i], float((known[i] + left[i]) / total)))
+        else:
+            out.append((_combine_scores(per[i], metrics_cfg), per[i], None))
+    return out
+
 def _glob_firmas(dir_: str) -> List[str]:
     exts = ("*.jpg", "*.jpeg", "*.png")
     files = []
@@ -37,24 +88,397 @@ def _phase_params_subset(steps: List[dict], phases_of_interest: List[str]) -> Di
             out[s["phase"]] = dict(s.get("params", {}))
     return out
 
+def _write_trial_imagery(trial_dir: Path, out_img, cand: ImageFeatures, refs) -> None:
+    """final.png + overlay / side-by-side contra cada firma comparada (escritura en background)."""
+    save_snapshot(trial_dir / "stages" / "final.png", out_img, background=True)
+    for ref in refs:
+        ov, sb = pair_visuals(cand, ref)
+        save_snapshot(trial_dir / "overlays" / f"overlay_{Path(ref.path).stem}.png", ov, background=True)
+        save_snapshot(trial_dir / "pairs" / f"pair_{Path(ref.path).stem}.png", sb, background=True)
+
+def _write_trial_summary(t_idx: int, pipe_sig: str, best: dict, comparisons: List[dict], run: Dict[str, Any],
+                         dup_of: int | None = None) -> None:
+    th_accept, th_early, min_margin = run["thresholds"]
+    summary = {
+        "trial_idx": t_idx,
+        "signature": pipe_sig,            # NEW
+        "best": best,
+        "thresholds": {"accept": th_accept, "early_stop": th_early, "min_margin": min_margin}
+    }
+    if comparisons:  # exactos por score y después los descartados
+        summary["comparisons"] = sorted(comparisons, key=lambda c: (c["score"] is None, -(c["score"] or 0.0)))
+    if dup_of is not None:
+        summary["duplicate_of"] = dup_of
+    save_json(run["root"] / "trials" / f"trial_{t_idx:04d}" / "summary.json", summary, background=True)
+
+def _evaluate_trial(t_idx: int, steps: List[dict], out_img, snapshots: List[dict], run: Dict[str, Any],
+                    dup: Dict[str, Any] | None = None) -> Tuple[Dict[str, Any], Dict[str, Any], List[dict]]:
+    """
+    Persiste el trial (según run["artifacts"]) y lo compara contra las firmas.
+    Devuelve (entrada de leaderboard, mejor comparación {"firma", "score", "per_metric", "path"},
+    comparaciones en el orden de las firmas).
+    dup: {"trial_idx", "best", "comparisons"} de un trial anterior con la misma imagen final → se
+    reusan sus scores sin recalcular (el summary y las imágenes quedan como si se hubieran calculado).
+    """
+    log = get_logger()
+    refs, metrics, target_size = run["refs"], run["metrics"], run["target_size"]
+    th_early = run["thresholds"][1]
+    artifacts = run["artifacts"]
+    trial_dir = run["root"] / "trials" / f"trial_{t_idx:04d}"
+
+    pipe_sig = fingerprint(steps)  # NEW
+    log.info(f"Trial {t_idx:04d} start | {len(steps)} fases | signature={pipe_sig}")  # NEW
+
+    # Pipeline
+    if artifacts != "none":
+        chain = {"steps": snapshots, "steps_def": steps, "signature": pipe_sig}  # NEW
+        if t_idx in run.get("proposals", {}):  # búsqueda adaptativa: por qué se propuso este trial
+            chain["proposal"] = run["proposals"][t_idx]
+        save_json(trial_dir / "phases_chain.json", chain, background=True)
+
+    # Comparaciones
+    trial_best = {"firma": None, "score": -1.0, "per_metric": {}, "path": None}
+    comparisons = []
+    # features del candidato: se calculan una vez y los comparten métricas y overlays
+    cand = ImageFeatures(out_img, target_size)
+    # métricas de la más barata a la más cara contra el stack de firmas; con poda, los pares que ya
+    # no pueden ganarle al mejor del trial ni llegar a accept no pagan las métricas caras
+    early = run["mode"] in ("early", "both")
+    scored = _score_refs(cand, refs, metrics, target_size, accept=run.get("prune_accept"),
+                         cap=th_early if early else None) if len(refs) and dup is None else []
+    n_compared = 0
+    if dup is not None:
+        trial_best, comparisons = dict(dup["best"]), [dict(c) for c in dup["comparisons"]]
+        n_compared = len(comparisons)
+        log.debug(f"Trial {t_idx:04d} final image identical to trial {dup['trial_idx']:04d}: scores reused")
+    for i, ref in enumerate(refs if dup is None else []):
+        fpath = ref.path
+        n_compared += 1
+
+        score, per_metric, upper = scored[i]
+        comp = {"firma": Path(fpath).name, "score": score, "per_metric": per_metric}
+        if upper is not None:  # descartado: su cota no cuenta como score
+            comp.update({"pruned": True, "upper_bound": upper})
+        comparisons.append(comp)
+
+        if score is not None and score > trial_best["score"]:
+            trial_best = {"firma": Path(fpath).name, "score": score, "per_metric": per_metric, "path": str(fpath)}
+
+        if early and score is not None and score >= th_early:
+            log.info(f"Trial {t_idx:04d} early-stop by score ≥ {th_early} on {Path(fpath).name}")
+            break
+
+    if artifacts == "full":  # también los duplicados: el trial_dir no depende de qué trial se evaluó primero
+        _write_trial_imagery(trial_dir, out_img, cand, refs[:n_compared])
+
+    if artifacts != "none":
+        _write_trial_summary(t_idx, pipe_sig, trial_best, comparisons, run, dup["trial_idx"] if dup else None)
+    # final_key: salida final en el cache de fases (imágenes de revisión diferidas, ver reporting.review)
+    entry = {"trial_idx": t_idx, "signature": pipe_sig, "best_score": trial_best["score"], "best_firma": trial_best["firma"],
+             "final_key": snapshots[-1]["cache_key"] if snapshots else None}
+    n_pruned = sum("pruned" in c for c in comparisons) if dup is None else 0
+    if n_pruned:
+        entry["pruned_pairs"] = n_pruned
+    if dup is not None:
+        entry["duplicate_of"] = dup["trial_idx"]
+    if n_pruned:
+        log.debug(f"Trial {t_idx:04d} pruned {n_pruned}/{len(comparisons)} pair(s) before their costliest metrics")
+    return entry, trial_best, comparisons
+
+def _run_trials(cheque, trial_ids: List[int], run: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ejecuta (trie) y evalúa los trials `trial_ids`. Corre en el proceso principal o,
+    con --workers > 1, dentro de un worker del pool (run llega pickleado, sin refs).
+    """
+    log = get_logger()
+    cache0 = cache_stats()
+    if run.get("profile") and not profiler.enabled():  # worker del pool
+        profiler.enable()
+    if "refs" not in run:
+        run["refs"] = ReferenceStore(run["cuenta_id"], run["firmas"], run["target_size"])
+    sub = [run["pipelines"][t - 1] for t in trial_ids]
+    leaderboard, timings = [], []
+
+    # Los trials llegan en orden DFS del trie (prefijos compartidos corren una vez);
+    # el tiempo de cada trial incluye solo los steps nuevos que agregó su rama.
+    t_trial0 = time.perf_counter()
+    # digest de la imagen final → trial que ya se evaluó con ella: los de llamadas anteriores del run
+    # (run["by_content"], ver _resolve_duplicates) más los de este chunk
+    by_content: Dict[str, dict] = dict(run.get("by_content") or {})
+    digests: Dict[int, str] = {}
+    evaluated: Dict[str, dict] = {}
+    for j, out_img, snapshots in run_trial_tree(cheque, sub, use_cache=True, root_key=run["root_key"]):
+        t_idx = trial_ids[j - 1]
+        digest = digests[t_idx] = content_digest(out_img)
+        dup = by_content.get(digest)
+        entry, best, comparisons = _evaluate_trial(t_idx, sub[j - 1], out_img, snapshots, run, dup=dup)
+        if dup is None:
+            by_content[digest] = evaluated[digest] = {"trial_idx": t_idx, "best": best, "comparisons": comparisons}
+        leaderboard.append(entry)
+        t_trial = (time.perf_counter() - t_trial0) * 1000
+        timings.append({"trial_idx": t_idx, "ms": round(t_trial, 1)})
+        log.info(f"Trial {t_idx:04d} end | score={entry['best_score']:.4f} | {t_trial:.1f} ms")
+        t_trial0 = time.perf_counter()
+
+    run["refs"].save()  # features de referencia calculados en este run → disco
+    flush_cache(enforce_cap=False)
+    flush_artifacts()
+    return {"leaderboard": leaderboard, "timings": timings, "digests": digests, "evaluated": evaluated,
+            "pid": os.getpid(), "cache": cache_stats_since(cache0),
+            "profile": profiler.take_events() if run.get("profile") else []}
+
+def _resolve_duplicates(parts: List[Dict[str, Any]], run: Dict[str, Any]) -> None:
+    """
+    Dedup de imágenes finales en todo el run. Cada chunk solo ve sus propios trials (y las fuentes
+    de llamadas anteriores), en el orden del trie, así que quién quedó como fuente depende de
+    --workers. Acá se fija la misma regla para todos: la fuente de cada imagen es su trial_idx más
+    chico (los de llamadas anteriores siempre lo son) y el resto pasa a duplicate_of; se reescriben
+    las entradas y los summary.json que cambian. Si dos chunks evaluaron la misma imagen, ese
+    trabajo no se recupera. Acumula las fuentes en run["by_content"] para las llamadas siguientes.
+    """
+    seen = run.setdefault("by_content", {})
+    groups: Dict[str, List[dict]] = {}
+    for p in parts:
+        for e in p["leaderboard"]:
+            groups.setdefault(p["digests"][e["trial_idx"]], []).append(e)
+    evaluated = {d: v for p in parts for d, v in p.pop("evaluated").items()}
+    for digest, entries in groups.items():
+        if digest not in seen:
+            seen[digest] = {**evaluated[digest], "trial_idx": min(e["trial_idx"] for e in entries)}
+        src = seen[digest]
+        for e in entries:
+            dup_of = src["trial_idx"] if e["trial_idx"] != src["trial_idx"] else None
+            if e.get("duplicate_of") == dup_of:
+                continue
+            e.pop("duplicate_of", None)
+            e.pop("pruned_pairs", None)
+            e.update({"best_score": src["best"]["score"], "best_firma": src["best"]["firma"]})
+            n_pruned = sum("pruned" in c for c in src["comparisons"])
+            if dup_of is not None:
+                e["duplicate_of"] = dup_of
+            elif n_pruned:
+                e["pruned_pairs"] = n_pruned
+            if run["artifacts"] != "none":
+                _write_trial_summary(e["trial_idx"], e["signature"], dict(src["best"]),
+                                     [dict(c) for c in src["comparisons"]], run, dup_of)
+    flush_artifacts()
+
+def _screen_trials(cheque, trial_ids: List[int], run: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ronda barata de successive halving: solo run["screen"]["metrics"] a run["screen"]["target_size"],
+    sin artefactos ni early-stop. Devuelve el mejor score (y firma) por trial.
+    """
+    cache0 = cache_stats()
+    if run.get("profile") and not profiler.enabled():
+        profiler.enable()
+    screen = run["screen"]
+    size = tuple(screen["target_size"])
+    refs = ReferenceStore(run["cuenta_id"], run["firmas"], size)
+    profile = {**run["metrics"], "metrics": screen["metrics"]}
+    sub = [run["pipelines"][t - 1] for t in trial_ids]
+    scores: Dict[int, dict] = {}
+    by_content: Dict[str, dict] = {}
+    for j, out_img, snapshots in run_trial_tree(cheque, sub, use_cache=True, root_key=run["root_key"]):
+        digest = content_digest(out_img)
+        if digest in by_content:  # misma imagen final que otro trial: mismo score
+            scores[trial_ids[j - 1]] = {**by_content[digest], "final_key": snapshots[-1]["cache_key"] if snapshots else None}
+            continue
+        cand = ImageFeatures(out_img, size)
+        per_firma = [sc for sc, _, _ in _score_refs(cand, refs, profile, size)]
+        best = max(range(len(per_firma)), key=per_firma.__getitem__) if per_firma else None
+        scores[trial_ids[j - 1]] = {
+            "score": per_firma[best] if best is not None else -1.0,
+            "firma": refs[best].name if best is not None else None,
+            "final_key": snapshots[-1]["cache_key"] if snapshots else None,
+        }
+        by_content[digest] = scores[trial_ids[j - 1]]
+    refs.save()
+    flush_cache(enforce_cap=False)
+    return {"scores": scores, "pid": os.getpid(), "cache": cache_stats_since(cache0),
+            "profile": profiler.take_events() if run.get("profile") else []}
+
+def _run_cache_stats(cache0: dict, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Cache del run: contadores de este proceso desde cache0 + los de cada parte corrida en un
+    worker (cada una trae su diferencia); los gauges (entradas/bytes en memoria) son el último
+    valor de cada proceso.
+    """
+    me = os.getpid()
+    gauges = {me: cache_stats_since(cache0)}
+    out = dict(gauges[me])
+    for p in parts:
+        if p["pid"] == me:  # ya incluida en la diferencia de este proceso
+            continue
+        gauges[p["pid"]] = p["cache"]
+        for k, v in p["cache"].items():
+            if k not in CACHE_GAUGES:
+                out[k] = out.get(k, 0) + v
+    for k in CACHE_GAUGES:
+        out[k] = (max if k.endswith("budget_bytes") else sum)(g.get(k, 0) for g in gauges.values())
+    return out
+
+def _dispatch(cheque, trial_ids: List[int], worker_fn, run: Dict[str, Any], pool: WorkerPool | None,
+              local: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+    """worker_fn(cheque, trial_ids, run) en el proceso (run + local) o repartido en el pool del run."""
+    workers = max(1, min(pool.workers if pool else 1, len(trial_ids)))
+    if workers == 1:
+        return [worker_fn(cheque, trial_ids, {**run, **(local or {})})]
+    # chunks contiguos en orden DFS del trie: cada worker reusa los prefijos de su chunk
+    wanted = set(trial_ids)
+    chunks = split_chunks([t for t in dfs_trial_order(run["pipelines"]) if t in wanted], workers)
+    return pool.map(cheque, chunks, worker_fn, run)
+
+def _successive_halving(cheque, trial_ids: List[int], run: Dict[str, Any], strategy: dict, pool: WorkerPool | None):
+    """
+    Rondas baratas de `strategy["rounds"]`, cada una se queda con ~1/eta de los trials.
+    Devuelve (sobrevivientes, rondas para leaderboard.json, scores por trial y ronda, parts).
+    """
+    log = get_logger()
+    by_name = {m["name"]: m for m in run["metrics"]["metrics"]}
+    rounds, screened, parts = [], {}, []
+    for r, spec in enumerate(strategy["rounds"]):
+        names = spec["metrics"]
+        screen = {"metrics": [by_name.get(n, {"name": n, "weight": 1.0, "params": {}}) for n in names],
+                  "target_size": list(spec.get("target_size") or run["target_size"])}
+        t0 = time.perf_counter()
+        res = _dispatch(cheque, trial_ids, _screen_trials, {**run, "screen": screen}, pool)
+        parts.extend(res)
+        scores = {t: v for p in res for t, v in p["scores"].items()}
+        for t, v in scores.items():
+            screened.setdefault(t, []).append(v)
+        survivors = select_survivors({t: v["score"] for t, v in scores.items()},
+                                     strategy["eta"], strategy["min_survivors"])
+        ms = round((time.perf_counter() - t0) * 1000, 1)
+        rounds.append({"round": r, "metrics": names, "target_size": screen["target_size"],
+                       "n_in": len(trial_ids), "survivors": survivors, "ms": ms})
+        log.info(f"Halving round {r} ({'+'.join(names)} @ {screen['target_size']}): "
+                 f"{len(trial_ids)} → {len(survivors)} trial(s) in {ms:.0f} ms")
+        trial_ids = survivors
+    return trial_ids, rounds, screened, parts
+
+def _coarse_to_fine(cheque, trial_ids: List[int], run: Dict[str, Any], strategy: dict, pool: WorkerPool | None):
+    """
+    Ronda gruesa de coarse_to_fine: todos los trials sobre el cheque escalado a strategy["scale"],
+    con los params de tamaño escalados (scale_steps) y sin artefactos; pasan los mejores `topk`
+    (todos con `audit`). Devuelve lo mismo que _successive_halving.
+    """
+    log = get_logger()
+    f = float(strategy["scale"])
+    h, w = cheque.shape[:2]
+    small = cv2.resize(cheque, (max(1, round(w * f)), max(1, round(h * f))), interpolation=cv2.INTER_AREA)
+    by_name = {m["name"]: m for m in run["metrics"]["metrics"]}
+    names = strategy["metrics"] or list(by_name)
+    screen = {"metrics": [by_name.get(n, {"name": n, "weight": 1.0, "params": {}}) for n in names],
+              "target_size": list(run["target_size"])}
+    coarse = {**run, "pipelines": [scale_steps(p, f) for p in run["pipelines"]], "root_key": root_key(small),
+              "screen": screen}
+    t0 = time.perf_counter()
+    parts = _dispatch(small, trial_ids, _screen_trials, coarse, pool)
+    scores = {t: v for p in parts for t, v in p["scores"].items()}
+    ranked = sorted(scores, key=lambda t: (-scores[t]["score"], t))
+    survivors = sorted(trial_ids) if strategy["audit"] else sorted(ranked[:int(strategy["topk"])])
+    ms = round((time.perf_counter() - t0) * 1000, 1)
+    rounds = [{"round": 0, "scale": f, "metrics": names, "target_size": screen["target_size"],
+               "n_in": len(trial_ids), "survivors": survivors, "ms": ms}]
+    log.info(f"Coarse round (×{f} → {small.shape[1]}x{small.shape[0]}, {'+'.join(names)}): "
+             f"{len(trial_ids)} → {len(survivors)} trial(s) in {ms:.0f} ms")
+    return survivors, rounds, {t: [v] for t, v in scores.items()}, parts
+
+def _adaptive_search(cheque, run: Dict[str, Any], space: TrialSpace, strategy: dict, pool: WorkerPool | None,
+                     refs: ReferenceStore) -> List[Dict[str, Any]]:
+    """
+    Loop propuesta → evaluación de la strategy tpe: cada batch de propuestas se agrega a
+    run["pipelines"] y corre por _run_trials (trie / pool) como cualquier trial. Corta al agotar
+    el budget o el espacio, o si el mejor score no mejora en `patience` trials.
+    """
+    log = get_logger()
+    pipelines, proposer = run["pipelines"], TPEProposer(space, strategy)
+    budget = min(int(strategy["budget"]), len(space))
+    best, stale, parts, batch_no = -float("inf"), 0, [], 0
+    by_sig: Dict[str, int] = {}      # signature → trial_idx que la evalúa
+    scores: Dict[int, float] = {}
+    while len(pipelines) < budget:
+        props = proposer.propose(min(int(strategy["batch"]), budget - len(pipelines)))
+        if not props:
+            break
+        ids, index_of, aliases = [], {}, []
+        for index, info in props:
+            steps = space[index]
+            sig = fingerprint(steps)
+            if sig in by_sig:  # solo cambia params inactivos: mismo pipeline, mismo score sin correrlo
+                aliases.append((index, by_sig[sig]))
+                continue
+            pipelines.append(steps)
+            t_idx = by_sig[sig] = len(pipelines)
+            ids.append(t_idx)
+            index_of[t_idx] = index
+            run["proposals"][t_idx] = {"strategy": "tpe", "batch": batch_no, "index": index, **info}
+        res = _dispatch(cheque, ids, _run_trials, run, pool, local={"refs": refs}) if ids else []
+        _resolve_duplicates(res, run)
+        parts.extend(res)
+        for e in (e for p in res for e in p["leaderboard"]):
+            scores[e["trial_idx"]] = e["best_score"]
+        for index, t_idx in aliases:
+            proposer.observe(index, scores[t_idx])
+        if not ids:
+            continue
+        for e in sorted((e for p in res for e in p["leaderboard"]), key=lambda x: x["trial_idx"]):
+            proposer.observe(index_of[e["trial_idx"]], e["best_score"])
+            if e["best_score"] > best + float(strategy["min_delta"]):
+                best, stale = e["best_score"], 0
+            else:
+                stale += 1
+        log.info(f"TPE batch {batch_no}: {len(pipelines)}/{budget} trial(s), best={best:.4f}, stale={stale}")
+        batch_no += 1
+        if stale >= int(strategy["patience"]):
+            log.info(f"TPE early stop: no improvement > {strategy['min_delta']} in {stale} trial(s)")
+            break
+    return parts
+
 def run_sigilum(cheque_path: str, cuenta_id: str, firmas_dir: str,
-                pipeline_cfg: str, search_cfg: str, metrics_cfg: str, mode: str = "both"):
+                pipeline_cfg: str, search_cfg: str, metrics_cfg: str, mode: str = "both",
+                workers: int = 1, configs: dict | None = None,
+                runs_root: str | Path = "runs", run_id: str | None = None,
+                artifacts: str = "topk", topk: int = 5, profile: bool = False) -> Dict[str, Any]:
+    """
+    Corre un cheque contra las firmas de la cuenta y devuelve el resumen del run.
+    configs: resultado de load_run_configs() ya cargado (batch/serve); si no, se leen los YAML.
+    artifacts: none|summary|topk|full (ver ARTIFACT_LEVELS); topk: K para artifacts="topk".
+    profile: instrumenta fases/métricas/IO y escribe aggregate/profile.json + aggregate/trace.json.
+    """
+    if artifacts not in ARTIFACT_LEVELS:
+        raise ValueError(f"artifacts inválido: {artifacts} ({'|'.join(ARTIFACT_LEVELS)})")
     log = get_logger()
     t_run0 = time.perf_counter()
 
     # Cargar configs
-    pipe_cfg = load_yaml(pipeline_cfg); validate_pipeline_cfg(pipe_cfg)
-    search = load_yaml(search_cfg) or {}
-    metrics = load_yaml(metrics_cfg); validate_metrics_cfg(metrics)
+    if configs is None:
+        configs = load_run_configs(pipeline_cfg, search_cfg, metrics_cfg)
+    pipe_cfg, search, metrics = configs["pipeline"], configs["search"], configs["metrics"]
+
+    # Crear run dir y log a archivo
+    run_root = create_run_dir(cheque_path, cuenta_id, pipeline_cfg, search_cfg, metrics_cfg,
+                              runs_root=runs_root, run_id=run_id)
+    file_log = add_file_logging(run_root / "logs" / "run.log")
+    if profile:
+        profiler.enable()
+    try:
+        return _run(cheque_path, cuenta_id, firmas_dir, mode, workers, pipe_cfg, search, metrics,
+                    run_root, t_run0, artifacts, topk)
+    finally:
+        if profile:
+            profiler.disable()
+        remove_file_logging(file_log)
 
+def _run(cheque_path: str, cuenta_id: str, firmas_dir: str, mode: str, workers: int,
+         pipe_cfg: dict, search: dict, metrics: dict, run_root: Path, t_run0: float,
+         artifacts: str, topk: int) -> Dict[str, Any]:
+    log = get_logger()
+    cache0 = cache_stats()  # contadores del proceso: el run reporta solo su diferencia (batch/serve)
     target_size = tuple(metrics.get("target_size", [256, 256]))
     th_accept  = metrics.get("thresholds", {}).get("accept", 0.80)
     th_early   = metrics.get("thresholds", {}).get("early_stop", 0.88)
     min_margin = metrics.get("thresholds", {}).get("min_margin", 0.05)
-
-    # Crear run dir y log a archivo
-    run_root = create_run_dir(cheque_path, cuenta_id, pipeline_cfg, search_cfg, metrics_cfg)
-    add_file_logging(run_root / "logs" / "run.log")
     log.info(f"Run dir: {run_root}")
     log.info(f"Thresholds: accept={th_accept} early={th_early} min_margin={min_margin} | target_size={target_size}")
 
@@ -63,14 +487,25 @@ def run_sigilum(cheque_path: str, cuenta_id: str, firmas_dir: str,
     cheque = load_image_gray(cheque_path)
     firmas_paths = _glob_firmas(firmas_dir)
     firmas_in_run = copy_firmas_into_run(run_root, firmas_paths)
+    refs = ReferenceStore(cuenta_id, firmas_in_run, target_size)
     log.info(f"Loaded cheque and {len(firmas_in_run)} firmas in {(time.perf_counter()-t0)*1000:.0f} ms")
 
     # Trials
-    phases_in_search = [k for k, v in search.items() if isinstance(v, dict) or isinstance(v, list)]  # NEW
+    phases_in_search = [k for k, v in search.items() if (isinstance(v, dict) or isinstance(v, list)) and k not in SEARCH_KEYS]  # NEW
+    strategy = search_strategy(search)
     max_trials = search.get("max_combinations") or search.get("trials", {}).get("max_combinations")
-    pipelines = expand_trials(pipe_cfg, search, max_trials=max_trials)
-    if not pipelines:
-        pipelines = [pipe_cfg["pipeline"]]
+    space = TrialSpace(pipe_cfg, search)
+    if space.pruned:
+        log.info("Search axes ignored (inactive for the configured mode): "
+                 + ", ".join(f"{space.steps[si]['phase']}.{k}" for si, k, _ in space.pruned))
+    if strategy["name"] == "tpe":
+        pipelines = []  # los va proponiendo el modelo durante el run (_adaptive_search)
+        log.info(f"Adaptive search (tpe): budget={strategy['budget']} batch={strategy['batch']} "
+                 f"patience={strategy['patience']} | space={len(space)}")
+    else:
+        pipelines = expand_trials(pipe_cfg, search, max_trials=max_trials)
+        if not pipelines:
+            pipelines = [canonical_steps(pipe_cfg["pipeline"])]
 
     # Log a snapshot of the first few trials (what will actually vary)
     sigs = []
@@ -80,81 +515,100 @@ def run_sigilum(cheque_path: str, cuenta_id: str, firmas_dir: str,
         varying = _phase_params_subset(steps, phases_in_search)
         log.info(f"Trial {idx:04d} signature={sig} varying={varying}")
     unique_sigs = len(set(fingerprint(steps) for steps in pipelines))  # NEW
-    log.info(f"Generated {len(pipelines)} trial(s) (unique signatures={unique_sigs}, max={max_trials if max_trials else '∞'})")  # NEW
+    if pipelines:
+        log.info(f"Generated {len(pipelines)} trial(s) (unique signatures={unique_sigs}, max={max_trials if max_trials else '∞'}, "
+                 f"space={len(space)}, sampling={sampling_config(search)['mode']})")  # NEW
     if unique_sigs == 1 and len(pipelines) > 1:  # NEW
         log.warning("All pipelines look identical (same signature). Check your search_spaces phase keys and params.")
 
-    leaderboard = []
-    per_firma_best: Dict[str, Dict[str, Any]] = {}
-    timings = {"trials": []}
-
-    for t_idx, steps in enumerate(pipelines, start=1):
-        t_trial0 = time.perf_counter()
-        trial_dir = run_root / "trials" / f"trial_{t_idx:04d}"
-        (trial_dir / "stages").mkdir(parents=True, exist_ok=True)
-
-        pipe_sig = fingerprint(steps)  # NEW
-        log.info(f"Trial {t_idx:04d} start | {len(steps)} fases | signature={pipe_sig}")  # NEW
-
-        # Pipeline
-        out_img, snapshots = run_pipeline(cheque, steps, use_cache=True)
-        save_snapshot(trial_dir / "stages" / "final.png", out_img)
-        save_json(trial_dir / "phases_chain.json",
-                  {"steps": snapshots, "steps_def": steps, "signature": pipe_sig})  # NEW
-
-        # Comparaciones
-        trial_best = {"firma": None, "score": -1.0, "per_metric": {}, "path": None}
-        comparisons = []
-        for i, fpath in enumerate(firmas_in_run, start=1):
-            img_f = load_image_gray(fpath)
-            a = cv2.resize(out_img, target_size)
-            b = cv2.resize(img_f,  target_size)
-
-            per_metric = {}
-            for m in metrics["metrics"]:
-                fn = get_metric(m["name"])
-                per_metric[m["name"]] = float(fn(a, b, size=target_size, **m.get("params", {})))
-            score = _combine_scores(per_metric, metrics)
-            comparisons.append({"firma": Path(fpath).name, "score": score, "per_metric": per_metric})
-
-            ov = overlay_edges(a, b, size=target_size)
-            save_snapshot(trial_dir / "overlays" / f"overlay_{Path(fpath).stem}.png", ov)
-            sb = side_by_side(a, b, size=target_size)
-            save_snapshot(trial_dir / "pairs" / f"pair_{Path(fpath).stem}.png", sb)
-
-            if score > trial_best["score"]:
-                trial_best = {"firma": Path(fpath).name, "score": score, "per_metric": per_metric, "path": str(fpath)}
-
-            if mode in ("early", "both") and score >= th_early:
-                log.info(f"Trial {t_idx:04d} early-stop by score ≥ {th_early} on {Path(fpath).name}")
-                break
-
-        save_json(trial_dir / "summary.json", {
-            "trial_idx": t_idx,
-            "signature": pipe_sig,            # NEW
-            "best": trial_best,
-            "thresholds": {"accept": th_accept, "early_stop": th_early, "min_margin": min_margin}
-        })
-
-        leaderboard.append({"trial_idx": t_idx, "signature": pipe_sig, "best_score": trial_best["score"], "best_firma": trial_best["firma"]})
+    run = {
+        "root": run_root, "cuenta_id": cuenta_id, "firmas": firmas_in_run, "pipelines": pipelines,
+        "metrics": metrics, "target_size": target_size, "mode": mode,
+        "thresholds": (th_accept, th_early, min_margin), "root_key": root_key(cheque),
+        "artifacts": artifacts, "topk": max(1, int(topk)), "proposals": {},
+        # poda por cotas: el mejor par de cada trial queda exacto (ver _score_refs)
+        "prune_accept": th_accept if metrics.get("pruning", True) else None,
+        "profile": profiler.enabled(),
+    }
+    trial_ids = list(range(1, len(pipelines) + 1))
+    workers = max(1, min(int(workers or 1), len(pipelines) or int(strategy.get("batch", 1))))
+    rounds, screened, screen_parts = [], {}, []
+    # un solo pool para todo el run: rondas, ronda gruesa y batches de tpe reusan los procesos
+    pool = WorkerPool(workers, logfile=str(run_root / "logs" / "run.log")) if workers > 1 else None
+    try:
+        if strategy["name"] == "tpe":
+            parts = _adaptive_search(cheque, run, space, strategy, pool, refs)
+            trial_ids = list(range(1, len(pipelines) + 1))
+        else:
+            if strategy["name"] == "successive_halving":
+                trial_ids, rounds, screened, screen_parts = _successive_halving(cheque, trial_ids, run, strategy, pool)
+            elif strategy["name"] == "coarse_to_fine":
+                trial_ids, rounds, screened, screen_parts = _coarse_to_fine(cheque, trial_ids, run, strategy, pool)
+            # ronda final (o única, en grid): perfil completo de métricas y artefactos
+            parts = _dispatch(cheque, trial_ids, _run_trials, run, pool, local={"refs": refs})
+            _resolve_duplicates(parts, run)
+    finally:
+        if pool is not None:
+            pool.close()
 
-        t_trial = (time.perf_counter() - t_trial0) * 1000
-        timings["trials"].append({"trial_idx": t_idx, "ms": round(t_trial, 1)})
-        log.info(f"Trial {t_idx:04d} end | score={trial_best['score']:.4f} | {t_trial:.1f} ms")
+    leaderboard = [e for p in parts for e in p["leaderboard"]]
+    final_round = len(rounds)
+    for e in leaderboard:
+        if rounds:
+            e["round_scores"] = [v["score"] for v in screened[e["trial_idx"]]]
+    for t, vs in screened.items():  # eliminados: su score de la última ronda barata que jugaron
+        if t not in trial_ids:
+            last = vs[-1]
+            leaderboard.append({"trial_idx": t, "signature": fingerprint(pipelines[t - 1]), "best_score": last["score"],
+                                "best_firma": last["firma"], "final_key": last["final_key"],
+                                "eliminated_in": len(vs) - 1, "round_scores": [v["score"] for v in vs]})
+    timings = {"trials": [t for p in parts for t in p["timings"]], "workers": workers}
+    if rounds:
+        timings["rounds"] = [{"round": r["round"], "n_in": r["n_in"], "ms": r["ms"]} for r in rounds]
+    parts = screen_parts + parts
 
-    # Agregados
-    leaderboard_sorted = sorted(leaderboard, key=lambda x: x["best_score"], reverse=True)
-    save_json(run_root / "aggregate" / "leaderboard.json", {"leaderboard": leaderboard_sorted})
+    # Agregados (orden determinístico: ronda alcanzada, score y, en empate, trial_idx)
+    timings["trials"].sort(key=lambda x: x["trial_idx"])
+    leaderboard_sorted = sorted(leaderboard, key=lambda x: (-x.get("eliminated_in", final_round),
+                                                            -x["best_score"], x["trial_idx"]))
+    lb_doc = {"leaderboard": leaderboard_sorted}
+    if rounds:
+        lb_doc.update({"strategy": strategy, "rounds": rounds})
+    agreement = None
+    if strategy["name"] == "coarse_to_fine":
+        # ¿el nivel grueso ordena igual que la resolución completa? (sobre los confirmados)
+        agreement = rank_agreement({t: vs[0]["score"] for t, vs in screened.items()},
+                                   {e["trial_idx"]: e["best_score"] for e in leaderboard if "eliminated_in" not in e},
+                                   topk=strategy["topk"] if strategy["audit"] else None)
+        lb_doc["agreement"] = agreement
+        log.info(f"Coarse vs full-resolution ranking: {agreement}")
+    save_json(run_root / "aggregate" / "leaderboard.json", lb_doc)
 
-    best_overall = leaderboard_sorted[0] if leaderboard_sorted else {"best_score": -1.0, "trial_idx": None}
+    # status: solo contra trials evaluados con el perfil completo (scores comparables)
+    finalists = [e for e in leaderboard_sorted if "eliminated_in" not in e]
+    best_overall = finalists[0] if finalists else {"best_score": -1.0, "trial_idx": None}
     status = "REVIEW"
     if best_overall["best_score"] >= th_accept:
-        if len(leaderboard_sorted) > 1:
-            margin = best_overall["best_score"] - leaderboard_sorted[1]["best_score"]
+        if len(finalists) > 1:
+            margin = best_overall["best_score"] - finalists[1]["best_score"]
             status = "ACCEPTED" if margin >= min_margin else "REVIEW"
         else:
             status = "ACCEPTED"
 
+    flush_cache()
+    if artifacts == "topk" and leaderboard_sorted:
+        # imágenes de revisión fuera del loop de scoring: top-K trials contra su mejor firma
+        t0 = time.perf_counter()
+        render_review(run_root, topk=run["topk"])
+        timings["review_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    timings["cache"] = _run_cache_stats(cache0, parts)
+    log.info(f"Cache: {timings['cache']}")
+    if run["profile"]:
+        # eventos de los workers (vienen con cada parte) + los de este proceso (carga, review)
+        events = [ev for p in parts for ev in p.get("profile", [])] + profiler.take_events()
+        prof = write_profile(run_root, events, timings["cache"])
+        log.info("Profile (top by total ms): " + ", ".join(
+            f"{r['cat']}:{r['name']}={r['total_ms']:.0f}ms" for r in prof["by_name"][:6]))
     timings["total_ms"] = round((time.perf_counter() - t_run0) * 1000, 1)
     save_json(run_root / "aggregate" / "timings.json", timings)
 
@@ -166,13 +620,17 @@ def run_sigilum(cheque_path: str, cuenta_id: str, firmas_dir: str,
         "best_trial": best_overall,
         "n_trials": len(pipelines),
         "target_size": list(target_size),
-        "max_trials": max_trials
+        "max_trials": max_trials,
+        "strategy": strategy["name"],
+        "artifacts": artifacts
     })
+    if agreement is not None:
+        meta["agreement"] = agreement
     run_meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
 
-    print(json.dumps({
+    return {
         "run_dir": str(run_root),
         "status": status,
         "best_trial": best_overall,
         "timings_ms": timings["total_ms"]
-    }, ensure_ascii=False, indent=2))
+    }
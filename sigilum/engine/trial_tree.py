@@ -0,0 +1,163 @@
+# sigilum/engine/trial_tree.py
+from __future__ import annotations
+from typing import List, Dict, Any, Iterator, Tuple
+from sigilum.engine.phase_engine import step_key, load_step, compute_step, compute_steps, load_meta, _snapshot
+from sigilum.io.cache import root_key as image_root_key, has_cached, load_from_cache, alias_in_cache
+from sigilum.phases.base import get_phase_cls
+from sigilum.utils.hashing import fingerprint, content_digest
+from sigilum.utils.logger import get_logger
+
+APPLY_MANY_MAX = 16  # hermanos por llamada a apply_many (sus salidas conviven en memoria)
+
+class TrialNode:
+    """Nodo del trie de trials: un step concreto (phase, params) y sus continuaciones."""
+    __slots__ = ("step", "children", "trials")
+
+    def __init__(self, step: Dict[str, Any] | None = None):
+        self.step = step
+        self.children: Dict[Tuple[str, str], "TrialNode"] = {}
+        self.trials: List[int] = []  # trial_idx que terminan en este nodo
+
+def build_trial_tree(pipelines: List[List[dict]]) -> TrialNode:
+    """
+    Fusiona los pipelines en un trie keyed por (phase, fingerprint(params efectivos)).
+    Los trial_idx son 1-based, en el orden de `pipelines`.
+    """
+    root = TrialNode()
+    for t_idx, steps in enumerate(pipelines, start=1):
+        node = root
+        for step in steps:
+            k = (step["phase"], fingerprint(get_phase_cls(step["phase"])().effective_params(step.get("params", {}))))
+            child = node.children.get(k)
+            if child is None:
+                child = node.children[k] = TrialNode(step)
+            node = child
+        node.trials.append(t_idx)
+    return root
+
+def count_nodes(node: TrialNode) -> int:
+    return sum(1 + count_nodes(c) for c in node.children.values())
+
+class _LazyImage:
+    """Imagen de un nodo: se carga de cache o se computa recién cuando alguien la necesita."""
+    __slots__ = ("key", "img", "snap", "parent", "step", "digest")
+
+    def __init__(self, key: str, img=None, snap: dict | None = None, parent: "_LazyImage | None" = None, step=None):
+        self.key, self.img, self.snap, self.parent, self.step = key, img, snap, parent, step
+        self.digest: str | None = None
+
+    def content(self, use_cache: bool) -> str:
+        """Digest del contenido de la imagen (se materializa si hace falta)."""
+        if self.digest is None:
+            self.digest = content_digest(self.get(use_cache))
+        return self.digest
+
+    def reuse(self, src_key: str) -> bool:
+        """
+        La entrada del step es idéntica a la de un nodo ya computado (src_key) con el mismo
+        step: su salida también. Se toma del cache y se registra bajo self.key sin ejecutar.
+        """
+        out = load_from_cache(src_key)
+        if out is None:
+            return False
+        alias_in_cache(self.key, src_key, out)
+        self.img = out
+        self.snap.update({"cache": "dup", "duplicate_of": src_key})
+        if get_phase_cls(self.step["phase"]).has_meta():
+            meta = load_meta(src_key)
+            if meta is not None:
+                self.snap["meta"] = meta
+        return True
+
+    def get(self, use_cache: bool):
+        if self.img is None:
+            idx = self.snap["idx"]
+            out, snap = load_step(self.step, idx, self.key) if use_cache else (None, None)
+            if out is None:
+                out, snap = compute_step(self.parent.get(use_cache), self.step, idx, self.key, use_cache=use_cache)
+            self.img = out
+            self.snap.update(snap)
+        return self.img
+
+def run_trial_tree(img, pipelines: List[List[dict]], use_cache: bool = True,
+                   root_key: str | None = None) -> Iterator[Tuple[int, Any, List[dict]]]:
+    """
+    Ejecuta los pipelines recorriendo el trie en profundidad: cada prefijo distinto
+    corre una sola vez y las imágenes intermedias viven en memoria solo mientras
+    su rama está activa. Los nodos en cache no se cargan salvo que un trial termine
+    en ellos o un hijo sin cache necesite su imagen (se salta al step cacheado más profundo).
+    Genera: (trial_idx, imagen_final, snapshots) en orden DFS (no en orden de trial).
+    """
+    log = get_logger()
+    root = build_trial_tree(pipelines)
+    n_steps = sum(len(p) for p in pipelines)
+    log.info(f"Trial tree: {len(pipelines)} trial(s) → {count_nodes(root)} distinct step(s) of {n_steps}")
+    # (step, digest de la entrada) → key del nodo que ya lo computó en este run: ramas con
+    # params distintos que producen el mismo intermedio comparten todo lo de abajo
+    by_content: Dict[str, str] = {}
+    stats = {"dup": 0, "batched": 0}
+
+    def visit(node: TrialNode, lazy: _LazyImage, chain: List[dict]):
+        for t_idx in node.trials:
+            out = lazy.get(use_cache)
+            yield t_idx, out, [dict(s) for s in chain]
+        kids, pending = [], []
+        for child in node.children.values():
+            key = step_key(child.step, lazy.key)
+            cls = get_phase_cls(child.step["phase"])
+            snap = _snapshot(len(chain) + 1, cls().name, child.step.get("params", {}), key, 0.0, "skip")
+            cached = use_cache and has_cached(key)
+            if cached and cls.has_meta():
+                meta = load_meta(key)  # p.ej. la ROI, aunque la imagen del step no se cargue
+                if meta is not None:
+                    snap["meta"] = meta
+            child_lazy = _LazyImage(key, snap=snap, parent=lazy, step=child.step)
+            kids.append((child, child_lazy, snap))
+            if not cached:
+                # miss seguro: computar ya (usa/materializa al padre), salvo entrada ya vista
+                ck = step_key(child.step, "content:" + lazy.content(use_cache)) if use_cache else None
+                if ck in by_content and child_lazy.reuse(by_content[ck]):
+                    stats["dup"] += 1
+                else:
+                    pending.append((child_lazy, ck))
+        # hermanos con la misma fase (solo difieren en sus params): una llamada a apply_many
+        # por tanda, justo antes de bajar al primero (las salidas de la tanda conviven en memoria)
+        by_phase: Dict[str, List[Tuple[_LazyImage, str | None]]] = {}
+        for child_lazy, ck in pending:
+            by_phase.setdefault(child_lazy.snap["phase"], []).append((child_lazy, ck))
+        part_of: Dict[int, list] = {}
+        for group in by_phase.values():
+            for i in range(0, len(group), APPLY_MANY_MAX):
+                part = group[i:i + APPLY_MANY_MAX]
+                for cl, _ in part:
+                    part_of[id(cl)] = part
+        for child, child_lazy, snap in kids:
+            part = part_of.pop(id(child_lazy), None)
+            if part is not None:
+                compute_part(lazy, part)
+                for cl, _ in part:
+                    part_of.pop(id(cl), None)
+            chain.append(snap)
+            yield from visit(child, child_lazy, chain)
+            chain.pop()
+            child_lazy.img = None  # subárbol terminado
+
+    def compute_part(lazy: _LazyImage, part: List[Tuple[_LazyImage, str | None]]):
+        if len(part) == 1:
+            part[0][0].get(use_cache)
+        else:
+            res = compute_steps(lazy.get(use_cache), [cl.step for cl, _ in part], [cl.snap["idx"] for cl, _ in part],
+                                [cl.key for cl, _ in part], use_cache=use_cache)
+            for (cl, _), (out, snap) in zip(part, res):
+                cl.img = out
+                cl.snap.update(snap)
+            stats["batched"] += len(part)
+        for cl, ck in part:
+            if ck is not None:
+                by_content[ck] = cl.key
+
+    yield from visit(root, _LazyImage(root_key or image_root_key(img), img=img), [])
+    if stats["dup"]:
+        log.info(f"Trial tree: {stats['dup']} step(s) reused from identical intermediates")
+    if stats["batched"]:
+        log.info(f"Trial tree: {stats['batched']} sibling step(s) computed via apply_many")
@@ -1,24 +1,265 @@
 from __future__ import annotations
 from pathlib import Path
-import cv2
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import argparse, atexit, json, os, threading
+from multiprocessing import util as mp_util
 import numpy as np
-from sigilum.utils.hashing import fingerprint, sha1_image
+from sigilum.io.store import PackedStore
+from sigilum.utils.hashing import fingerprint, sha1_image, sha1_bytes
+from sigilum.utils.logger import get_logger, setup_console_logging
+from sigilum.utils.profiler import span
 
 CACHE_ROOT = Path(".cache")
+DEFAULT_MEM_BUDGET_MB = 512
+DEFAULT_DISK_BUDGET_GB = 10
+MAX_PENDING_WRITES = 64  # backpressure del write-through a disco
 
 def ensure_dir(p: Path):
     p.mkdir(parents=True, exist_ok=True)
 
-def cache_key(phase_name: str, params: dict, input_img) -> str:
-    return f"{phase_name}_{fingerprint(params)}_{sha1_image(input_img)[:8]}"
+def root_key(img) -> str:
+    """Key raíz de una cadena: único hash de la imagen original."""
+    return sha1_image(img)[:16]
+
+def cache_key(phase_name: str, params: dict, parent_key: str) -> str:
+    """
+    Key encadenada (estilo Merkle): deriva de la key del step anterior + fase + params,
+    así no hace falta re-hashear la imagen intermedia en cada step.
+    """
+    fp = fingerprint(params)
+    chained = sha1_bytes(f"{parent_key}|{phase_name}|{fp}".encode("utf-8"))[:12]
+    return f"{phase_name}_{fp}_{chained}"
+
+class MemoryCache:
+    """
+    Tier LRU en memoria (proceso) con presupuesto en bytes.
+    Se guarda una vista read-only de cada imagen (el array del caller no se toca):
+    se comparte entre trials sin copiar. Las vistas de otro array (p.ej. el recorte de
+    SignatureROI) se copian: retendrían el buffer entero y el presupuesto solo cuenta su nbytes.
+    Los memmap del store quedan como están (no ocupan memoria del proceso).
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self._items: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            img = self._items.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return img
+
+    def put(self, key: str, img: np.ndarray):
+        size = int(img.nbytes)
+        if size > self.max_bytes:
+            return
+        if img.base is not None and not isinstance(img, np.memmap):
+            img = img.copy()
+        view = img.view()
+        view.flags.writeable = False
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= int(old.nbytes)
+            self._items[key] = view
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, ev = self._items.popitem(last=False)
+                self.nbytes -= int(ev.nbytes)
+                self.evictions += 1
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+_MEM = MemoryCache(DEFAULT_MEM_BUDGET_MB * 1024 * 1024)
+_DISK_STATS = {"disk_hits": 0, "disk_misses": 0, "disk_writes": 0}
+_stats_lock = threading.Lock()  # disk_writes lo incrementa el thread writer
+_disk_budget_bytes = int(DEFAULT_DISK_BUDGET_GB * 1024 ** 3)
+_store: PackedStore | None = None
+_writer: ThreadPoolExecutor | None = None
+_pending = threading.BoundedSemaphore(MAX_PENDING_WRITES)
+_futures: set = set()
+_futures_lock = threading.Lock()
+
+def configure_cache(mem_budget_mb: float | None = None, disk_budget_gb: float | None = None):
+    """Ajusta el presupuesto del tier en memoria (0 lo desactiva) y el cap del store en disco."""
+    global _disk_budget_bytes
+    if disk_budget_gb is not None:
+        _disk_budget_bytes = int(disk_budget_gb * 1024 ** 3)
+    if mem_budget_mb is not None:
+        _MEM.max_bytes = int(mem_budget_mb * 1024 * 1024)
+        if _MEM.max_bytes <= 0:
+            _MEM.clear()
+
+def cache_config() -> dict:
+    """Config actual (para replicarla en procesos worker)."""
+    return {"mem_budget_mb": _MEM.max_bytes / (1024 * 1024), "disk_budget_gb": _disk_budget_bytes / 1024 ** 3}
+
+def cache_stats() -> dict:
+    return {
+        "mem_hits": _MEM.hits, "mem_misses": _MEM.misses, "mem_evictions": _MEM.evictions,
+        "mem_entries": len(_MEM), "mem_bytes": _MEM.nbytes, "mem_budget_bytes": _MEM.max_bytes,
+        **_disk_stats(),
+    }
+
+CACHE_GAUGES = ("mem_entries", "mem_bytes", "mem_budget_bytes")  # estado actual, no contadores
+
+def cache_stats_since(before: dict) -> dict:
+    """cache_stats() con los contadores relativos a `before` (snapshot previo de este proceso)."""
+    return {k: v if k in CACHE_GAUGES else v - before.get(k, 0) for k, v in cache_stats().items()}
+
+def _disk_stats() -> dict:
+    with _stats_lock:
+        return dict(_DISK_STATS)
+
+def _count(stat: str):
+    with _stats_lock:
+        _DISK_STATS[stat] += 1
+
+def get_store() -> PackedStore:
+    global _store
+    if _store is None:
+        _store = PackedStore(CACHE_ROOT / "store")  # lo cierra _shutdown, después del flush
+    return _store
+
+def _write_entry(key: str, img, src_key: str | None = None):
+    try:
+        with span("cache_write", cat="io", img=img):
+            if src_key is not None and get_store().alias(key, src_key):
+                return  # mismo contenido que src_key: solo una fila más en el índice
+            get_store().put(key, img)
+            _count("disk_writes")
+    except Exception as e:
+        get_logger().warning(f"Cache write failed for {key}: {e}")
+    finally:
+        _pending.release()
+
+def _submit_write(key: str, img, src_key: str | None = None):
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sigilum-cache")
+    _pending.acquire()  # bloquea si hay demasiadas escrituras en vuelo
+    fut = _writer.submit(_write_entry, key, img, src_key)
+    with _futures_lock:
+        _futures.add(fut)
+    fut.add_done_callback(_discard_future)
+
+def _discard_future(fut):
+    with _futures_lock:
+        _futures.discard(fut)
+
+def flush_cache(enforce_cap: bool = True):
+    """Espera a que terminen las escrituras pendientes y aplica el cap de disco si se superó."""
+    with _futures_lock:
+        pending = list(_futures)
+    for f in pending:
+        f.result()
+    if enforce_cap and _store is not None and _store.live_bytes() > _disk_budget_bytes:
+        _store.gc(max_bytes=_disk_budget_bytes)
+
+def _shutdown():
+    # orden: primero drenar las escrituras pendientes, recién después sellar el shard propio
+    flush_cache(enforce_cap=False)
+    if _store is not None:
+        _store.close()
+
+atexit.register(_shutdown)
+
+def close_cache_on_worker_exit():
+    """
+    Para el initializer de un pool de procesos: atexit no corre si el worker sale por os._exit
+    (fork), y entonces su shard queda sin sellar (gc no lo compacta hasta STALE_SHARD_S) y se
+    pierden los last_access pendientes. Los finalizers de multiprocessing corren al terminar el
+    proceso hijo con cualquier start method; _shutdown es idempotente si después corre atexit.
+    """
+    mp_util.Finalize(None, _shutdown, exitpriority=10)
+
+def _reset_after_fork():
+    # el thread writer y los locks no sobreviven a un fork: el hijo arranca con los suyos
+    global _writer, _pending, _futures, _futures_lock, _stats_lock
+    _writer = None
+    _pending = threading.BoundedSemaphore(MAX_PENDING_WRITES)
+    _futures, _futures_lock = set(), threading.Lock()
+    _stats_lock = threading.Lock()
+    _MEM._lock = threading.Lock()
+    if _store is not None:
+        _store.reset_after_fork()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def has_cached(key: str) -> bool:
+    """Existe la entrada (memoria o disco), sin cargarla ni tocar contadores."""
+    return key in _MEM or get_store().has(key)
 
 def load_from_cache(key: str):
-    p = CACHE_ROOT / f"{key}.png"
-    if p.exists():
-        img = cv2.imdecode(np.fromfile(str(p), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    img = _MEM.get(key) if _MEM.max_bytes > 0 else None
+    if img is not None:
         return img
+    img = get_store().get(key)  # np.memmap read-only (zero-copy)
+    if img is not None:
+        _count("disk_hits")
+        if _MEM.max_bytes > 0:
+            _MEM.put(key, img)
+        return img
+    _count("disk_misses")
     return None
 
 def save_to_cache(key: str, img):
-    ensure_dir(CACHE_ROOT)
-    cv2.imencode(".png", img)[1].tofile(str(CACHE_ROOT / f"{key}.png"))
+    if _MEM.max_bytes > 0:
+        _MEM.put(key, img)
+    _submit_write(key, img)
+
+def alias_in_cache(key: str, src_key: str, img):
+    """Guarda `key` cuya salida es idéntica a la de `src_key`: en disco se reusan sus bytes."""
+    if _MEM.max_bytes > 0:
+        _MEM.put(key, img)
+    _submit_write(key, img, src_key)
+
+def main():
+    ap = argparse.ArgumentParser(description="Mantenimiento del cache de fases de Sigilum")
+    ap.add_argument("cmd", choices=["stats", "gc"])
+    ap.add_argument("--root", default=str(CACHE_ROOT), help="Carpeta del cache (default .cache)")
+    ap.add_argument("--max-gb", type=float, default=None, help="gc: cap de bytes vivos (LRU)")
+    ap.add_argument("--max-age-days", type=float, default=None, help="gc: evictar entradas sin uso hace N días")
+    ap.add_argument("--purge-legacy", action="store_true", help="gc: borrar PNGs del layout viejo (.cache/*.png)")
+    args = ap.parse_args()
+    setup_console_logging("INFO")
+
+    root = Path(args.root)
+    store = PackedStore(root / "store")
+    legacy = list(root.glob("*.png"))
+    if args.cmd == "stats":
+        out = store.stats()
+    else:
+        out = store.gc(max_bytes=int(args.max_gb * 1024 ** 3) if args.max_gb is not None else None,
+                       max_age_s=args.max_age_days * 86400 if args.max_age_days is not None else None)
+        if args.purge_legacy:
+            for p in legacy:
+                p.unlink(missing_ok=True)
+            legacy = []
+    store.close()
+    out["legacy_png_files"] = len(legacy)
+    print(json.dumps(out, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,12 @@ from __future__ import annotations
 from pathlib import Path
 import cv2
 import numpy as np
+from sigilum.utils.profiler import span
 
 def load_image_gray(path: str | Path):
-    img = cv2.imdecode(np.fromfile(str(path), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    with span("image_read", cat="io") as prof:
+        img = cv2.imdecode(np.fromfile(str(path), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        prof["out_shape"] = list(img.shape) if img is not None else None
     if img is None:
         raise FileNotFoundError(f"No se pudo cargar imagen: {path}")
     return img
@@ -1,18 +1,36 @@
 # sigilum/io/saver.py (solo añade la carpeta logs)
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import json
+import json, os, threading
 import shutil
 from datetime import datetime
 import cv2
 import numpy as np
+from sigilum.utils.profiler import span
+
+# Niveles de artefactos por trial (--artifacts):
+#   none    → solo aggregate/ y run.json
+#   summary → + summary.json / phases_chain.json por trial
+#   topk    → + final.png, overlays y pairs de los top-K trials
+#   full    → imágenes de todos los trials
+ARTIFACT_LEVELS = ("none", "summary", "topk", "full")
+ARTIFACT_WRITER_THREADS = 2   # PNG encode libera el GIL: 2 threads alcanzan para no frenar el loop
+MAX_PENDING_ARTIFACTS = 256   # backpressure: el loop de trials espera si hay más escrituras en vuelo
+
+_writer: ThreadPoolExecutor | None = None
+_pending = threading.BoundedSemaphore(MAX_PENDING_ARTIFACTS)
+_futures: set = set()
+_futures_lock = threading.Lock()
+_errors: list = []
 
 def _ts() -> str:
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
-def create_run_dir(cheque_path: str, cuenta_id: str, pipeline_cfg_path: str, search_cfg_path: str, metrics_cfg_path: str) -> Path:
-    run_id = f"{_ts()}__{Path(cheque_path).stem}"
-    root = Path("runs") / run_id
+def create_run_dir(cheque_path: str, cuenta_id: str, pipeline_cfg_path: str, search_cfg_path: str, metrics_cfg_path: str,
+                   runs_root: str | Path = "runs", run_id: str | None = None) -> Path:
+    run_id = run_id or f"{_ts()}__{Path(cheque_path).stem}"
+    root = Path(runs_root) / run_id
     (root / "input" / "firmas").mkdir(parents=True, exist_ok=True)
     (root / "configs").mkdir(parents=True, exist_ok=True)
     (root / "trials").mkdir(parents=True, exist_ok=True)
@@ -41,10 +59,73 @@ def copy_firmas_into_run(root: Path, firmas_paths: list[str]) -> list[Path]:
         dsts.append(dst)
     return dsts
 
-def save_snapshot(path: Path, img: np.ndarray):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    cv2.imencode(".png", img)[1].tofile(str(path))
+def _write_png(path: Path, img: np.ndarray):
+    with span("png_write", cat="io", img=img):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        cv2.imencode(".png", img)[1].tofile(str(path))
+
+def _write_text(path: Path, text: str):
+    with span("json_write", cat="io", nbytes=len(text)):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+
+def _task(fn, args):
+    # errores y cupo se registran dentro del task: al completarse el future ya están anotados
+    try:
+        fn(*args)
+    except Exception as e:
+        with _futures_lock:
+            _errors.append(e)
+    finally:
+        _pending.release()
+
+def _forget(fut):
+    with _futures_lock:
+        _futures.discard(fut)
+
+def _submit(fn, *args):
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=ARTIFACT_WRITER_THREADS, thread_name_prefix="sigilum-artifacts")
+    _pending.acquire()  # bloquea si hay demasiadas escrituras en vuelo
+    fut = _writer.submit(_task, fn, args)
+    with _futures_lock:
+        _futures.add(fut)
+    fut.add_done_callback(_forget)
+
+def flush_artifacts():
+    """Espera las escrituras en background; re-lanza el primer error que haya habido."""
+    with _futures_lock:
+        pending = list(_futures)
+    for f in pending:
+        f.result()
+    with _futures_lock:
+        errors = _errors[:]
+        _errors.clear()
+    if errors:
+        raise errors[0]
+
+def _reset_after_fork():
+    global _writer, _pending, _futures, _futures_lock, _errors
+    _writer = None
+    _errors = []
+    _pending = threading.BoundedSemaphore(MAX_PENDING_ARTIFACTS)
+    _futures, _futures_lock = set(), threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def save_snapshot(path: Path, img: np.ndarray, background: bool = False):
+    """PNG de img. background=True encola el encode+escritura (img no debe mutarse después)."""
+    if background:
+        _submit(_write_png, path, img)
+    else:
+        _write_png(path, img)
 
-def save_json(path: Path, obj: dict):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+def save_json(path: Path, obj: dict, background: bool = False):
+    # se serializa ya: obj puede cambiar después de encolar
+    text = json.dumps(obj, ensure_ascii=False, indent=2)
+    if background:
+        _submit(_write_text, path, text)
+    else:
+        _write_text(path, text)
@@ -0,0 +1,277 @@
+# sigilum/io/store.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Any, List
+import os, json, sqlite3, threading, time, uuid
+import numpy as np
+from sigilum.utils.logger import get_logger
+
+ALIGN = 64                           # offsets alineados (memmap / SIMD friendly)
+SHARD_MAX_BYTES = 256 * 1024 * 1024  # al superar esto el shard se sella y se abre otro
+STALE_SHARD_S = 3600                 # shard sin sellar y sin tocar (writer caído) → tratable como sellado
+COMPACT_MIN_LIVE = 0.5               # compactar shards sellados con menos de 50% de bytes vivos
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries(
+    key TEXT PRIMARY KEY, shard TEXT NOT NULL, offset INTEGER NOT NULL, nbytes INTEGER NOT NULL,
+    shape TEXT NOT NULL, dtype TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS entries_access ON entries(last_access);
+CREATE INDEX IF NOT EXISTS entries_shard ON entries(shard);
+CREATE TABLE IF NOT EXISTS shards(
+    name TEXT PRIMARY KEY, sealed INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL);
+"""
+
+class PackedStore:
+    """
+    Store de arrays crudos: shards append-only + índice sqlite (WAL).
+    - Cada proceso escribe solo en su propio shard; la entrada se publica en el índice
+      recién cuando los bytes están en disco (fsync del shard antes del INSERT): un crash, aun
+      de la máquina, deja basura sin referenciar, nunca una entrada que apunte a bytes perdidos.
+      Si dos procesos escriben la misma key gana el primero.
+    - Los alias comparten extensión (shard, offset) con su fuente: los bytes vivos cuentan
+      cada extensión una sola vez.
+    - Lecturas zero-copy vía np.memmap (read-only).
+    - Evicción LRU/edad por entradas + compactación de shards sellados.
+    """
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.shards_dir = self.root / "shards"
+        self._lock = threading.RLock()
+        self._pid = None
+        self._touched: Dict[str, float] = {}
+        self._open()
+
+    # --- conexión / shard propio (se reabren si el proceso hizo fork) ---
+    def _open(self):
+        self.shards_dir.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.root / "index.sqlite"), timeout=60, check_same_thread=False,
+                                   isolation_level=None)
+        self._set_wal()
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._pid = os.getpid()
+        self._shard_name = None
+        self._shard_f = None
+
+    def _set_wal(self):
+        # pasar a WAL pide lock exclusivo y sqlite no aplica el busy timeout a este pragma:
+        # con varios workers abriendo un store nuevo a la vez, reintentar
+        for attempt in range(50):
+            try:
+                self._db.execute("PRAGMA journal_mode=WAL")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == 49:
+                    raise
+                time.sleep(0.02 * (attempt + 1))
+
+    def reset_after_fork(self):
+        self._lock = threading.RLock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._touched = {}
+            self._open()
+        return self._db
+
+    def _writable_shard(self, nbytes: int):
+        if self._shard_f is not None and self._shard_f.tell() + nbytes > SHARD_MAX_BYTES:
+            self._seal_own()
+        if self._shard_f is None:
+            self._shard_name = f"{int(time.time())}_{os.getpid()}_{uuid.uuid4().hex[:8]}.bin"
+            self._shard_f = open(self.shards_dir / self._shard_name, "ab")
+            self._conn().execute("INSERT OR IGNORE INTO shards(name, sealed, created) VALUES (?, 0, ?)",
+                                 (self._shard_name, time.time()))
+        return self._shard_name, self._shard_f
+
+    def _seal_own(self):
+        if self._shard_f is None:
+            return
+        self._shard_f.close()
+        self._conn().execute("UPDATE shards SET sealed=1 WHERE name=?", (self._shard_name,))
+        self._shard_f, self._shard_name = None, None
+
+    def close(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._flush_touched()
+            self._seal_own()
+
+    # --- API ---
+    def has(self, key: str) -> bool:
+        with self._lock:
+            return self._conn().execute("SELECT 1 FROM entries WHERE key=?", (key,)).fetchone() is not None
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT shard, offset, shape, dtype FROM entries WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= 256:
+                self._flush_touched()
+        shard, offset, shape, dtype = row
+        shape = tuple(json.loads(shape))
+        if 0 in shape:  # array vacío (p.ej. 0 cajas de OCR): no hay bytes que mapear
+            return np.empty(shape, dtype=np.dtype(dtype))
+        try:
+            return np.memmap(self.shards_dir / shard, dtype=np.dtype(dtype), mode="r",
+                             offset=int(offset), shape=shape)
+        except (OSError, ValueError):
+            # shard compactado/borrado por otro proceso entre el lookup y el mmap
+            return None
+
+    def put(self, key: str, img: np.ndarray):
+        arr = np.ascontiguousarray(img)
+        data = arr.tobytes()
+        with self._lock:
+            db = self._conn()
+            if db.execute("SELECT 1 FROM entries WHERE key=?", (key,)).fetchone() is not None:
+                return
+            name, f = self._writable_shard(len(data) + ALIGN)
+            off = f.tell()
+            pad = (-off) % ALIGN
+            if pad:
+                f.write(b"\0" * pad)
+                off += pad
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())  # bytes durables antes de publicarlos en el índice
+            now = time.time()
+            db.execute("INSERT OR IGNORE INTO entries VALUES (?,?,?,?,?,?,?,?)",
+                       (key, name, off, len(data), json.dumps(list(arr.shape)), arr.dtype.str, now, now))
+
+    def alias(self, key: str, src_key: str) -> bool:
+        """Indexa `key` apuntando a los bytes de `src_key` (mismo contenido, sin copiar). False si src no está."""
+        with self._lock:
+            now = time.time()
+            cur = self._conn().execute(
+                "INSERT OR IGNORE INTO entries SELECT ?, shard, offset, nbytes, shape, dtype, ?, ? FROM entries WHERE key=?",
+                (key, now, now, src_key))
+            return cur.rowcount > 0 or self.has(key)
+
+    def _flush_touched(self):
+        if not self._touched:
+            return
+        items = [(t, k) for k, t in self._touched.items()]
+        self._touched = {}
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        db.executemany("UPDATE entries SET last_access=? WHERE key=?", items)
+        db.execute("COMMIT")
+
+    # --- mantenimiento ---
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._flush_touched()
+            db = self._conn()
+            n, oldest, newest = db.execute(
+                "SELECT COUNT(*), MIN(last_access), MAX(last_access) FROM entries").fetchone()
+            live = self._live(db)
+            shards = db.execute("SELECT name, sealed FROM shards").fetchall()
+        disk = sum((self.shards_dir / s).stat().st_size for s, _ in shards if (self.shards_dir / s).exists())
+        return {
+            "root": str(self.root), "entries": int(n), "live_bytes": int(live), "disk_bytes": int(disk),
+            "shards": len(shards), "sealed_shards": sum(1 for _, sealed in shards if sealed),
+            "oldest_access": oldest, "newest_access": newest,
+        }
+
+    def gc(self, max_bytes: int | None = None, max_age_s: float | None = None) -> Dict[str, Any]:
+        """Evicta por edad y luego LRU hasta max_bytes vivos; después compacta shards sellados."""
+        log = get_logger()
+        evicted = 0
+        with self._lock:
+            self._flush_touched()
+            db = self._conn()
+            if max_age_s is not None:
+                evicted += db.execute("DELETE FROM entries WHERE last_access < ?",
+                                      (time.time() - max_age_s,)).rowcount
+            if max_bytes is not None:
+                live = self._live(db)
+                if live > max_bytes:
+                    # bajar a 90% del cap para no re-disparar la evicción en cada run
+                    target = int(max_bytes * 0.9)
+                    drop: List[str] = []
+                    refs: Dict[tuple, int] = {}
+                    for ext in db.execute("SELECT shard, offset FROM entries"):
+                        refs[ext] = refs.get(ext, 0) + 1
+                    rows = db.execute("SELECT key, shard, offset, nbytes FROM entries ORDER BY last_access ASC").fetchall()
+                    for key, shard, off, nb in rows:
+                        if live <= target:
+                            break
+                        drop.append(key)
+                        refs[(shard, off)] -= 1
+                        if refs[(shard, off)] == 0:  # último alias de la extensión: recién ahí se liberan bytes
+                            live -= nb
+                    db.execute("BEGIN IMMEDIATE")
+                    db.executemany("DELETE FROM entries WHERE key=?", [(k,) for k in drop])
+                    db.execute("COMMIT")
+                    evicted += len(drop)
+        compacted, removed = self._compact()
+        out = {"evicted": evicted, "compacted_shards": compacted, "removed_shards": removed, **self.stats()}
+        log.info(f"Cache gc: {out}")
+        return out
+
+    def live_bytes(self) -> int:
+        with self._lock:
+            return self._live(self._conn())
+
+    @staticmethod
+    def _live(db: sqlite3.Connection, shard: str | None = None) -> int:
+        # bytes referenciados: cada extensión (shard, offset) una vez, tenga los alias que tenga
+        where, args = ("WHERE shard=?", (shard,)) if shard is not None else ("", ())
+        return int(db.execute(f"SELECT COALESCE(SUM(nbytes),0) FROM "
+                              f"(SELECT DISTINCT shard, offset, nbytes FROM entries {where})", args).fetchone()[0])
+
+    def _compact(self):
+        compacted = removed = 0
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            shards = db.execute("SELECT name, sealed FROM shards").fetchall()
+            for name, sealed in shards:
+                if name == self._shard_name:
+                    continue
+                path = self.shards_dir / name
+                size = path.stat().st_size if path.exists() else 0
+                if not sealed and path.exists() and now - path.stat().st_mtime < STALE_SHARD_S:
+                    continue  # shard activo de otro proceso
+                live = self._live(db, name)
+                if live == 0 or not path.exists():
+                    db.execute("DELETE FROM entries WHERE shard=?", (name,))
+                    db.execute("DELETE FROM shards WHERE name=?", (name,))
+                    path.unlink(missing_ok=True)
+                    removed += 1
+                    continue
+                if size and live / size >= COMPACT_MIN_LIVE:
+                    continue
+                # reescribir entradas vivas en el shard propio y repuntar el índice
+                rows = db.execute("SELECT key, offset, nbytes, shape, dtype FROM entries WHERE shard=?",
+                                  (name,)).fetchall()
+                moved, copied = [], {}
+                with open(path, "rb") as src:
+                    for key, off, nb, shape, dtype in rows:
+                        if off not in copied:  # los alias de una extensión se copian una sola vez
+                            src.seek(off)
+                            data = src.read(nb)
+                            new_name, f = self._writable_shard(nb + ALIGN)
+                            new_off = f.tell()
+                            pad = (-new_off) % ALIGN
+                            if pad:
+                                f.write(b"\0" * pad)
+                                new_off += pad
+                            f.write(data)
+                            copied[off] = (new_name, new_off)
+                        moved.append((*copied[off], key, name))
+                if self._shard_f is not None:
+                    self._shard_f.flush()
+                    os.fsync(self._shard_f.fileno())
+                db.execute("BEGIN IMMEDIATE")
+                db.executemany("UPDATE entries SET shard=?, offset=? WHERE key=? AND shard=?", moved)
+                db.execute("DELETE FROM shards WHERE name=?", (name,))
+                db.execute("COMMIT")
+                path.unlink(missing_ok=True)
+                compacted += 1
+        return compacted, removed
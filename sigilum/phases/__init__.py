@@ -1,6 +1,7 @@
-from .base import PhaseBase, register_phase, get_phase_cls
+from .base import PhaseBase, register_phase, get_phase_cls, canonical_steps, scale_steps
 from .autoresize import AutoResizePhase
 from .deskew import DeskewBorderPhase
+from .roi import SignatureROIPhase
 from .border import BorderBlurPhase
 from .illumination import IlluminationPhase
 from .color import ColorSelectPhase
@@ -4,6 +4,8 @@ from sigilum.phases.base import PhaseBase, register_phase
 
 @register_phase
 class AutoCropPhase(PhaseBase):
+    relevant_when = {"padding": {"enabled": (True,)}, "min_content_ratio": {"enabled": (True,)}}
+    scale_rules = {"padding": "linear"}  # size es el lienzo final: no escala
     def apply(self, img, enabled: bool = True, padding: int = 8, min_content_ratio: float = 0.0, size: tuple[int,int] = (256,256), **_):
         if not enabled:
             return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
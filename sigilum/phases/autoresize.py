@@ -4,6 +4,7 @@ from sigilum.phases.base import PhaseBase, register_phase
 
 @register_phase
 class AutoResizePhase(PhaseBase):
+    scale_rules = {"max_side": "linear"}
     def apply(self, img, max_side: int = 1600, **_):
         h, w = img.shape[:2]
         s = max(h, w)
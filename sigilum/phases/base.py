@@ -1,6 +1,8 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Type
+from functools import lru_cache
+from typing import Any, Dict, List, Type
+import inspect
 
 # Registro global de fases
 _PHASE_REGISTRY: Dict[str, Type["PhaseBase"]] = {}
@@ -18,18 +20,105 @@ def get_phase_cls(name: str) -> Type["PhaseBase"]:
         return _PHASE_REGISTRY[name[:-5]]
     raise KeyError(f"Phase '{name}' no registrada. Registradas: {list(_PHASE_REGISTRY)}")
 
+@lru_cache(maxsize=None)
+def _apply_defaults(cls: Type["PhaseBase"]) -> Dict[str, Any]:
+    """Defaults de los params con nombre de cls.apply (sin img ni **kwargs)."""
+    sig = inspect.signature(cls.apply)
+    return {k: p.default for k, p in list(sig.parameters.items())[2:]
+            if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY) and p.default is not p.empty}
+
 class PhaseBase(ABC):
     """Contrato mínimo para una fase pura (input -> output)."""
 
+    # relevancia condicional: {"nl_h": {"mode": ("nlmeans",)}} → nl_h solo cambia la salida con
+    # mode=nlmeans. Params sin entrada cuentan siempre; los defaults salen de la firma de apply.
+    relevant_when: Dict[str, Dict[str, tuple]] = {}
+
+    # params que dependen del tamaño en pixels, para correr el pipeline sobre la imagen escalada
+    # (búsqueda coarse_to_fine): "linear" (longitudes, radios, umbrales de votos), "area" (áreas
+    # en px²) u "odd" (ventanas impares ≥ 3). El resto no se toca.
+    scale_rules: Dict[str, str] = {}
+
     @property
     def name(self) -> str:
         return self.__class__.__name__.replace("Phase", "")
 
     @property
     def defaults(self) -> Dict[str, Any]:
-        return {}
+        return dict(_apply_defaults(type(self)))
+
+    @classmethod
+    def schema(cls) -> Dict[str, Dict[str, Any]]:
+        """{param: {"default": …, "when": {param: valores}}} para documentar / validar configs."""
+        return {k: {"default": d, "when": dict(cls.relevant_when.get(k, {}))} for k, d in _apply_defaults(cls).items()}
+
+    def effective_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Forma canónica de params: defaults completados y solo los params que afectan la salida
+        (los que apply ignora, por nombre o por modo, se descartan). Con esto se arman cache keys
+        y signatures: dos configs equivalentes dan la misma key.
+        """
+        defaults = _apply_defaults(type(self))
+        if not defaults:  # apply sin params declarados: se hashea tal cual
+            return dict(params)
+        p = dict(defaults)
+        for k, v in params.items():
+            if k not in defaults:
+                continue  # lo absorbe **_ de apply
+            d = defaults[k]
+            if isinstance(d, float) and isinstance(v, int) and not isinstance(v, bool):
+                v = float(v)  # 8 y 8.0 son el mismo valor
+            p[k] = v
+        return {k: v for k, v in p.items()
+                if all(p.get(c) in vals for c, vals in self.relevant_when.get(k, {}).items())}
+
+    def scaled_params(self, params: Dict[str, Any], factor: float) -> Dict[str, Any]:
+        """Params efectivos equivalentes para la imagen escalada por `factor` (ver scale_rules)."""
+        p = self.effective_params(params)
+        for k, kind in self.scale_rules.items():
+            if k in p:
+                p[k] = _scale_value(p[k], kind, factor)
+        return p
 
     @abstractmethod
     def apply(self, img, **params):
         """Aplica la operación y devuelve imagen."""
         ...
+
+    def describe(self, img, out, **params) -> Dict[str, Any] | None:
+        """
+        Metadatos JSON del paso (p.ej. la ROI elegida) a partir de entrada y salida; van al
+        snapshot (`meta`) y al cache junto a la salida. None: la fase no reporta nada.
+        """
+        return None
+
+    @classmethod
+    def has_meta(cls) -> bool:
+        return cls.describe is not PhaseBase.describe
+
+    def apply_many(self, img, param_list: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Una salida por cada dict de param_list, sobre la misma imagen de entrada. Las fases con
+        un paso caro compartible entre valores (filtros, gradientes) lo sobreescriben; el
+        resultado debe ser idéntico al de apply por separado.
+        """
+        return [self.apply(img, **p) for p in param_list]
+
+def _scale_value(v, kind: str, factor: float):
+    if isinstance(v, bool) or not isinstance(v, (int, float)) or v <= 0:
+        return v  # 0 suele ser "desactivado"
+    x = v * factor * factor if kind == "area" else v * factor
+    if isinstance(v, float):
+        return round(x, 6)
+    n = max(1, int(round(x)))
+    return max(3, n | 1) if kind == "odd" else n
+
+def scale_steps(steps: List[Dict[str, Any]], factor: float) -> List[Dict[str, Any]]:
+    """Pipeline canónico con los params dependientes del tamaño escalados por `factor`."""
+    return [{"phase": st["phase"], "params": get_phase_cls(st["phase"])().scaled_params(st.get("params", {}), factor)}
+            for st in steps]
+
+def canonical_steps(steps: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Pipeline con params efectivos por step (ver PhaseBase.effective_params)."""
+    return [{"phase": st["phase"], "params": get_phase_cls(st["phase"])().effective_params(st.get("params", {}))}
+            for st in steps]
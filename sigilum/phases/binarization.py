@@ -3,8 +3,26 @@ import cv2
 import numpy as np
 from sigilum.phases.base import PhaseBase, register_phase
 
+def _sauvola_stats(img, window: int):
+    """Media y desvío locales (filtro de media/var) para la ventana dada."""
+    w = max(3, window | 1)
+    mean = cv2.boxFilter(img.astype("float32"), -1, (w, w), normalize=True)
+    mean_sq = cv2.boxFilter((img.astype("float32")**2), -1, (w, w), normalize=True)
+    var = np.clip(mean_sq - mean**2, 0, None)
+    return mean, np.sqrt(var)
+
+def _sauvola(img, mean, std, k: float):
+    R = 128.0
+    thresh = mean * (1 + k * ((std / R) - 1))
+    return (img > thresh).astype("uint8") * 255
+
 @register_phase
 class BinarizationPhase(PhaseBase):
+    relevant_when = {
+        "adaptive_window": {"mode": ("adaptive",)}, "adaptive_C": {"mode": ("adaptive",)},
+        "sauvola_window": {"mode": ("sauvola",)}, "sauvola_k": {"mode": ("sauvola",)},
+    }
+    scale_rules = {"adaptive_window": "odd", "sauvola_window": "odd"}
     def apply(self, img, mode: str = "adaptive", invert: bool = False,
               adaptive_window: int = 35, adaptive_C: int = 7,
               sauvola_window: int = 41, sauvola_k: float = 0.3, **_):
@@ -17,16 +35,25 @@ class BinarizationPhase(PhaseBase):
             _, out = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         elif mode == "sauvola":
             # implementación simple usando filtro de media/var local
-            w = max(3, sauvola_window | 1)
-            mean = cv2.boxFilter(img.astype("float32"), -1, (w, w), normalize=True)
-            mean_sq = cv2.boxFilter((img.astype("float32")**2), -1, (w, w), normalize=True)
-            var = np.clip(mean_sq - mean**2, 0, None)
-            std = np.sqrt(var)
-            R = 128.0
-            thresh = mean * (1 + sauvola_k * ((std / R) - 1))
-            out = (img > thresh).astype("uint8") * 255
+            out = _sauvola(img, *_sauvola_stats(img, sauvola_window), sauvola_k)
         else:
             raise ValueError(f"mode {mode} inválido")
         if invert:
             out = 255 - out
         return out
+
+    def apply_many(self, img, param_list):
+        # sauvola: media/desvío una vez por ventana, un umbral por sauvola_k
+        stats = {}
+        outs = []
+        for p in param_list:
+            p = {**self.defaults, **p}
+            if p["mode"] != "sauvola":
+                outs.append(self.apply(img, **p))
+                continue
+            w = p["sauvola_window"]
+            if w not in stats:
+                stats[w] = _sauvola_stats(img, w)
+            out = _sauvola(img, *stats[w], p["sauvola_k"])
+            outs.append(255 - out if p["invert"] else out)
+        return outs
@@ -1,18 +1,39 @@
 from __future__ import annotations
 import cv2, numpy as np
 from sigilum.phases.base import PhaseBase, register_phase
+from sigilum.utils.edges import sobel_gradients, canny_from_gradients
+
+def _largest_contour(edges, close_sz: int):
+    k = cv2.getStructuringElement(cv2.MORPH_RECT, (close_sz, close_sz))
+    closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, k)
+    cnts, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return max(cnts, key=cv2.contourArea) if cnts else None
+
+def _crop(img, c, min_area: int, pad: int):
+    h, w = img.shape[:2]
+    if c is None: return img
+    if cv2.contourArea(c) < min_area: return img
+    x,y,bw,bh = cv2.boundingRect(c)
+    x0=max(0,x-pad); y0=max(0,y-pad); x1=min(w,x+bw+pad); y1=min(h,y+bh+pad)
+    return img[y0:y1, x0:x1]
 
 @register_phase
 class CandidatePhase(PhaseBase):
+    scale_rules = {"close_sz": "linear", "min_area": "area", "pad": "linear"}
     def apply(self, img, canny_low: int = 32, canny_high: int = 40, close_sz: int = 3, min_area: int = 2300, pad: int = 8, **_):
         edges = cv2.Canny(img, canny_low, canny_high)
-        k = cv2.getStructuringElement(cv2.MORPH_RECT, (close_sz, close_sz))
-        closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, k)
-        cnts, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        h, w = img.shape[:2]
-        if not cnts: return img
-        c = max(cnts, key=cv2.contourArea)
-        if cv2.contourArea(c) < min_area: return img
-        x,y,bw,bh = cv2.boundingRect(c)
-        x0=max(0,x-pad); y0=max(0,y-pad); x1=min(w,x+bw+pad); y1=min(h,y+bh+pad)
-        return img[y0:y1, x0:x1]
+        return _crop(img, _largest_contour(edges, close_sz), min_area, pad)
+
+    def apply_many(self, img, param_list):
+        # gradientes una vez; bordes por par de umbrales; contorno por (umbrales, close_sz)
+        ps = [{**self.defaults, **p} for p in param_list]
+        grads = sobel_gradients(img)
+        edges, contours = {}, {}
+        for p in ps:
+            lo_hi = (p["canny_low"], p["canny_high"])
+            if lo_hi not in edges:
+                edges[lo_hi] = canny_from_gradients(grads, *lo_hi)
+            if lo_hi + (p["close_sz"],) not in contours:
+                contours[lo_hi + (p["close_sz"],)] = _largest_contour(edges[lo_hi], p["close_sz"])
+        return [_crop(img, contours[(p["canny_low"], p["canny_high"], p["close_sz"])], p["min_area"], p["pad"])
+                for p in ps]
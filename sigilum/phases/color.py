@@ -4,6 +4,7 @@ from sigilum.phases.base import PhaseBase, register_phase
 
 @register_phase
 class ColorSelectPhase(PhaseBase):
+    relevant_when = {"space": {"enabled": (True,)}, "channel": {"enabled": (True,), "space": ("LAB", "HSV")}}
     def apply(self, img, enabled: bool = False, space: str = "LAB", channel: int = 1, **_):
         if not enabled: return img
         if space == "LAB":
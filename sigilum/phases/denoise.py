@@ -4,6 +4,11 @@ from sigilum.phases.base import PhaseBase, register_phase
 
 @register_phase
 class DenoisePhase(PhaseBase):
+    relevant_when = {
+        "bil_d": {"mode": ("bilateral",)}, "bil_sigma": {"mode": ("bilateral",)},
+        "nl_patch": {"mode": ("nlmeans",)}, "nl_dist": {"mode": ("nlmeans",)}, "nl_h": {"mode": ("nlmeans",)},
+    }
+    scale_rules = {"bil_d": "linear", "nl_patch": "odd", "nl_dist": "odd"}
     def apply(self, img, mode: str = "bilateral", bil_d: int = 2, bil_sigma: int = 21,
               nl_patch: int = 5, nl_dist: int = 9, nl_h: float = 0.8, **_):
         if mode == "bilateral":
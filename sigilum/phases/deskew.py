@@ -1,20 +1,38 @@
 from __future__ import annotations
 import cv2, numpy as np
 from sigilum.phases.base import PhaseBase, register_phase
+from sigilum.utils.edges import sobel_gradients, canny_from_gradients, hough_lines_by_threshold
+
+def _rotate(img, lines, min_apply_angle: float, max_angle_deg: float):
+    angle = 0.0
+    if lines is not None:
+        angles = [(theta - np.pi/2.0) for rho, theta in lines[:,0]]
+        angle = float(np.degrees(np.median(angles)))
+        if abs(angle) < min_apply_angle:
+            angle = 0.0
+        angle = float(np.clip(angle, -max_angle_deg, max_angle_deg))
+    h, w = img.shape[:2]
+    M = cv2.getRotationMatrix2D((w/2, h/2), angle, 1.0)
+    return cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
 
 @register_phase
 class DeskewBorderPhase(PhaseBase):
+    scale_rules = {"hough_thresh": "linear"}  # votos ∝ largo de la línea
     def apply(self, img, canny_low: int = 50, canny_high: int = 150, hough_thresh: int = 200,
               min_apply_angle: float = 0.7, max_angle_deg: float = 5.0, **_):
         edges = cv2.Canny(img, canny_low, canny_high)
         lines = cv2.HoughLines(edges, 1, np.pi/180, hough_thresh)
-        angle = 0.0
-        if lines is not None:
-            angles = [(theta - np.pi/2.0) for rho, theta in lines[:,0]]
-            angle = float(np.degrees(np.median(angles)))
-            if abs(angle) < min_apply_angle:
-                angle = 0.0
-            angle = float(np.clip(angle, -max_angle_deg, max_angle_deg))
-        h, w = img.shape[:2]
-        M = cv2.getRotationMatrix2D((w/2, h/2), angle, 1.0)
-        return cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        return _rotate(img, lines, min_apply_angle, max_angle_deg)
+
+    def apply_many(self, img, param_list):
+        # gradientes una vez; bordes por par de umbrales; una sola votación de Hough por bordes
+        ps = [{**self.defaults, **p} for p in param_list]
+        grads = sobel_gradients(img)
+        lines = {}
+        for lo_hi in dict.fromkeys((p["canny_low"], p["canny_high"]) for p in ps):
+            edges = canny_from_gradients(grads, *lo_hi)
+            for t, ln in hough_lines_by_threshold(edges, [p["hough_thresh"] for p in ps
+                                                          if (p["canny_low"], p["canny_high"]) == lo_hi]).items():
+                lines[lo_hi + (t,)] = ln
+        return [_rotate(img, lines[(p["canny_low"], p["canny_high"], int(p["hough_thresh"]))],
+                        p["min_apply_angle"], p["max_angle_deg"]) for p in ps]
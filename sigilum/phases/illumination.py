@@ -2,8 +2,21 @@ from __future__ import annotations
 import cv2, numpy as np
 from sigilum.phases.base import PhaseBase, register_phase
 
+def _bg_kernel(bg_kernel: float) -> int:
+    return max(3, int(bg_kernel) | 1)
+
+def _bg_subtract(img, k: int):
+    bg = cv2.GaussianBlur(img, (k, k), 0)
+    out = cv2.normalize(cv2.absdiff(img, bg), None, 0, 255, cv2.NORM_MINMAX)
+    return out.astype("uint8")
+
 @register_phase
 class IlluminationPhase(PhaseBase):
+    relevant_when = {
+        "clahe_clip": {"mode": ("clahe",)}, "clahe_tile": {"mode": ("clahe",)},
+        "bg_kernel": {"mode": ("bg_subtract",)},
+    }
+    scale_rules = {"bg_kernel": "linear"}
     def apply(self, img, mode: str = "none", clahe_clip: float = 2.0, clahe_tile: int = 8, bg_kernel: float = 8.0, **_):
         if mode == "none":
             return img
@@ -11,8 +24,21 @@ class IlluminationPhase(PhaseBase):
             clahe = cv2.createCLAHE(clipLimit=float(clahe_clip), tileGridSize=(int(clahe_tile), int(clahe_tile)))
             return clahe.apply(img)
         if mode == "bg_subtract":
-            k = max(3, int(bg_kernel) | 1)
-            bg = cv2.GaussianBlur(img, (k, k), 0)
-            out = cv2.normalize(cv2.absdiff(img, bg), None, 0, 255, cv2.NORM_MINMAX)
-            return out.astype("uint8")
+            return _bg_subtract(img, _bg_kernel(bg_kernel))
         raise ValueError("mode inválido (none|clahe|bg_subtract)")
+
+    def apply_many(self, img, param_list):
+        # bg_subtract: un blur por kernel efectivo (bg_kernel 8 y 9 → k=9). Una pirámide en
+        # cascada no da bit a bit el mismo GaussianBlur, así que se comparte solo lo idéntico.
+        by_k = {}
+        outs = []
+        for p in param_list:
+            p = {**self.defaults, **p}
+            if p["mode"] != "bg_subtract":
+                outs.append(self.apply(img, **p))
+                continue
+            k = _bg_kernel(p["bg_kernel"])
+            if k not in by_k:
+                by_k[k] = _bg_subtract(img, k)
+            outs.append(by_k[k])
+        return outs
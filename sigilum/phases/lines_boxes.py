@@ -4,6 +4,17 @@ from sigilum.phases.base import PhaseBase, register_phase
 
 @register_phase
 class RemoveLinesBoxesPhase(PhaseBase):
+    relevant_when = {
+        **{k: {"use_hough": (True,)} for k in ("canny_low", "canny_high", "hough_thresh", "min_line_len_frac",
+                                                 "max_line_gap", "angle_tol_deg", "erase_thickness")},
+        **{k: {"remove_rectangles": (True,)} for k in ("rect_min_area", "rect_eps_frac", "rect_min_aspect",
+                                                         "rect_min_extent", "hollow_max_extent", "hollow_min_wh_sum")},
+    }
+    scale_rules = {
+        **dict.fromkeys(("morph_h_len", "morph_v_len", "hough_thresh", "max_line_gap", "erase_thickness",
+                         "hollow_min_wh_sum"), "linear"),
+        "rect_min_area": "area",
+    }
     def apply(self, img, morph_h_len: int = 256, morph_v_len: int = 160, morph_iter: int = 1,
               use_hough: bool = False, canny_low: int = 50, canny_high: int = 150,
               hough_thresh: int = 80, min_line_len_frac: float = 0.25, max_line_gap: int = 10,
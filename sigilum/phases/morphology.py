@@ -4,6 +4,7 @@ from sigilum.phases.base import PhaseBase, register_phase
 
 @register_phase
 class MorphologyPhase(PhaseBase):
+    scale_rules = {"open_sz": "linear", "close_sz": "linear", "min_area": "area"}
     def apply(self, img, open_sz: int = 1, open_iter: int = 1, close_sz: int = 3, close_iter: int = 1, min_area: int = 0, **_):
         out = img.copy()
         if open_sz > 0 and open_iter > 0:
@@ -1,7 +1,26 @@
 from __future__ import annotations
-import cv2
-import pytesseract
+from typing import Dict, Tuple
+import queue, threading
+import cv2, numpy as np
+from sigilum.io.cache import load_from_cache, save_to_cache
 from sigilum.phases.base import PhaseBase, register_phase
+from sigilum.utils.hashing import content_digest, fingerprint
+from sigilum.utils.profiler import span
+
+try:
+    import tesserocr  # API de Tesseract en proceso (sin un subproceso por llamada)
+except ImportError:
+    tesserocr = None
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+OCR_POOL_SIZE = 2  # APIs de tesserocr vivas por (lang, psm, oem) y por proceso
+
+# pool de PyTessBaseAPI ya inicializadas (cargar el modelo de un idioma cuesta ~100 ms)
+_POOL: Dict[Tuple, "queue.LifoQueue"] = {}
+_POOL_LOCK = threading.Lock()
 
 def _to_int_conf(v) -> int:
     """Convierte confianza a int, soportando int/float/str/None."""
@@ -25,8 +44,106 @@ def _to_int(v, default=0) -> int:
     except Exception:
         return int(default)
 
+def ocr_backend() -> str:
+    if tesserocr is not None:
+        return "tesserocr"
+    if pytesseract is not None:
+        return "pytesseract"
+    raise RuntimeError("OCRMask necesita tesserocr o pytesseract (+ Tesseract instalado): make setup-ocr")
+
+def _acquire_api(k: Tuple):
+    with _POOL_LOCK:
+        q = _POOL.setdefault(k, queue.LifoQueue())
+    try:
+        return q.get_nowait()
+    except queue.Empty:
+        lang, psm, oem = k
+        kw = {"lang": lang}
+        if psm is not None:
+            kw["psm"] = psm
+        if oem is not None:
+            kw["oem"] = oem
+        return tesserocr.PyTessBaseAPI(**kw)
+
+def _release_api(k: Tuple, api):
+    api.Clear()
+    q = _POOL[k]
+    if q.qsize() < OCR_POOL_SIZE:
+        q.put(api)
+    else:
+        api.End()
+
+def _words_tesserocr(img, lang: str, psm: int | None, oem: int | None) -> list:
+    k = (lang, psm, oem)
+    api = _acquire_api(k)
+    try:
+        arr = np.ascontiguousarray(img)
+        h, w = arr.shape[:2]
+        api.SetImageBytes(arr.tobytes(), w, h, 1 if arr.ndim == 2 else arr.shape[2], arr.strides[0])
+        api.Recognize()
+        level, rows = tesserocr.RIL.WORD, []
+        ri = api.GetIterator()
+        if ri is None:
+            return rows
+        for r in tesserocr.iterate_level(ri, level):
+            text, box = r.GetUTF8Text(level), r.BoundingBox(level)
+            if not text or not text.strip() or box is None:
+                continue
+            x0, y0, x1, y1 = box
+            rows.append((x0, y0, x1 - x0, y1 - y0, int(r.Confidence(level))))
+        return rows
+    finally:
+        _release_api(k, api)
+
+def _words_pytesseract(img, lang: str, psm: int | None, oem: int | None) -> list:
+    config_parts = []
+    if psm is not None:
+        config_parts.append(f"--psm {psm}")
+    if oem is not None:
+        config_parts.append(f"--oem {oem}")
+    data = pytesseract.image_to_data(img, lang=lang, config=" ".join(config_parts),
+                                     output_type=pytesseract.Output.DICT)
+    n = len(data.get("text", []))
+    # Asegurar longitudes y defaults
+    lefts   = data.get("left",   [0] * n)
+    tops    = data.get("top",    [0] * n)
+    widths  = data.get("width",  [0] * n)
+    heights = data.get("height", [0] * n)
+    confs   = data.get("conf",   [-1] * n)
+    texts   = data.get("text",   [""] * n)
+    rows = []
+    for i in range(n):
+        text = texts[i]
+        if text is None or str(text).strip() == "":
+            continue
+        rows.append((_to_int(lefts[i]), _to_int(tops[i]), _to_int(widths[i]), _to_int(heights[i]),
+                     _to_int_conf(confs[i])))
+    return rows
+
+def word_boxes(img, lang: str = "eng", psm: int | None = None, oem: int | None = None) -> np.ndarray:
+    """
+    Palabras con texto detectadas por Tesseract: array (n, 5) int32 de x, y, w, h, conf.
+    Se cachean aparte de la máscara (key: contenido de la imagen + lang/psm/oem + backend),
+    así cambiar solo min_conf / pad no vuelve a correr el OCR.
+    """
+    psm = None if psm is None else int(psm)
+    oem = None if oem is None else int(oem)
+    backend = ocr_backend()
+    fp = fingerprint({"lang": lang, "psm": psm, "oem": oem, "backend": backend})
+    key = f"OCRWords_{fp}_{content_digest(img)[:16]}"
+    boxes = load_from_cache(key)
+    if boxes is not None:
+        return boxes
+    with span(f"ocr_{backend}", cat="ocr", img=img):
+        rows = (_words_tesserocr if backend == "tesserocr" else _words_pytesseract)(img, lang, psm, oem)
+    boxes = np.array(rows, dtype=np.int32).reshape(-1, 5)
+    save_to_cache(key, boxes)
+    return boxes
+
 @register_phase
 class OCRMaskPhase(PhaseBase):
+    relevant_when = {k: {"enabled": (True,)} for k in ("lang", "min_conf", "pad", "psm", "oem")}
+    scale_rules = {"pad": "linear"}
     def apply(self, img, enabled: bool = True, lang: str = "eng",
               min_conf: int = 0, pad: int = 10, psm: int | None = None,
               oem: int | None = None, **_):
@@ -39,42 +156,11 @@ class OCRMaskPhase(PhaseBase):
         if not enabled:
             return img
 
-        config_parts = []
-        if psm is not None:
-            config_parts.append(f"--psm {int(psm)}")
-        if oem is not None:
-            config_parts.append(f"--oem {int(oem)}")
-        config = " ".join(config_parts) if config_parts else ""
-
-        data = pytesseract.image_to_data(
-            img, lang=lang, config=config, output_type=pytesseract.Output.DICT
-        )
-
         out = img.copy()
-        n = len(data.get("text", []))
-
-        # Asegurar longitudes y defaults
-        lefts   = data.get("left",   [0] * n)
-        tops    = data.get("top",    [0] * n)
-        widths  = data.get("width",  [0] * n)
-        heights = data.get("height", [0] * n)
-        confs   = data.get("conf",   [-1] * n)
-        texts   = data.get("text",   [""] * n)
-
         H, W = out.shape[:2]
-        for i in range(n):
-            conf = _to_int_conf(confs[i])
+        for x, y, w, h, conf in word_boxes(img, lang, psm, oem).tolist():
             if conf < int(min_conf):
                 continue
-            text = texts[i]
-            if text is None or str(text).strip() == "":
-                continue
-
-            x  = _to_int(lefts[i])
-            y  = _to_int(tops[i])
-            w  = _to_int(widths[i])
-            h  = _to_int(heights[i])
-
             x0 = max(0, x - pad)
             y0 = max(0, y - pad)
             x1 = min(W, x + w + pad)
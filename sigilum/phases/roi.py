@@ -0,0 +1,83 @@
+from __future__ import annotations
+import cv2, numpy as np
+from sigilum.phases.base import PhaseBase, register_phase
+
+def locate_signature(img, work_side: int = 400, region=(0.5, 0.4, 1.0, 1.0), line_frac: float = 0.15,
+                     merge: float = 0.03, min_area: int = 30):
+    """
+    Caja (x0, y0, x1, y1) del trazo de la firma en coords de img, o None si no hay tinta.
+    Todo a baja resolución (lado mayor work_side): Otsu invertido dentro de `region` (fracciones
+    x0, y0, x1, y1 de la imagen), se quitan líneas/recuadros impresos con aperturas largas y se
+    funden los trazos cercanos con una dilatación; gana el blob con más tinta.
+    """
+    g = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    h, w = g.shape
+    s = min(1.0, work_side / max(h, w))
+    small = cv2.resize(g, (max(1, round(w * s)), max(1, round(h * s))), interpolation=cv2.INTER_AREA) if s < 1 else g
+    sh, sw = small.shape
+    rx0, ry0 = int(region[0] * sw), int(region[1] * sh)
+    rx1, ry1 = int(np.ceil(region[2] * sw)), int(np.ceil(region[3] * sh))
+    sub = small[ry0:ry1, rx0:rx1]
+    if min(sub.shape) < 3:
+        return None
+    _, ink = cv2.threshold(sub, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    lh, lv = max(3, int(line_frac * sub.shape[1])), max(3, int(line_frac * sub.shape[0]))
+    lines = cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (lh, 1))) | \
+        cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, lv)))
+    ink = cv2.subtract(ink, lines)
+    m = max(1, int(merge * max(sw, sh)))
+    blobs = cv2.dilate(ink, cv2.getStructuringElement(cv2.MORPH_RECT, (m, m)))
+    n, labels = cv2.connectedComponents(blobs, connectivity=8)
+    if n <= 1:
+        return None
+    per_blob = np.bincount(labels[ink > 0], minlength=n)
+    per_blob[0] = 0
+    best = int(per_blob.argmax())
+    if per_blob[best] < min_area:
+        return None
+    ys, xs = np.nonzero((labels == best) & (ink > 0))
+    # de vuelta a la resolución de img (redondeando hacia afuera)
+    return (max(0, int((xs.min() + rx0) / s)), max(0, int((ys.min() + ry0) / s)),
+            min(w, int(np.ceil((xs.max() + 1 + rx0) / s))), min(h, int(np.ceil((ys.max() + 1 + ry0) / s))))
+
+def _view_offset(img, out):
+    """(y, x) de `out` dentro de `img` cuando out es una vista (recorte) de img."""
+    off = out.__array_interface__["data"][0] - img.__array_interface__["data"][0]
+    y, rest = divmod(off, img.strides[0])
+    return int(y), int(rest // img.strides[1])
+
+@register_phase
+class SignatureROIPhase(PhaseBase):
+    """
+    Localización temprana de la firma: devuelve la ventana (con `pad`) como vista de la entrada,
+    sin copiar, así las fases caras de abajo procesan solo esos pixels. La caja queda en el
+    snapshot del step (meta.roi, coords de la entrada de esta fase); sin tinta, pasa la imagen entera.
+
+    Recorta a propósito en vez de pasar la imagen entera con la ROI como metadata: las fases
+    reciben solo `img` (PhaseBase.apply), y respetar una caja externa obligaría a cambiar el
+    contrato de todas. Con la vista, cada fase sigue igual y ya trabaja solo sobre la ventana.
+    Las coords de los steps siguientes son relativas a la ventana; meta.roi[:2] es el offset
+    para llevarlas a la imagen de entrada.
+    """
+    relevant_when = {k: {"enabled": (True,)} for k in ("work_side", "region", "line_frac", "merge", "min_area", "pad")}
+    # work_side / min_area son de la imagen de trabajo, que ya se normaliza a work_side
+    scale_rules = {"pad": "linear"}
+
+    def apply(self, img, enabled: bool = True, work_side: int = 400, region: tuple = (0.5, 0.4, 1.0, 1.0),
+              line_frac: float = 0.15, merge: float = 0.03, min_area: int = 30, pad: int = 24, **_):
+        if not enabled:
+            return img
+        box = locate_signature(img, work_side, region, line_frac, merge, min_area)
+        if box is None:
+            return img
+        x0, y0, x1, y1 = box
+        h, w = img.shape[:2]
+        return img[max(0, y0 - pad):min(h, y1 + pad), max(0, x0 - pad):min(w, x1 + pad)]
+
+    def describe(self, img, out, enabled: bool = True, **_):
+        if not enabled:
+            return None
+        h, w = img.shape[:2]
+        y, x = _view_offset(img, out) if np.shares_memory(img, out) else (0, 0)
+        return {"roi": [x, y, int(out.shape[1]), int(out.shape[0])], "input_size": [w, h],
+                "pixel_fraction": round(out.shape[0] * out.shape[1] / float(h * w), 4)}
@@ -2,6 +2,7 @@ from __future__ import annotations
 import cv2, numpy as np, time
 from sigilum.phases.base import PhaseBase, register_phase
 from sigilum.utils.logger import get_logger
+from sigilum.utils.thinning import thin
 
 def _to_binary(img: np.ndarray, thr: int = 127) -> np.ndarray:
     """Devuelve binaria 0/255."""
@@ -18,14 +19,25 @@ class SkeletonizationPhase(PhaseBase):
     """
     Métodos disponibles:
       - method="skimage"    (rápido y estable; requiere scikit-image)
+      - method="lut"        (Zhang-Suen / Guo-Hall vectorizado con NumPy, ver utils.thinning;
+                             converge siempre y da lo mismo que ximgproc)
+      - method="ximgproc"   (si está opencv-contrib; si no, cae a "lut" con el mismo resultado)
       - method="morph"      (morfología iterativa con guardas)
-      - method="ximgproc"   (si está opencv-contrib; se usa Zhang-Suen)
-    Guardas:
-      - max_iter: corta lazos largos (solo morph)
-      - max_ms:   timeout duro (todos)
+    thinning: "zhang_suen" | "guo_hall" (lut / ximgproc)
+    Si skimage o ximgproc no están disponibles se usa "lut" (no el morph, que puede cortar).
+    Guardas (solo morph):
+      - max_iter: corta lazos largos
+      - max_ms:   timeout duro
     Tips de performance:
       - resize_before=True y size=(w,h) para procesar menos píxeles
     """
+    relevant_when = {
+        **{k: {"enabled": (True,)} for k in ("method", "resize_before")},
+        **{k: {"enabled": (True,), "method": ("morph",)} for k in ("max_iter", "log_every", "max_ms")},
+        "thinning": {"enabled": (True,), "method": ("lut", "ximgproc")},
+        "size": {"enabled": (True,), "resize_before": (True,)},
+    }
+
     def apply(
         self,
         img,
@@ -36,6 +48,7 @@ class SkeletonizationPhase(PhaseBase):
         max_iter: int = 1000,
         log_every: int = 50,
         max_ms: int = 3000,
+        thinning: str = "zhang_suen",
         **_,
     ):
         log = get_logger()
@@ -52,15 +65,18 @@ class SkeletonizationPhase(PhaseBase):
 
         try:
             if method == "ximgproc" and hasattr(cv2, "ximgproc"):
-                # Zhang–Suen thinning (muy rápido si está disponible)
+                # Zhang–Suen / Guo-Hall thinning (muy rápido si está disponible)
                 bw = (work > 0).astype("uint8") * 255
-                skel = cv2.ximgproc.thinning(bw, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN)
+                kind = cv2.ximgproc.THINNING_GUOHALL if thinning == "guo_hall" else cv2.ximgproc.THINNING_ZHANGSUEN
+                skel = cv2.ximgproc.thinning(bw, thinningType=kind)
                 dt = (time.perf_counter() - t0) * 1000
                 log.debug(f"[Skeletonize] ximgproc {bw.shape} → {dt:.1f} ms")
                 return skel
         except Exception:
-            # si falla, caemos a skimage/morph
+            # si falla, caemos a lut (mismo algoritmo, mismo resultado)
             pass
+        if method == "ximgproc":
+            method = "lut"
 
         if method == "skimage":
             try:
@@ -71,7 +87,16 @@ class SkeletonizationPhase(PhaseBase):
                 log.debug(f"[Skeletonize] skimage {work.shape} → {dt:.1f} ms")
                 return sk
             except Exception as e:
-                log.warning(f"[Skeletonize] skimage no disponible ({e}), usando 'morph'")
+                log.warning(f"[Skeletonize] skimage no disponible ({e}), usando 'lut'")
+                method = "lut"
+
+        if method == "lut":
+            skel = thin(work, thinning)
+            dt = (time.perf_counter() - t0) * 1000
+            log.debug(f"[Skeletonize] lut/{thinning} {work.shape} → {dt:.1f} ms")
+            return skel
+        if method != "morph":
+            raise ValueError(f"method inválido: {method} (skimage|lut|ximgproc|morph)")
 
         # Fallback: morfología iterativa con guardas
         element = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
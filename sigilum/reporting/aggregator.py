@@ -66,7 +66,7 @@ def _collect_trials(run_root: Path) -> pd.DataFrame:
             "phases_chain_path": str(chain.relative_to(run_root)) if chain.exists() else None,
         }
         # attach per-metric columns as m_<name>
-        row.update({f"m_{k}": float(v) for k, v in per_metric.items()})
+        row.update({f"m_{k}": float("nan") if v is None else float(v) for k, v in per_metric.items()})
         rows.append(row)
 
     if not rows:
@@ -41,7 +41,7 @@ def _collect_trials(run_root: Path) -> pd.DataFrame:
             "best_firma": best.get("firma"),
             "time_ms": float(idx2ms.get(t_idx, 0.0)),
             "summary_path": str(summ.relative_to(run_root))
-        } | {f"m_{k}": float(v) for k, v in per_metric.items()})
+        } | {f"m_{k}": float("nan") if v is None else float(v) for k, v in per_metric.items()})
 
     if not rows:
         return pd.DataFrame()
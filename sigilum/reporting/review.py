@@ -0,0 +1,118 @@
+# sigilum/reporting/review.py
+"""
+Imágenes de revisión diferidas: final.png + overlay/pair contra la mejor firma de los
+trials que importan, generadas después del scoring (o en cualquier momento después).
+
+  python -m sigilum.reporting.review --latest                  # top-5 del leaderboard
+  python -m sigilum.reporting.review --run runs/<run> --trials 12 40 --all-firmas
+
+La imagen final sale del cache de fases (leaderboard: final_key); si fue evictada se
+re-ejecuta el pipeline del trial (phases_chain.json) desde el cheque copiado en input/.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, List
+import argparse, json
+
+import sigilum.phases  # registra fases (re-ejecución del pipeline)
+from sigilum.engine.features import ImageFeatures
+from sigilum.engine.phase_engine import run_pipeline
+from sigilum.engine.references import RefSignature
+from sigilum.io.cache import load_from_cache, root_key
+from sigilum.io.loader import load_image_gray
+from sigilum.io.saver import save_snapshot, flush_artifacts
+from sigilum.utils.logger import get_logger, setup_console_logging
+from sigilum.utils.viz import pair_visuals
+
+def _latest_run(runs_root: Path) -> Path:
+    dirs = [p for p in runs_root.iterdir() if p.is_dir()]
+    if not dirs:
+        raise SystemExit("No hay runs en ./runs")
+    return max(dirs, key=lambda p: p.stat().st_mtime)
+
+def _load_json(path: Path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def final_image(run_root: Path, entry: dict, _cheque: Dict[str, object] | None = None):
+    """Salida final del trial: cache de fases o, si no está, re-ejecución de su pipeline."""
+    key = entry.get("final_key")
+    img = load_from_cache(key) if key else None
+    if img is not None:
+        return img
+    t_idx = entry["trial_idx"]
+    chain = run_root / "trials" / f"trial_{t_idx:04d}" / "phases_chain.json"
+    if not chain.exists():
+        raise FileNotFoundError(f"Trial {t_idx}: final fuera del cache y sin {chain} para re-ejecutarlo")
+    get_logger().info(f"Trial {t_idx:04d}: final not cached, re-running pipeline")
+    memo = _cheque if _cheque is not None else {}
+    if "img" not in memo:
+        cheque_name = _load_json(run_root / "run.json")["cheque_name"]
+        memo["img"] = load_image_gray(run_root / "input" / cheque_name)
+    out, _ = run_pipeline(memo["img"], _load_json(chain)["steps_def"], use_cache=True,
+                          root_key=root_key(memo["img"]))
+    return out
+
+def render_review(run_root: str | Path, trial_idxs: List[int] | None = None, topk: int = 5,
+                  all_firmas: bool = False) -> List[int]:
+    """
+    Escribe stages/final.png y overlays/pairs de `trial_idxs` (default: top-K del leaderboard),
+    contra la mejor firma de cada trial o contra todas (all_firmas). Devuelve los trials dibujados.
+    """
+    run_root = Path(run_root)
+    log = get_logger()
+    leaderboard = _load_json(run_root / "aggregate" / "leaderboard.json")["leaderboard"]
+    by_idx = {e["trial_idx"]: e for e in leaderboard}
+    if trial_idxs is None:
+        trial_idxs = [e["trial_idx"] for e in leaderboard[:max(1, int(topk))]]
+    missing = [t for t in trial_idxs if t not in by_idx]
+    if missing:
+        raise KeyError(f"Trials fuera del leaderboard de {run_root}: {missing}")
+
+    size = tuple(_load_json(run_root / "run.json").get("target_size", [256, 256]))
+    firmas_dir = run_root / "input" / "firmas"
+    refs: Dict[str, RefSignature] = {}
+    def ref(name: str) -> RefSignature:
+        if name not in refs:
+            refs[name] = RefSignature(firmas_dir / name, size)
+        return refs[name]
+
+    cheque: Dict[str, object] = {}
+    for t_idx in trial_idxs:
+        entry = by_idx[t_idx]
+        out = final_image(run_root, entry, cheque)
+        trial_dir = run_root / "trials" / f"trial_{t_idx:04d}"
+        save_snapshot(trial_dir / "stages" / "final.png", out, background=True)
+        names = sorted(p.name for p in firmas_dir.iterdir()) if all_firmas else [entry.get("best_firma")]
+        cand = ImageFeatures(out, size)
+        for name in filter(None, names):
+            ov, sb = pair_visuals(cand, ref(name))
+            save_snapshot(trial_dir / "overlays" / f"overlay_{Path(name).stem}.png", ov, background=True)
+            save_snapshot(trial_dir / "pairs" / f"pair_{Path(name).stem}.png", sb, background=True)
+    flush_artifacts()
+    log.info(f"Review imagery for {len(trial_idxs)} trial(s) → {run_root / 'trials'}")
+    return list(trial_idxs)
+
+def main():
+    ap = argparse.ArgumentParser(description="Imágenes de revisión (final/overlay/pair) de trials de un run")
+    ap.add_argument("--run", help="Ruta al run (e.g., runs/20250919_...)")
+    ap.add_argument("--latest", action="store_true", help="Tomar el run más reciente de ./runs")
+    ap.add_argument("--trials", type=int, nargs="*", help="trial_idx a dibujar (default: top-K)")
+    ap.add_argument("--topk", type=int, default=5, help="K del leaderboard si no se pasan --trials")
+    ap.add_argument("--all-firmas", action="store_true", help="Overlays contra todas las firmas, no solo la mejor")
+    ap.add_argument("--log-level", default="INFO")
+    args = ap.parse_args()
+
+    setup_console_logging(args.log_level)
+    if args.run:
+        run_root = Path(args.run)
+    elif args.latest:
+        run_root = _latest_run(Path("runs"))
+    else:
+        raise SystemExit("Especificá --run <dir> o --latest")
+    if not run_root.exists():
+        raise SystemExit(f"No existe el run: {run_root}")
+    done = render_review(run_root, args.trials or None, topk=args.topk, all_firmas=args.all_firmas)
+    print(json.dumps({"run_dir": str(run_root), "trials": done}, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# sigilum/serve.py
+"""
+Daemon de scoring con el proceso caliente (registro de fases, configs, features de firmas
+y cache en memoria ya cargados). HTTP en localhost o sobre un Unix socket:
+
+  python -m sigilum.serve --port 8765
+  python -m sigilum.serve --socket /tmp/sigilum.sock
+
+  POST /score   {"cheque_path": ..., "cuenta_id": ..., "firmas_dir": ..., "mode": "both", "artifacts": "topk"}
+                -> el mismo JSON que imprime main.py
+  GET  /health  -> estado, uptime, requests atendidos, stats del cache
+"""
+from __future__ import annotations
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Tuple
+import argparse, json, os, signal, socketserver, threading, time
+
+import sigilum.phases  # registra fases
+from sigilum.engine.trial_runner import run_sigilum
+from sigilum.io.cache import cache_stats, configure_cache, flush_cache, DEFAULT_MEM_BUDGET_MB, DEFAULT_DISK_BUDGET_GB
+from sigilum.io.saver import ARTIFACT_LEVELS
+from sigilum.utils.config import load_run_configs
+from sigilum.utils.logger import get_logger, setup_console_logging
+
+MODES = ("absolute", "early", "both")
+
+class ScoringService:
+    """
+    Estado caliente del daemon. Los runs se serializan con un lock (logging por run y
+    cache en memoria son de proceso); /health responde aunque haya un run en curso.
+    Los YAML se recargan solos si cambian en disco.
+    """
+    def __init__(self, pipeline_cfg: str, search_cfg: str, metrics_cfg: str,
+                 runs_root: str | Path = "runs", workers: int = 1, artifacts: str = "topk", topk: int = 5):
+        self.cfg_paths = {"pipeline_cfg": pipeline_cfg, "search_cfg": search_cfg, "metrics_cfg": metrics_cfg}
+        self.runs_root = Path(runs_root)
+        self.workers = workers
+        self.artifacts, self.topk = artifacts, topk
+        self.started = time.time()
+        self.n_requests = 0   # POSTs recibidos (válidos o no), los cuenta el handler al recibirlos
+        self.n_errors = 0
+        self._run_seq = 0     # runs arrancados: numera los run_id
+        self._lock = threading.Lock()        # serializa los runs (se toma durante todo el scoring)
+        self._count_lock = threading.Lock()  # contadores: los threads del server no esperan a un run
+        self._cfg_mtimes: Tuple[float, ...] = ()
+        self._configs: Dict[str, Any] | None = None
+        self.configs()
+
+    def configs(self) -> Dict[str, Any]:
+        mtimes = tuple(os.stat(p).st_mtime for p in self.cfg_paths.values())
+        if mtimes != self._cfg_mtimes:
+            self._configs = load_run_configs(**self.cfg_paths)
+            self._cfg_mtimes = mtimes
+            get_logger().info(f"Configs loaded: {self.cfg_paths}")
+        return self._configs
+
+    def score(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        missing = [k for k in ("cheque_path", "cuenta_id", "firmas_dir") if not req.get(k)]
+        if missing:
+            raise ValueError(f"faltan campos: {missing}")
+        mode = req.get("mode", "both")
+        if mode not in MODES:
+            raise ValueError(f"mode inválido: {mode} ({'|'.join(MODES)})")
+        artifacts = req.get("artifacts", self.artifacts)
+        if artifacts not in ARTIFACT_LEVELS:
+            raise ValueError(f"artifacts inválido: {artifacts} ({'|'.join(ARTIFACT_LEVELS)})")
+        for p in (req["cheque_path"], req["firmas_dir"]):
+            if not Path(p).exists():
+                raise FileNotFoundError(f"No existe: {p}")
+        with self._lock:
+            self._run_seq += 1
+            # run_id con contador: dos requests del mismo cheque en el mismo segundo no chocan
+            run_id = f"{datetime.now():%Y%m%d_%H%M%S}_{self._run_seq:05d}__{Path(req['cheque_path']).stem}"
+            return run_sigilum(req["cheque_path"], str(req["cuenta_id"]), req["firmas_dir"], mode=mode,
+                               workers=self.workers, configs=self.configs(), runs_root=self.runs_root,
+                               run_id=run_id, artifacts=artifacts, topk=int(req.get("topk", self.topk)),
+                               **self.cfg_paths)
+
+    def count_request(self):
+        with self._count_lock:
+            self.n_requests += 1
+
+    def count_error(self):
+        with self._count_lock:
+            self.n_errors += 1
+
+    def health(self) -> Dict[str, Any]:
+        with self._count_lock:
+            n_requests, n_errors = self.n_requests, self.n_errors
+        return {"status": "ok", "pid": os.getpid(), "uptime_s": round(time.time() - self.started, 1),
+                "requests": n_requests, "errors": n_errors, "busy": self._lock.locked(),
+                "configs": self.cfg_paths, "cache": cache_stats()}
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "sigilum"
+    service: ScoringService  # lo setea make_server
+
+    def _reply(self, code: int, body: Dict[str, Any]):
+        data = json.dumps(body, ensure_ascii=False, indent=2).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            return self._reply(200, self.service.health())
+        self._reply(404, {"error": f"not found: {self.path}"})
+
+    def do_POST(self):
+        self.service.count_request()  # antes de validar nada: errors nunca supera a requests
+        if self.path.rstrip("/") != "/score":
+            self.service.count_error()
+            return self._reply(404, {"error": f"not found: {self.path}"})
+        t0 = time.perf_counter()
+        try:
+            n = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(n) or b"{}")
+            if not isinstance(req, dict):
+                raise ValueError("el body debe ser un objeto JSON")
+            res = self.service.score(req)
+        except (ValueError, json.JSONDecodeError) as e:
+            self.service.count_error()
+            return self._reply(400, {"error": str(e)})
+        except FileNotFoundError as e:
+            self.service.count_error()
+            return self._reply(404, {"error": str(e)})
+        except Exception as e:
+            self.service.count_error()
+            get_logger().exception("Scoring request failed")
+            return self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+        get_logger().info(f"/score {req['cheque_path']} → {res['status']} in {(time.perf_counter()-t0)*1000:.0f} ms")
+        self._reply(200, res)
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, fmt, *args):
+        get_logger().debug(f"{self.address_string()} {fmt % args}")
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(service: ScoringService, host: str = "127.0.0.1", port: int = 8765, socket_path: str | None = None):
+    handler = type("Handler", (_Handler,), {"service": service})
+    if socket_path:
+        if Path(socket_path).exists():
+            os.unlink(socket_path)  # socket viejo de un daemon anterior
+        return _UnixHTTPServer(socket_path, handler)
+    srv = ThreadingHTTPServer((host, port), handler)
+    srv.daemon_threads = True
+    return srv
+
+def main():
+    ap = argparse.ArgumentParser(description="Sigilum - daemon de scoring (proceso caliente)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--socket", default=None, help="Unix socket (en vez de HTTP en host:port)")
+    ap.add_argument("--pipeline_cfg", default="configs/pipeline_default.yaml")
+    ap.add_argument("--search_cfg", default="configs/search_spaces.yaml")
+    ap.add_argument("--metrics_cfg", default="configs/metrics_profile.yaml")
+    ap.add_argument("--runs_root", default="runs")
+    ap.add_argument("--workers", type=int, default=1, help="Procesos por run (1 = secuencial, menor latencia)")
+    ap.add_argument("--artifacts", choices=ARTIFACT_LEVELS, default="topk",
+                    help="Default por request (el request puede pedir otro con \"artifacts\")")
+    ap.add_argument("--topk", type=int, default=5)
+    ap.add_argument("--cache-mem-mb", type=float, default=DEFAULT_MEM_BUDGET_MB)
+    ap.add_argument("--cache-disk-gb", type=float, default=DEFAULT_DISK_BUDGET_GB)
+    ap.add_argument("--log-level", default="INFO")
+    args = ap.parse_args()
+
+    setup_console_logging(args.log_level)
+    log = get_logger()
+    configure_cache(mem_budget_mb=args.cache_mem_mb, disk_budget_gb=args.cache_disk_gb)
+    service = ScoringService(args.pipeline_cfg, args.search_cfg, args.metrics_cfg,
+                             runs_root=args.runs_root, workers=args.workers,
+                             artifacts=args.artifacts, topk=args.topk)
+    srv = make_server(service, args.host, args.port, args.socket)
+    log.info(f"Sigilum serving on {args.socket or f'http://{args.host}:{args.port}'}")
+    def _stop(*_):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)  # un solo cierre aunque llegue otra señal
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _stop)  # kill → mismo cierre ordenado que Ctrl-C
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Shutting down")
+    finally:
+        srv.server_close()
+        flush_cache()
+        if args.socket and Path(args.socket).exists():
+            os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
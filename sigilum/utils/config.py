@@ -18,4 +18,12 @@ def validate_metrics_cfg(cfg: dict):
     if "metrics" not in cfg:
         raise ValueError("metrics_profile.yaml debe contener 'metrics'")
     cfg.setdefault("combiner", "weighted_sum")
+    cfg.setdefault("pruning", True)
     cfg.setdefault("thresholds", {"accept": 0.8, "early_stop": 0.9, "min_margin": 0.05})
+
+def load_run_configs(pipeline_cfg: str | Path, search_cfg: str | Path, metrics_cfg: str | Path) -> dict:
+    """Carga y valida los 3 YAML de un run (reusable entre cheques en batch/serve)."""
+    pipe = load_yaml(pipeline_cfg); validate_pipeline_cfg(pipe)
+    search = load_yaml(search_cfg) or {}
+    metrics = load_yaml(metrics_cfg); validate_metrics_cfg(metrics)
+    return {"pipeline": pipe, "search": search, "metrics": metrics}
@@ -0,0 +1,30 @@
+from __future__ import annotations
+from typing import Tuple
+import cv2, numpy as np
+
+def sobel_gradients(img) -> Tuple[np.ndarray, np.ndarray]:
+    """dx, dy en CV_16S con el mismo Sobel 3x3 / borde replicado que usa cv2.Canny por dentro."""
+    return (cv2.Sobel(img, cv2.CV_16S, 1, 0, ksize=3, borderType=cv2.BORDER_REPLICATE),
+            cv2.Sobel(img, cv2.CV_16S, 0, 1, ksize=3, borderType=cv2.BORDER_REPLICATE))
+
+def canny_from_gradients(grads: Tuple[np.ndarray, np.ndarray], low, high) -> np.ndarray:
+    """Idéntico a cv2.Canny(img, low, high) partiendo de sobel_gradients(img)."""
+    return cv2.Canny(grads[0], grads[1], low, high)
+
+def hough_lines_by_threshold(edges, thresholds) -> dict:
+    """
+    {threshold: salida de cv2.HoughLines(edges, 1, π/180, threshold)} con una sola votación:
+    el acumulador a la menor threshold se filtra por votos (> threshold, mismo orden).
+    """
+    thresholds = sorted(set(int(t) for t in thresholds))
+    if not hasattr(cv2, "HoughLinesWithAccumulator"):  # OpenCV < 4.5.1
+        return {t: cv2.HoughLines(edges, 1, np.pi/180, t) for t in thresholds}
+    acc = cv2.HoughLinesWithAccumulator(edges, 1, np.pi/180, thresholds[0])
+    if acc is None:
+        return {t: None for t in thresholds}
+    acc = acc.reshape(-1, 3)
+    out = {}
+    for t in thresholds:
+        sel = acc[acc[:, 2] > t, :2]
+        out[t] = sel.reshape(-1, 1, 2) if len(sel) else None
+    return out
@@ -18,6 +18,13 @@ def sha1_image(img: np.ndarray) -> str:
     # robusto a dtype/contig
     return sha1_bytes(np.ascontiguousarray(img).tobytes())
 
+def content_digest(img: np.ndarray) -> str:
+    """sha1 del contenido de un array (shape + dtype + bytes): iguales ⇔ salida idéntica."""
+    arr = np.ascontiguousarray(img)
+    h = hashlib.sha1(f"{arr.shape}|{arr.dtype.str}|".encode("utf-8"))
+    h.update(memoryview(arr).cast("B"))
+    return h.hexdigest()
+
 def fingerprint(obj) -> str:
     """Fingerprint estable de params dict/list/escalares."""
     s = json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
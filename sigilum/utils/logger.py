@@ -27,7 +27,13 @@ def add_file_logging(logfile: str | Path, level: str | None = None):
     fh.setFormatter(fmt)
     logger.addHandler(fh)
     logger.info(f"File logging enabled → {logfile}")
-    return logger
+    return fh
+
+def remove_file_logging(handler: logging.Handler):
+    """Quita un handler de add_file_logging (procesos que encadenan varios runs)."""
+    logger = logging.getLogger(_LOGGER_NAME)
+    logger.removeHandler(handler)
+    handler.close()
 
 def get_logger():
     return logging.getLogger(_LOGGER_NAME)
@@ -0,0 +1,181 @@
+# sigilum/utils/profiler.py
+"""
+Instrumentación opcional por invocación (fase, métrica, I/O) para `--profile`.
+
+Apagado (default) `span()` devuelve un context manager nulo: sin costo apreciable. Prendido,
+cada span registra wall y CPU (del thread), pico de tracemalloc, RSS máximo del proceso,
+shapes de entrada/salida, throughput en pixels/s y estado de cache. Los eventos quedan en el
+proceso hasta `take_events()` (los workers del pool los devuelven con su resultado) y al final
+del run se escriben `aggregate/profile.json` (p50/p95/total por nombre) y `aggregate/trace.json`
+(Chrome trace events: chrome://tracing o https://ui.perfetto.dev).
+"""
+from __future__ import annotations
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, List
+import json, os, sys, threading, time, tracemalloc
+
+try:
+    import resource  # RSS máximo (unix)
+except ImportError:  # pragma: no cover - windows
+    resource = None
+
+_ENABLED = False
+_MEMORY = False
+_EVENTS: List[Dict[str, Any]] = []
+_LOCK = threading.Lock()
+_STACK = threading.local()  # spans abiertos por thread (picos de tracemalloc anidados)
+
+def enable(memory: bool = True):
+    """Prende el registro de spans; memory=True además traza allocations (tracemalloc, más lento)."""
+    global _ENABLED, _MEMORY
+    _ENABLED, _MEMORY = True, memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    global _ENABLED, _MEMORY
+    if _MEMORY and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _ENABLED = _MEMORY = False
+
+def enabled() -> bool:
+    return _ENABLED
+
+def take_events() -> List[Dict[str, Any]]:
+    """Eventos registrados en este proceso desde la última llamada (y los olvida)."""
+    with _LOCK:
+        out = _EVENTS[:]
+        _EVENTS.clear()
+    return out
+
+def _rss_max_mb() -> float | None:
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # linux: KB (macOS: bytes)
+    return round(kb / 1024.0 / (1024.0 if sys.platform == "darwin" else 1.0), 1)
+
+def _shape(img) -> List[int] | None:
+    return list(img.shape) if hasattr(img, "shape") else None
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "t0", "c0", "m0", "peak")
+
+    def __init__(self, name: str, cat: str, args: Dict[str, Any]):
+        self.name, self.cat, self.args = name, cat, args
+
+    def __enter__(self) -> Dict[str, Any]:
+        stack = getattr(_STACK, "spans", None)
+        if stack is None:
+            stack = _STACK.spans = []
+        stack.append(self)
+        self.peak = 0
+        if _MEMORY and tracemalloc.is_tracing():
+            self.m0 = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        else:
+            self.m0 = None
+        self.c0 = time.thread_time()
+        self.t0 = time.perf_counter_ns()
+        return self.args  # el llamador completa args (out_shape, cache, …)
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter_ns()
+        cpu_ms = (time.thread_time() - self.c0) * 1000
+        _STACK.spans.pop()
+        ev = {"name": self.name, "cat": self.cat, "ts_us": self.t0 // 1000, "dur_us": max(1, (t1 - self.t0) // 1000),
+              "cpu_ms": round(cpu_ms, 3), "pid": os.getpid(), "tid": threading.get_ident(), **self.args}
+        if self.m0 is not None:
+            # pico propio (desde el reset) o el de un span hijo, que reseteó el contador
+            peak = max(tracemalloc.get_traced_memory()[1], self.peak)
+            ev["py_peak_mb"] = round(max(0, peak - self.m0) / 2 ** 20, 3)
+            if _STACK.spans:
+                parent = _STACK.spans[-1]
+                parent.peak = max(parent.peak, peak)
+        ev["rss_max_mb"] = _rss_max_mb()
+        px = self.args.get("pixels")
+        if px:
+            ev["mpx_per_s"] = round(px / ((t1 - self.t0) / 1e9) / 1e6, 3)
+        with _LOCK:
+            _EVENTS.append(ev)
+        return False
+
+def span(name: str, cat: str = "phase", img=None, **args):
+    """
+    with span("Denoise", img=img) as a: out = ...; a["out_shape"] = list(out.shape)
+    img: entrada (shape y pixels para el throughput). No-op si el profiler está apagado.
+    """
+    if not _ENABLED:
+        return nullcontext({})
+    if img is not None:
+        args["in_shape"] = _shape(img)
+        args["pixels"] = int(img.shape[0] * img.shape[1]) if img.ndim >= 2 else int(img.size)
+    return _Span(name, cat, args)
+
+def _pct(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    if not xs:
+        return 0.0
+    k = (len(xs) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+def aggregate(events: List[Dict[str, Any]], cache: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """
+    Por (cat, name): invocaciones, total/p50/p95 de wall y CPU, pico de memoria, Mpx/s y
+    hit/miss del cache de fases. Un evento batched (apply_many) cuenta como `batch` invocaciones.
+    """
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    for ev in events:
+        g = groups.setdefault((ev["cat"], ev["name"]), {"ms": [], "cpu_ms": 0.0, "n": 0, "pixels": 0, "wall_s": 0.0,
+                                                        "py_peak_mb": None, "rss_max_mb": None, "hit": 0, "miss": 0})
+        n = int(ev.get("batch", 1))
+        g["ms"].extend([ev["dur_us"] / 1000.0 / n] * n)
+        g["n"] += n
+        g["cpu_ms"] += ev["cpu_ms"]
+        g["wall_s"] += ev["dur_us"] / 1e6
+        g["pixels"] += ev.get("pixels", 0) * n
+        for k in ("py_peak_mb", "rss_max_mb"):
+            if ev.get(k) is not None:
+                g[k] = max(g[k] or 0.0, ev[k])
+        if ev.get("cache") in ("hit", "miss"):
+            g[ev["cache"]] += n
+    by_name = []
+    for (cat, name), g in groups.items():
+        row = {"cat": cat, "name": name, "n": g["n"], "total_ms": round(sum(g["ms"]), 2),
+               "p50_ms": round(_pct(g["ms"], 0.5), 3), "p95_ms": round(_pct(g["ms"], 0.95), 3),
+               "cpu_ms": round(g["cpu_ms"], 2), "py_peak_mb": g["py_peak_mb"], "rss_max_mb": g["rss_max_mb"]}
+        if g["pixels"] and g["wall_s"]:
+            row["mpx_per_s"] = round(g["pixels"] / g["wall_s"] / 1e6, 3)
+        if g["hit"] or g["miss"]:
+            row.update({"cache_hit": g["hit"], "cache_miss": g["miss"],
+                        "cache_hit_rate": round(g["hit"] / (g["hit"] + g["miss"]), 4)})
+        by_name.append(row)
+    by_name.sort(key=lambda r: -r["total_ms"])
+    out: Dict[str, Any] = {"n_events": len(events), "by_name": by_name,
+                           "by_cat": {c: round(sum(r["total_ms"] for r in by_name if r["cat"] == c), 2)
+                                      for c in sorted({r["cat"] for r in by_name})}}
+    if cache:
+        mem = cache.get("mem_hits", 0) + cache.get("mem_misses", 0)
+        disk = cache.get("disk_hits", 0) + cache.get("disk_misses", 0)
+        out["cache"] = {**cache, "mem_hit_rate": round(cache.get("mem_hits", 0) / mem, 4) if mem else None,
+                        "disk_hit_rate": round(cache.get("disk_hits", 0) / disk, 4) if disk else None}
+    return out
+
+def chrome_trace(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Eventos "X" (complete) del formato Chrome trace; tiempos relativos al primer evento."""
+    t0 = min((ev["ts_us"] for ev in events), default=0)
+    keep = ("name", "cat", "ts_us", "dur_us", "pid", "tid")
+    return {"traceEvents": [{"name": ev["name"], "cat": ev["cat"], "ph": "X", "ts": ev["ts_us"] - t0,
+                             "dur": ev["dur_us"], "pid": ev["pid"], "tid": ev["tid"],
+                             "args": {k: v for k, v in ev.items() if k not in keep}} for ev in events],
+            "displayTimeUnit": "ms"}
+
+def write_profile(run_root: Path, events: List[Dict[str, Any]], cache: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """aggregate/profile.json + aggregate/trace.json del run; devuelve el agregado."""
+    agg = aggregate(events, cache)
+    out_dir = Path(run_root) / "aggregate"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "profile.json").write_text(json.dumps(agg, ensure_ascii=False, indent=2), encoding="utf-8")
+    (out_dir / "trace.json").write_text(json.dumps(chrome_trace(events), separators=(",", ":")), encoding="utf-8")
+    return agg
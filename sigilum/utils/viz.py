@@ -1,16 +1,22 @@
 # sigilum/utils/viz.py
 from __future__ import annotations
 import cv2, numpy as np
+from sigilum.engine.features import as_features
+
+# base/candidate pueden ser arrays o FeatureSet: con FeatureSet se reusan el resize, la
+# conversión a BGR y los bordes que ya calcularon las métricas.
 
 def overlay_edges(base_gray, candidate_gray, edge_thresh: int = 80, size=(256,256)):
-    base = cv2.cvtColor(cv2.resize(base_gray, size), cv2.COLOR_GRAY2BGR)
-    cand = cv2.resize(candidate_gray, size)
-    e = cv2.Canny(cand, edge_thresh, edge_thresh*2)
-    color = base.copy()
-    color[e > 0] = (0, 0, 255)
+    base, cand = as_features(base_gray, size), as_features(candidate_gray, size)
+    color = base.bgr().copy()
+    color[cand.edges(edge_thresh) > 0] = (0, 0, 255)
     return color
 
 def side_by_side(a_gray, b_gray, size=(256,256)):
-    a = cv2.cvtColor(cv2.resize(a_gray, size), cv2.COLOR_GRAY2BGR)
-    b = cv2.cvtColor(cv2.resize(b_gray, size), cv2.COLOR_GRAY2BGR)
-    return np.hstack([a, b])
+    a, b = as_features(a_gray, size), as_features(b_gray, size)
+    return np.hstack([a.bgr(), b.bgr()])
+
+def pair_visuals(cand, ref, edge_thresh: int = 80):
+    """(overlay, side_by_side) del par (candidato, firma), ambos FeatureSet al mismo size."""
+    return (overlay_edges(cand, ref, edge_thresh, cand.size),
+            side_by_side(cand, ref, cand.size))
@@ -0,0 +1,231 @@
+import itertools
+import json
+
+import cv2
+import numpy as np
+import pytest
+import yaml
+
+import sigilum.phases  # registra fases
+from sigilum.bench.suite import BENCH_METRICS
+from sigilum.bench.synthetic import reference_signatures, synthetic_cheque
+from sigilum.engine.features import ImageFeatures
+from sigilum.engine.phase_engine import run_pipeline
+from sigilum.engine.references import ReferenceStore
+from sigilum.engine.trial_generator import SAMPLING_MODES, TrialSpace, expand_trials, sample_indices
+from sigilum.engine.trial_runner import _resolve_duplicates, _score_refs, run_sigilum
+from sigilum.engine.trial_tree import run_trial_tree
+from sigilum.io import cache
+
+def _space(n_bin: int = 6, n_morph: int = 5, n_den: int = 4) -> TrialSpace:
+    pipe = {"pipeline": [{"phase": "Denoise", "params": {"mode": "bilateral"}},
+                         {"phase": "Binarization", "params": {"mode": "otsu"}},
+                         {"phase": "Morphology", "params": {}}]}
+    search = {"Denoise": {"bil_sigma": list(range(10, 10 + n_den))},
+              "Binarization": {"invert": [True, False], "mode": ["otsu", "adaptive", "sauvola"][:max(1, n_bin // 2)]},
+              "Morphology": {"close_sz": list(range(1, 1 + n_morph)), "min_area": [0, 50, 100]}}
+    return TrialSpace(pipe, search)
+
+@pytest.fixture
+def tmp_cache(tmp_path, monkeypatch):
+    """Cache de fases (y de features de firmas) bajo tmp_path, vacío y aislado del de otros tests."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cache, "_store", None)
+    cache._MEM.clear()
+    yield tmp_path
+    cache.flush_cache(enforce_cap=False)
+    if cache._store is not None:
+        cache._store.close()
+    cache._MEM.clear()
+
+# --- TrialSpace / sampling ---
+
+def test_sobol_budget_beyond_two_blocks():
+    space = _space()
+    n = len(space)
+    assert n >= 300
+    idx = list(sample_indices(space, 300, "sobol", 0))
+    assert len(idx) == 300 and len(set(idx)) == 300
+    assert all(0 <= i < n for i in idx)
+
+def test_trial_space_index_round_trip():
+    space = _space()
+    assert len(space) == 4 * 2 * 3 * 5 * 3
+    for i in range(len(space)):
+        assert space.index(space.digits(i)) == i
+    with pytest.raises(IndexError):
+        space.digits(len(space))
+
+def test_trial_space_matches_cartesian_order():
+    # el último eje varía más rápido, como itertools.product sobre los ejes en orden
+    space = _space(n_bin=4, n_morph=2, n_den=2)
+    combos = list(itertools.product(*[vals for _, _, vals in space.axes]))
+    assert len(combos) == len(space)
+    for i, combo in enumerate(combos):
+        steps = space[i]
+        got = tuple(steps[si]["params"][k] for si, k, _ in space.axes)
+        assert got == combo
+
+def test_trial_space_prunes_inactive_axes():
+    # nl_h solo importa con mode=nlmeans: con mode fijo en bilateral no es un eje
+    pipe = {"pipeline": [{"phase": "Denoise", "params": {"mode": "bilateral"}}]}
+    space = TrialSpace(pipe, {"Denoise": {"bil_sigma": [11, 21], "nl_h": [0.5, 0.8, 1.2]}})
+    assert len(space) == 2
+    assert [k for _, k, _ in space.pruned] == ["nl_h"]
+    # con mode en el espacio, nlmeans puede activarlo
+    space = TrialSpace(pipe, {"Denoise": {"mode": ["bilateral", "nlmeans"], "nl_h": [0.5, 0.8, 1.2]}})
+    assert len(space) == 6 and not space.pruned
+
+@pytest.mark.parametrize("mode", SAMPLING_MODES)
+def test_sample_indices_modes(mode):
+    space = _space()
+    n = len(space)
+    idx = list(sample_indices(space, 50, mode, seed=3))
+    assert len(idx) == 50 == len(set(idx))
+    assert all(0 <= i < n for i in idx)
+    assert idx == list(sample_indices(space, 50, mode, seed=3))  # determinístico
+    if mode == "sequential":
+        assert idx == list(range(50))
+    # budget ≥ n: cubre el espacio entero, sin repetir
+    full = list(sample_indices(space, n + 10, mode, seed=3))
+    assert sorted(full) == list(range(n))
+
+def test_sample_indices_seed_changes_order():
+    space = _space()
+    assert list(sample_indices(space, 30, "random", 0)) != list(sample_indices(space, 30, "random", 1))
+
+def test_sample_indices_unknown_mode():
+    with pytest.raises(ValueError):
+        list(sample_indices(_space(), 5, "latin"))
+
+def test_expand_trials_dedups_effective_pipelines():
+    pipe = {"pipeline": [{"phase": "Binarization", "params": {"mode": "otsu"}}]}
+    # sauvola_k no cambia nada con mode=otsu: los 3 valores dan el mismo pipeline efectivo
+    trials = expand_trials(pipe, {"Binarization": {"mode": ["otsu", "sauvola"], "sauvola_k": [0.2, 0.3, 0.4]}})
+    assert len(trials) == 1 + 3
+    assert len({json.dumps(t, sort_keys=True) for t in trials}) == len(trials)
+
+# --- trie vs run_pipeline ---
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_trial_tree_matches_run_pipeline(tmp_cache, use_cache):
+    cheque, _ = synthetic_cheque(seed=1, size=(400, 175))
+    space = _space(n_bin=4, n_morph=2, n_den=2)
+    pipelines = [space[i] for i in range(len(space))]
+    seen = set()
+    for j, out, snaps in run_trial_tree(cheque, pipelines, use_cache=use_cache):
+        ref, ref_snaps = run_pipeline(cheque, pipelines[j - 1], use_cache=False)
+        assert np.array_equal(np.asarray(out), ref), f"trial {j}"
+        assert [s["cache_key"] for s in snaps] == [s["cache_key"] for s in ref_snaps]
+        seen.add(j)
+    assert seen == set(range(1, len(pipelines) + 1))
+
+def test_trial_tree_warm_cache_matches_cold(tmp_cache):
+    cheque, _ = synthetic_cheque(seed=2, size=(400, 175))
+    space = _space(n_bin=4, n_morph=2, n_den=2)
+    pipelines = [space[i] for i in range(len(space))]
+    cold = {j: np.array(out) for j, out, _ in run_trial_tree(cheque, pipelines, use_cache=True)}
+    cache.flush_cache(enforce_cap=False)
+    cache._MEM.clear()  # warm desde disco
+    for j, out, snaps in run_trial_tree(cheque, pipelines, use_cache=True):
+        assert np.array_equal(np.asarray(out), cold[j])
+        assert snaps[-1]["cache"] in ("hit", "skip", "dup")
+
+# --- pruning ---
+
+def _pair_metrics(pruning: bool) -> dict:
+    # orb (la más cara) con poco peso: su cota deja de alcanzar al mejor par y se descarta
+    return {**BENCH_METRICS, "pruning": pruning,
+            "metrics": BENCH_METRICS["metrics"] + [{"name": "orb_inliers", "weight": 0.1, "params": {"n_features": 500}}]}
+
+def test_score_refs_pruning_keeps_best_pair_exact(tmp_path):
+    size = (128, 128)
+    paths = []
+    for i, img in enumerate(reference_signatures(seed=5, n=2) + reference_signatures(seed=9, n=2)):
+        p = tmp_path / f"firma_{i}.png"
+        cv2.imwrite(str(p), img)
+        paths.append(p)
+    refs = ReferenceStore("t", paths, size, root=tmp_path / "refs")
+    n_pruned = 0
+    for s, cand_img in enumerate(reference_signatures(seed=5, n=3, jitter=1.5) + reference_signatures(seed=7, n=2)):
+        cand = ImageFeatures(cand_img, size)
+        full = _score_refs(cand, refs, _pair_metrics(False), size)
+        pruned = _score_refs(cand, refs, _pair_metrics(True), size, accept=0.8)
+        assert all(ub is None for _, _, ub in full)
+        exact = [sc for sc, _, _ in full]
+        best = int(np.argmax(exact))
+        # el mejor par nunca se descarta y su score es el exacto
+        assert pruned[best][0] == pytest.approx(exact[best], abs=1e-12)
+        for (sc, _, ub), ex in zip(pruned, exact):
+            if sc is None:
+                n_pruned += 1
+                assert ub >= ex - 1e-12          # la cota acota el score real
+                assert ub < exact[best] + 1e-12  # y no podía ganarle al mejor
+            else:
+                assert ub is None and sc == pytest.approx(ex, abs=1e-12)
+    assert n_pruned > 0  # el caso ejercita el descarte
+
+def _signature_case(root):
+    """'Cheque' = otra muestra del firmante 5; firmas del 5 y de otro firmante (pares peores)."""
+    (root / "firmas").mkdir(parents=True)
+    cheque = root / "cheque.png"
+    cv2.imwrite(str(cheque), reference_signatures(seed=5, n=4)[3])
+    for i, img in enumerate(reference_signatures(seed=5, n=3) + reference_signatures(seed=9, n=3)):
+        cv2.imwrite(str(root / "firmas" / f"firma_{i}.png"), img)
+    return str(cheque), str(root / "firmas")
+
+def _run_case(root, cheque, firmas_dir, pruning: bool):
+    cfg = {"pipeline.yaml": {"pipeline": [{"phase": "BorderBlur", "params": {"gauss_sigma": 3.0}},
+                                          {"phase": "Denoise", "params": {"mode": "bilateral", "bil_d": 5}}]},
+           "search.yaml": {"BorderBlur": {"gauss_sigma": [1.0, 3.0]}, "Denoise": {"bil_sigma": [11, 31, 61]}},
+           "metrics.yaml": _pair_metrics(pruning)}
+    d = root / ("pruned" if pruning else "exact")
+    d.mkdir()
+    for name, doc in cfg.items():
+        (d / name).write_text(yaml.safe_dump(doc, sort_keys=False), encoding="utf-8")
+    res = run_sigilum(cheque, "t", firmas_dir, str(d / "pipeline.yaml"), str(d / "search.yaml"),
+                      str(d / "metrics.yaml"), artifacts="none", runs_root=root / "runs", run_id=d.name)
+    lb = json.loads((root / "runs" / d.name / "aggregate" / "leaderboard.json").read_text(encoding="utf-8"))
+    return res, lb["leaderboard"]
+
+def test_pruned_run_picks_same_best_trial(tmp_cache):
+    cheque, firmas_dir = _signature_case(tmp_cache / "case")
+    res_p, lb_p = _run_case(tmp_cache, cheque, firmas_dir, pruning=True)
+    res_e, lb_e = _run_case(tmp_cache, cheque, firmas_dir, pruning=False)
+    assert len(lb_p) == len(lb_e) == 6
+    assert any(e.get("pruned_pairs") for e in lb_p)
+    assert not any(e.get("pruned_pairs") for e in lb_e)
+    assert res_p["status"] == res_e["status"]
+    assert res_p["best_trial"]["trial_idx"] == res_e["best_trial"]["trial_idx"]
+    assert res_p["best_trial"]["best_firma"] == res_e["best_trial"]["best_firma"]
+    assert res_p["best_trial"]["best_score"] == pytest.approx(res_e["best_trial"]["best_score"], abs=1e-12)
+    # el mejor par de cada trial nunca se descarta: mismo score trial por trial
+    exact = {e["trial_idx"]: e["best_score"] for e in lb_e}
+    for e in lb_p:
+        assert e["best_score"] == pytest.approx(exact[e["trial_idx"]], abs=1e-12)
+
+# --- dedup de imágenes finales entre chunks ---
+
+def test_resolve_duplicates_picks_lowest_trial_across_chunks():
+    comps = [{"firma": "a.png", "score": 0.7, "per_metric": {}},
+             {"firma": "b.png", "score": None, "per_metric": {}, "pruned": True, "upper_bound": 0.6}]
+    best = {"firma": "a.png", "score": 0.7, "per_metric": {}, "path": "a.png"}
+    def entry(t, **kw):
+        return {"trial_idx": t, "signature": f"s{t}", "best_score": 0.7, "best_firma": "a.png", **kw}
+    # cada chunk evaluó la misma imagen por su lado; en el segundo, 5 ya es duplicado de 2
+    parts = [{"leaderboard": [entry(3, pruned_pairs=1), entry(4)], "digests": {3: "d", 4: "e"},
+              "evaluated": {"d": {"trial_idx": 3, "best": best, "comparisons": comps},
+                            "e": {"trial_idx": 4, "best": best, "comparisons": comps[:1]}}},
+             {"leaderboard": [entry(5, duplicate_of=2), entry(2, pruned_pairs=1)], "digests": {5: "d", 2: "d"},
+              "evaluated": {"d": {"trial_idx": 2, "best": best, "comparisons": comps}}}]
+    run = {"artifacts": "none"}
+    _resolve_duplicates(parts, run)
+    lb = {e["trial_idx"]: e for p in parts for e in p["leaderboard"]}
+    assert lb[2] == entry(2, pruned_pairs=1)
+    assert lb[3] == entry(3, duplicate_of=2) and lb[5] == entry(5, duplicate_of=2)
+    assert lb[4] == entry(4)
+    assert {d: v["trial_idx"] for d, v in run["by_content"].items()} == {"d": 2, "e": 4}
+    # la llamada siguiente ve las fuentes de esta
+    nxt = [{"leaderboard": [entry(9, duplicate_of=4)], "digests": {9: "e"}, "evaluated": {}}]
+    _resolve_duplicates(nxt, run)
+    assert nxt[0]["leaderboard"] == [entry(9, duplicate_of=4)]
@@ -0,0 +1,180 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from sigilum.io import store as store_mod
+from sigilum.io.cache import MemoryCache
+from sigilum.io.store import ALIGN, PackedStore
+
+def _arrays():
+    rng = np.random.default_rng(0)
+    return {
+        "u8": rng.integers(0, 256, (37, 53), dtype=np.uint8),
+        "f32": rng.random((8, 9, 3), dtype=np.float32),
+        "i32": np.arange(-50, 50, dtype=np.int32),
+        "empty": np.zeros((0, 4), np.int32),  # p.ej. 0 cajas de OCR
+        "strided": rng.integers(0, 256, (20, 30), dtype=np.uint8)[::2, ::3],  # no contiguo
+    }
+
+# --- PackedStore ---
+
+def test_put_get_round_trip(tmp_path):
+    st = PackedStore(tmp_path)
+    arrays = _arrays()
+    for k, a in arrays.items():
+        st.put(k, a)
+    for k, a in arrays.items():
+        assert st.has(k)
+        got = st.get(k)
+        assert got.dtype == a.dtype and got.shape == a.shape
+        np.testing.assert_array_equal(got, a)
+    assert st.get("missing") is None and not st.has("missing")
+    got = st.get("u8")
+    assert isinstance(got, np.memmap) and not got.flags.writeable  # zero-copy, read-only
+    st.close()
+
+def test_put_same_key_first_wins(tmp_path):
+    st = PackedStore(tmp_path)
+    st.put("k", np.ones(10, np.uint8))
+    st.put("k", np.zeros(10, np.uint8))
+    np.testing.assert_array_equal(st.get("k"), np.ones(10, np.uint8))
+    assert st.stats()["entries"] == 1
+    st.close()
+
+def test_offsets_are_aligned(tmp_path):
+    st = PackedStore(tmp_path)
+    for i in range(5):
+        st.put(f"k{i}", np.arange(i * 7 + 1, dtype=np.uint8))
+    offs = [r[0] for r in st._conn().execute("SELECT offset FROM entries")]
+    assert all(o % ALIGN == 0 for o in offs)
+    st.close()
+
+def test_persists_across_reopen(tmp_path):
+    st = PackedStore(tmp_path)
+    arrays = _arrays()
+    for k, a in arrays.items():
+        st.put(k, a)
+    st.close()
+    st2 = PackedStore(tmp_path)
+    for k, a in arrays.items():
+        np.testing.assert_array_equal(st2.get(k), a)
+    assert st2.stats()["sealed_shards"] == 1
+    st2.close()
+
+def test_alias_shares_bytes(tmp_path):
+    st = PackedStore(tmp_path)
+    a = np.arange(1000, dtype=np.uint8)
+    st.put("src", a)
+    assert st.alias("dup1", "src") and st.alias("dup2", "src")
+    assert st.alias("dup1", "src")  # ya existe: sigue siendo True
+    assert not st.alias("x", "missing")
+    for k in ("src", "dup1", "dup2"):
+        np.testing.assert_array_equal(st.get(k), a)
+    # los alias no cuentan sus bytes otra vez
+    assert st.live_bytes() == a.nbytes
+    s = st.stats()
+    assert s["entries"] == 3 and s["live_bytes"] == a.nbytes
+    st.close()
+
+def test_gc_lru_respects_aliases(tmp_path):
+    st = PackedStore(tmp_path)
+    old, new = np.zeros(1000, np.uint8), np.ones(1000, np.uint8)
+    st.put("old", old)
+    st.alias("old_alias", "old")
+    st.put("new", new)
+    db = st._conn()
+    # orden LRU explícito: old < new < old_alias (el alias reciente mantiene vivos los bytes de old)
+    for k, t in (("old", 1.0), ("new", 2.0), ("old_alias", 3.0)):
+        db.execute("UPDATE entries SET last_access=? WHERE key=?", (t, k))
+    out = st.gc(max_bytes=1500)  # objetivo 90%: 1350 → hay que liberar una extensión
+    # borrar "old" no libera nada (su alias sigue); recién "new" baja de objetivo
+    assert not st.has("old") and not st.has("new") and st.has("old_alias")
+    assert out["evicted"] == 2 and st.live_bytes() == 1000
+    np.testing.assert_array_equal(st.get("old_alias"), old)
+    st.close()
+
+def test_gc_max_age(tmp_path):
+    st = PackedStore(tmp_path)
+    st.put("stale", np.zeros(10, np.uint8))
+    st.put("fresh", np.ones(10, np.uint8))
+    st._conn().execute("UPDATE entries SET last_access=? WHERE key='stale'", (time.time() - 10 * 86400,))
+    out = st.gc(max_age_s=86400)
+    assert out["evicted"] == 1 and not st.has("stale") and st.has("fresh")
+    st.close()
+
+def test_gc_compacts_sealed_shards(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_mod, "COMPACT_MIN_LIVE", 0.9)
+    st = PackedStore(tmp_path)
+    keep = np.arange(256, dtype=np.uint8)
+    st.put("keep", keep)
+    st.alias("keep_alias", "keep")
+    for i in range(8):
+        st.put(f"drop{i}", np.full(4096, i, np.uint8))
+    st.close()  # sella el shard
+    old_shards = set(os.listdir(tmp_path / "shards"))
+
+    st = PackedStore(tmp_path)
+    st._conn().execute("DELETE FROM entries WHERE key LIKE 'drop%'")
+    out = st.gc()
+    assert out["compacted_shards"] == 1
+    assert not old_shards & set(os.listdir(tmp_path / "shards"))  # el shard viejo se borró
+    for k in ("keep", "keep_alias"):
+        np.testing.assert_array_equal(st.get(k), keep)
+    # el alias se copió una sola vez: sigue compartiendo la extensión
+    ext = st._conn().execute("SELECT DISTINCT shard, offset FROM entries").fetchall()
+    assert len(ext) == 1
+    assert out["disk_bytes"] < 4096
+    st.close()
+
+def test_gc_removes_shards_without_live_entries(tmp_path):
+    st = PackedStore(tmp_path)
+    st.put("a", np.zeros(100, np.uint8))
+    st.close()
+    st = PackedStore(tmp_path)
+    st._conn().execute("DELETE FROM entries")
+    out = st.gc()
+    assert out["removed_shards"] == 1 and out["shards"] == 0
+    assert not os.listdir(tmp_path / "shards")
+    st.close()
+
+# --- MemoryCache ---
+
+def test_memory_cache_keeps_caller_array_writable():
+    mc = MemoryCache(1 << 20)
+    img = np.zeros((10, 10), np.uint8)
+    mc.put("k", img)
+    assert img.flags.writeable
+    got = mc.get("k")
+    assert not got.flags.writeable and np.shares_memory(got, img)
+    with pytest.raises(ValueError):
+        got[0, 0] = 1
+
+def test_memory_cache_copies_views_of_larger_buffers(tmp_path):
+    mc = MemoryCache(1 << 20)
+    cheque = np.zeros((200, 300), np.uint8)
+    crop = cheque[50:80, 100:160]  # recorte: vista que retiene el cheque entero
+    mc.put("crop", crop)
+    got = mc.get("crop")
+    assert not np.shares_memory(got, cheque) and got.base.nbytes == crop.nbytes == mc.nbytes
+    np.testing.assert_array_equal(got, crop)
+    # los memmap del store no se copian
+    st = PackedStore(tmp_path)
+    st.put("k", cheque)
+    mm = st.get("k")
+    mc.put("mm", mm)
+    assert np.shares_memory(mc.get("mm"), mm)
+    st.close()
+
+def test_memory_cache_lru_budget():
+    mc = MemoryCache(250)
+    for k in "abc":
+        mc.put(k, np.zeros(100, np.uint8))
+    assert "a" not in mc and "b" in mc and "c" in mc
+    assert mc.nbytes == 200 and mc.evictions == 1
+    mc.get("b")              # b pasa a ser el más reciente
+    mc.put("d", np.zeros(100, np.uint8))
+    assert "c" not in mc and "b" in mc
+    mc.put("big", np.zeros(1000, np.uint8))  # más grande que el presupuesto: no entra
+    assert "big" not in mc
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+import pytest
+
+from sigilum.bench.synthetic import reference_signatures
+from sigilum.engine.features import ImageFeatures
+from sigilum.engine.metrics import get_metric, score_batch
+from sigilum.engine.references import ReferenceStore
+
+BATCHED = ("ncc", "mse", "ssim")
+# ncc promedia productos float32 (el orden de la suma cambia entre batch y par a par)
+ATOL = {"ncc": 1e-6, "mse": 1e-9, "ssim": 1e-9}
+
+def _cases():
+    # firmas del mismo firmante y de otros, más un candidato constante (varianza 0)
+    refs = reference_signatures(seed=3, n=3) + reference_signatures(seed=8, n=2)
+    cands = reference_signatures(seed=3, n=4, jitter=1.5)[3:] + reference_signatures(seed=11, n=1)
+    return refs, cands + [np.full_like(refs[0], 255)]
+
+@pytest.mark.parametrize("name", BATCHED)
+@pytest.mark.parametrize("size", [(64, 64), (128, 96)])
+def test_batch_matches_scalar_on_arrays(name, size):
+    refs, cands = _cases()
+    fn = get_metric(name)
+    for cand in cands:
+        batch = score_batch(name, cand, refs, size=size)
+        scalar = [fn(cand, r, size=size) for r in refs]
+        assert batch.shape == (len(refs),)
+        np.testing.assert_allclose(batch, scalar, rtol=0, atol=ATOL[name])
+        assert np.all((batch >= 0) & (batch <= 1))
+
+@pytest.mark.parametrize("name", BATCHED)
+def test_batch_matches_scalar_on_reference_store(tmp_path, name):
+    size = (96, 96)
+    refs, cands = _cases()
+    paths = []
+    for i, img in enumerate(refs):
+        paths.append(tmp_path / f"firma_{i}.png")
+        cv2.imwrite(str(paths[-1]), img)
+    store = ReferenceStore("t", paths, size, root=tmp_path / "refs")
+    fn = get_metric(name)
+    for cand in cands:
+        cf = ImageFeatures(cand, size)
+        batch = score_batch(name, cf, store, size=size)
+        scalar = [fn(cf, r, size=size) for r in store]
+        np.testing.assert_allclose(batch, scalar, rtol=0, atol=ATOL[name])
+        # sobre un subconjunto (lo que hace el scorer con los pares que siguen en juego)
+        sub = score_batch(name, cf, store.subset([4, 0]), size=size)
+        np.testing.assert_allclose(sub, [scalar[4], scalar[0]], rtol=0, atol=ATOL[name])
+
+@pytest.mark.parametrize("win_size", [3, 7, 11])
+def test_batch_ssim_win_size(win_size):
+    size = (64, 64)
+    refs, cands = _cases()
+    batch = score_batch("ssim", cands[0], refs, size=size, win_size=win_size)
+    scalar = [get_metric("ssim")(cands[0], r, size=size, win_size=win_size) for r in refs]
+    np.testing.assert_allclose(batch, scalar, rtol=0, atol=1e-9)
+
+def test_identical_images_score_one():
+    size = (64, 64)
+    img = reference_signatures(seed=4, n=1)[0]
+    for name in BATCHED:
+        assert score_batch(name, img, [img], size=size)[0] == pytest.approx(1.0, abs=1e-6)
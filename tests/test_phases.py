@@ -0,0 +1,100 @@
+import cv2
+import numpy as np
+import pytest
+
+import sigilum.phases  # registra fases
+from sigilum.bench.synthetic import render_signature, signature_strokes
+from sigilum.phases.base import get_phase_cls
+from sigilum.utils import thinning
+from sigilum.utils.thinning import THINNING_TYPES, thin
+
+# --- referencia: adelgazamiento pixel a pixel, tal cual los papers / cv2.ximgproc.thinning ---
+
+def _zhang_suen_rule(p2, p3, p4, p5, p6, p7, p8, p9, it):
+    seq = (p2, p3, p4, p5, p6, p7, p8, p9, p2)
+    a = sum(1 for u, v in zip(seq, seq[1:]) if u == 0 and v == 1)
+    b = p2 + p3 + p4 + p5 + p6 + p7 + p8 + p9
+    if it == 0:
+        return a == 1 and 2 <= b <= 6 and p2 * p4 * p6 == 0 and p4 * p6 * p8 == 0
+    return a == 1 and 2 <= b <= 6 and p2 * p4 * p8 == 0 and p2 * p6 * p8 == 0
+
+def _guo_hall_rule(p2, p3, p4, p5, p6, p7, p8, p9, it):
+    c = ((not p2) and (p3 or p4)) + ((not p4) and (p5 or p6)) + ((not p6) and (p7 or p8)) + ((not p8) and (p9 or p2))
+    n = min((p9 or p2) + (p3 or p4) + (p5 or p6) + (p7 or p8), (p2 or p3) + (p4 or p5) + (p6 or p7) + (p8 or p9))
+    m = ((p6 or p7 or not p9) and p8) if it == 0 else ((p2 or p3 or not p5) and p4)
+    return c == 1 and 2 <= n <= 3 and not m
+
+_RULES = {"zhang_suen": _zhang_suen_rule, "guo_hall": _guo_hall_rule}
+
+def _reference_thin(img: np.ndarray, kind: str) -> np.ndarray:
+    b = (img > 0).astype(np.uint8)
+    h, w = b.shape
+    rule = _RULES[kind]
+    changed = True
+    while changed:
+        changed = False
+        for it in (0, 1):
+            marked = [(y, x) for y in range(1, h - 1) for x in range(1, w - 1)
+                      if b[y, x] and rule(int(b[y - 1, x]), int(b[y - 1, x + 1]), int(b[y, x + 1]), int(b[y + 1, x + 1]),
+                                          int(b[y + 1, x]), int(b[y + 1, x - 1]), int(b[y, x - 1]), int(b[y - 1, x - 1]), it)]
+            for y, x in marked:
+                b[y, x] = 0
+            changed |= bool(marked)
+    return b * 255
+
+def _images():
+    rng = np.random.default_rng(0)
+    out = {}
+    # firma gruesa: arranca por el camino denso (convolución) y termina en el ralo
+    sig = render_signature(signature_strokes(3), (90, 40), thickness=6, ink=0)
+    out["signature_thick"] = (sig < 128).astype(np.uint8) * 255
+    # trazos finos desde el principio: camino ralo
+    sig = render_signature(signature_strokes(7), (90, 40), thickness=2, ink=0)
+    out["signature_thin"] = (sig < 128).astype(np.uint8) * 255
+    # manchas al azar que tocan el borde de la imagen (los pixels del borde no se borran)
+    noise = cv2.GaussianBlur(rng.random((36, 48)).astype(np.float32), (0, 0), 2.0)
+    out["blobs_at_border"] = (noise > np.median(noise)).astype(np.uint8) * 255
+    # rectángulo lleno y líneas de 1 px (ya son esqueleto)
+    rect = np.zeros((30, 40), np.uint8)
+    rect[5:25, 8:33] = 255
+    out["rect"] = rect
+    lines = np.zeros((20, 20), np.uint8)
+    lines[10, 2:18] = 255
+    lines[2:18, 5] = 255
+    out["lines"] = lines
+    return out
+
+@pytest.mark.parametrize("kind", THINNING_TYPES)
+@pytest.mark.parametrize("name", sorted(_images()))
+def test_lut_thinning_matches_reference(kind, name):
+    img = _images()[name]
+    got = thin(img, kind)
+    assert got.dtype == np.uint8 and set(np.unique(got)) <= {0, 255}
+    np.testing.assert_array_equal(got, _reference_thin(img, kind))
+
+@pytest.mark.parametrize("kind", THINNING_TYPES)
+def test_lut_thinning_dense_and_sparse_paths_agree(monkeypatch, kind):
+    img = _images()["signature_thick"]
+    ref = _reference_thin(img, kind)
+    for frac in (0.0, 1.0):  # 0 → siempre denso, 1 → ralo desde la primera pasada
+        monkeypatch.setattr(thinning, "SPARSE_FRACTION", frac)
+        np.testing.assert_array_equal(thin(img, kind), ref)
+
+def test_thin_is_idempotent_and_edge_cases():
+    img = _images()["signature_thick"]
+    sk = thin(img)
+    np.testing.assert_array_equal(thin(sk), sk)
+    assert not thin(np.zeros((10, 10), np.uint8)).any()
+    tiny = np.full((2, 5), 255, np.uint8)
+    np.testing.assert_array_equal(thin(tiny), tiny)  # sin interior: no se borra nada
+    with pytest.raises(ValueError):
+        thin(img, "medial_axis")
+
+@pytest.mark.parametrize("method", ["lut", "ximgproc"])
+def test_skeletonization_phase_matches_thinning(method):
+    # ximgproc (o su fallback a lut si no hay opencv-contrib) da el mismo esqueleto
+    img = _images()["signature_thick"]
+    phase = get_phase_cls("Skeletonization")()
+    for kind in THINNING_TYPES:
+        out = phase.apply(img, enabled=True, method=method, thinning=kind, resize_before=False)
+        np.testing.assert_array_equal(np.asarray(out) > 0, thin(img, kind) > 0)